@@ -1,156 +1,281 @@
-import os
-import subprocess
 import json
-import re
-import numpy as np
-from PIL import Image
-import io
-import tensorflow as tf
+import os
+import sys
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS, cross_origin
+from werkzeug.exceptions import RequestEntityTooLarge
 
 app = Flask(__name__)
 CORS(app, origins=['http://localhost:3000', 'http://localhost:5173'], supports_credentials=True)
 
-# TFLite Setup
-MODEL_PATH = os.path.join(os.getcwd(), "model", "plant_leaf_diseases_model.tflite")
-if not os.path.isfile(MODEL_PATH):
-    raise RuntimeError(f"Model file not found at {MODEL_PATH}")
-
-interpreter = tf.lite.Interpreter(model_path=MODEL_PATH)
-interpreter.allocate_tensors()
-input_details  = interpreter.get_input_details()[0]
-output_details = interpreter.get_output_details()[0]
-
-CLASS_NAMES = [
-    "Pepper_bell_Bacterial_spot",
-    "Pepperbell_healthy",
-    "Potato_Early_blight",
-    "Potato_Late_blight",
-    "Potato_healthy",
-    "Tomato_Bacterial_spot",
-    "Tomato_Early_blight",
-    "Tomato_Late_blight",
-    "Tomato_Leaf_Mold",
-    "Tomato_Septoria_leaf_spot",
-    "Tomato_Spider_mites_Two_spotted_spider_mite",
-    "TomatoTarget_Spot",
-    "TomatoTomato_YellowLeafCurl_Virus",
-    "Tomato_Tomato_mosaic_virus",
-    "Tomato_healthy"
-]
-assert len(CLASS_NAMES) == 15
-
-def preprocess_image(image_bytes: bytes) -> np.ndarray:
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img = img.resize((256, 256), Image.BILINEAR)
-    arr = np.asarray(img, dtype=np.float32) / 255.0
-    return np.expand_dims(arr, axis=0)
-
-# Ollama Setup
-OLLAMA_BIN = r"C:\Users\sp284\AppData\Local\Programs\Ollama\ollama.exe"
-MODEL_NAME  = "qwen3:4b"
-
-# Map front‑end language codes to human names
-LANG_MAP = {
-    "en": "English",
-    "hi": "Hindi",
-    "ta": "Tamil",
-    "gu": "Gujarati"
-}
+# Share the inference engine with the CropIQ server
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "server"))
+from inference.engine import CLASS_NAMES, load_engine, top_predictions
+from inference.preprocess import InvalidImage
+from inference.upload import (
+    read_upload, UploadTooLarge, DEFAULT_MAX_BYTES, DEFAULT_MAX_PIXELS, DEFAULT_SPOOL_BYTES, FORM_OVERHEAD_BYTES
+)
+from llm.guard import LLMCircuitOpen, LLMGuard, LLMRejected
+from llm.knowledge import KnowledgeStore
+from llm.ollama import LLMError, LLMTimeout, load_client
+from llm.plant_results import PlantResultsIndex
+from llm.prompts import DISEASE_INFO_KEYS, disease_info_prompt, normalize_lang, parse_json_reply, prompt_version
+from llm.singleflight import SingleFlight
+from llm.stream_json import JSONStreamParser
+
+# Upload limits - bodies over the byte limit are refused before they are read
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+UPLOAD_MAX_PIXELS = int(os.getenv("UPLOAD_MAX_PIXELS", str(DEFAULT_MAX_PIXELS)))
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_BYTES + FORM_OVERHEAD_BYTES
+
+# Model Setup - a missing or broken model disables /analyze instead of crashing at import
+MODEL_PATH = os.getenv("DISEASE_MODEL_PATH") or os.path.join(os.getcwd(), "model", "plant_leaf_diseases_model.tflite")
+try:
+    if not os.path.isfile(MODEL_PATH):
+        raise RuntimeError(f"Model file not found at {MODEL_PATH}")
+    disease_engine = load_engine(
+        MODEL_PATH,
+        os.getenv("DISEASE_BACKEND", "auto"),
+        runtime=os.getenv("DISEASE_RUNTIME", "auto")
+    )
+    print(f"Inference backend: {disease_engine.backend.name} ({disease_engine.backend.runtime})")
+except Exception as e:
+    print(f"Error loading disease detection model: {e}")
+    disease_engine = None
+
+# Ollama Setup - the local REST API over pooled keep-alive connections, with `ollama run`
+# as the fallback when the server isn't up. The guard caps concurrent calls and skips
+# Ollama while it is overloaded or failing, so /analyze still returns the prediction.
+OLLAMA_BIN = os.getenv("OLLAMA_BIN", r"C:\Users\sp284\AppData\Local\Programs\Ollama\ollama.exe")
+MODEL_NAME  = os.getenv("OLLAMA_MODEL", "qwen3:4b")
+llm_client = LLMGuard(
+    load_client(
+        os.getenv("OLLAMA_URL", "http://localhost:11434"),
+        MODEL_NAME,
+        bin=OLLAMA_BIN,
+        connect_timeout=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "2")),
+        timeout=float(os.getenv("OLLAMA_TIMEOUT", "120")),
+        pool_size=int(os.getenv("OLLAMA_POOL_SIZE", "4"))
+    ),
+    max_concurrent=int(os.getenv("OLLAMA_MAX_CONCURRENT", "2")),
+    max_queue=int(os.getenv("OLLAMA_MAX_QUEUE", "8")),
+    queue_timeout=float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "5")),
+    failure_threshold=int(os.getenv("OLLAMA_BREAKER_FAILURES", "3")),
+    cooldown=float(os.getenv("OLLAMA_BREAKER_COOLDOWN", "30"))
+)
+
+# Precomputed disease details (server/prewarm_knowledge.py); only missing ones go to Ollama
+KNOWLEDGE_PATH = os.getenv("DISEASE_KNOWLEDGE_PATH") or os.path.join(os.getcwd(), "model", "disease_knowledge.sqlite3")
+try:
+    os.makedirs(os.path.dirname(os.path.abspath(KNOWLEDGE_PATH)), exist_ok=True)
+    knowledge_store = KnowledgeStore(KNOWLEDGE_PATH, prompt_version(MODEL_NAME))
+except Exception as e:
+    print(f"Error opening disease knowledge store {KNOWLEDGE_PATH}: {e}")
+    knowledge_store = None
+
+# Curated disease details exported by Scripts/convert_csv_to_json.py, indexed in memory;
+# a class with a record is answered from it before the knowledge store or Ollama
+PLANT_RESULTS_PATH = os.getenv("PLANT_RESULTS_PATH") or os.path.join(os.getcwd(), "src", "data", "plantResults.json")
+plant_results = None
+if os.path.isfile(PLANT_RESULTS_PATH):
+    try:
+        plant_results = PlantResultsIndex(PLANT_RESULTS_PATH)
+        print(f"plantResults index: {plant_results.stats()['entries']} entries from {plant_results.records} records")
+    except Exception as e:
+        print(f"Error loading {PLANT_RESULTS_PATH}: {e}")
+
+def lookup_disease_info(predicted, lang_code):
+    """Disease details from plantResults.json or the knowledge store, None if Ollama has to generate them"""
+    llm = plant_results.get(predicted, lang_code) if plant_results else None
+    if llm is None and knowledge_store:
+        llm = knowledge_store.get(predicted, lang_code)
+    return llm
+
+# Concurrent requests for the same class and language share one Ollama call
+llm_flights = SingleFlight()
+
+def generate_disease_info(predicted, lang_code):
+    """Ask Ollama for the disease details and keep them for the next request; raises LLMError or ValueError"""
+    llm_out = llm_client.generate(disease_info_prompt(predicted, lang_code))
+    try:
+        llm = parse_json_reply(llm_out)
+    except ValueError:
+        app.logger.error("No JSON found in Ollama output: %s", llm_out)
+        raise
+    if knowledge_store:
+        knowledge_store.put(predicted, lang_code, llm)
+    return llm
+
+def classify_request():
+    """Validate the form and classify the uploaded leaf, as ((predicted, confidence, top3, lang_code), None)
+    or (None, error response)"""
+    # 1) Validate inputs: we only require the image file and language
+    if "file" not in request.files or "lang" not in request.form:
+        return None, (jsonify({"error": "file and lang are required"}), 400)
+
+    lang_code = normalize_lang(request.form["lang"].strip())
+
+    try:
+        upload = read_upload(request.files["file"].stream, UPLOAD_MAX_BYTES, DEFAULT_SPOOL_BYTES)
+    except UploadTooLarge as e:
+        return None, (jsonify({"error": str(e)}), 413)
+
+    # 2) Model inference
+    try:
+        with upload:
+            data = disease_engine.preprocess(upload.open(), max_pixels=UPLOAD_MAX_PIXELS)
+    except InvalidImage as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    out = disease_engine.scores([data])[0]
+
+    if out.shape[0] != len(CLASS_NAMES):
+        return None, (jsonify({
+            "error": "Model output length mismatch",
+            "output_len": int(out.shape[0]),
+            "num_classes": len(CLASS_NAMES)
+        }), 500)
+
+    return (*top_predictions(out), lang_code), None
 
 @app.route("/analyze", methods=["POST"])
 @cross_origin()
 def analyze():
+    if disease_engine is None:
+        return jsonify({"error": "Model not loaded - model file not found or failed to load"}), 500
+
     try:
-        # 1) Validate inputs: we only require the image file and language
-        if "file" not in request.files or "lang" not in request.form:
-            return jsonify({"error": "file and lang are required"}), 400
-
-        lang_code = request.form["lang"].strip()
-        lang_name = LANG_MAP.get(lang_code, "English")
-
-        img_bytes = request.files["file"].read()
-
-        # 2) TFLite inference
-        data = preprocess_image(img_bytes)
-        interpreter.set_tensor(input_details["index"], data)
-        interpreter.invoke()
-        raw_output = interpreter.get_tensor(output_details["index"])
-        out = np.array(raw_output).flatten()
-
-        if out.shape[0] != len(CLASS_NAMES):
-            return jsonify({
-                "error": "Model output length mismatch",
-                "output_len": int(out.shape[0]),
-                "num_classes": len(CLASS_NAMES)
-            }), 500
-
-        top_idx  = int(np.argmax(out))
-        top3_idx = np.argsort(out)[-3:][::-1]
-        top3 = [{"label": CLASS_NAMES[i], "score": float(out[i]*100)} for i in top3_idx]
-
-        predicted  = CLASS_NAMES[top_idx]
-        confidence = float(out[top_idx]*100)
-
-        # 3) Infer the plant name from the predicted class
-        plant = predicted.split('_')[0]
-
-        # 4) Build Ollama prompt
-        full_prompt = (
-            f"Plant: {plant}\n"
-            f"Disease: {predicted}\n\n"
-            "Respond ONLY with a raw JSON object. Do not include explanations or extra text.\n"
-            "The JSON must have these keys:\n"
-            "  disease_type, symptoms, prevention, treatments, fertilizers, expected_yield\n"
-            f"Please respond in {lang_name}."
-        )
-
-        # 5) Run Ollama CLI
-        try:
-            proc = subprocess.run(
-                [OLLAMA_BIN, "run", MODEL_NAME, full_prompt],
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='ignore',
-                timeout=120
-            )
-        except subprocess.TimeoutExpired:
-            return jsonify({"error": "LLM call timed out"}), 504
-
-        if proc.returncode != 0:
-            app.logger.error("Ollama stderr: %s", proc.stderr)
-            return jsonify({"error": "LLM call failed", "details": proc.stderr.strip()}), 500
-
-        llm_out = proc.stdout.strip()
-
-        # 6) Extract JSON substring
-        m = re.search(r"(\{.*\})", llm_out, re.DOTALL)
-        if not m:
-            app.logger.error("No JSON found in Ollama output: %s", llm_out)
-            return jsonify({"error": "Invalid LLM response"}), 500
-
-        llm = json.loads(m.group(1))
-
-        # 7) Build final response
+        prediction, error = classify_request()
+        if error:
+            return error
+        predicted, confidence, top3, lang_code = prediction
+
+        # 3) Look up the curated or precomputed details, asking Ollama only if they are missing
+        llm = lookup_disease_info(predicted, lang_code)
+        enrichment = None
+        if llm is None:
+            # 4) One Ollama call per class and language at a time; identical requests share it
+            try:
+                llm = llm_flights.do((MODEL_NAME, predicted, lang_code), generate_disease_info, predicted, lang_code)
+            except LLMRejected as e:
+                # Ollama is overloaded or failing: answer with the prediction alone
+                llm = {}
+                enrichment = {"status": "unavailable" if isinstance(e, LLMCircuitOpen) else "busy"}
+            except LLMTimeout:
+                return jsonify({"error": "LLM call timed out"}), 504
+            except LLMError as e:
+                app.logger.error("Ollama call failed: %s", e)
+                return jsonify({"error": "LLM call failed", "details": str(e)}), 500
+            except ValueError:
+                return jsonify({"error": "Invalid LLM response"}), 500
+
+        # 5) Build final response
         resp = {
             "predicted":      predicted,
             "confidence":     confidence,
             "top3":           top3,
-            "disease_type":   llm.get("disease_type", ""),
-            "symptoms":       llm.get("symptoms", ""),
-            "prevention":     llm.get("prevention", ""),
-            "treatments":     llm.get("treatments", ""),
-            "fertilizers":    llm.get("fertilizers", ""),
-            "expected_yield": llm.get("expected_yield", "")
+            **{key: llm.get(key, "") for key in DISEASE_INFO_KEYS}
         }
+        if enrichment:
+            resp["enrichment"] = enrichment
         return jsonify(resp)
 
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Image file too large"}), 413
     except Exception as e:
         app.logger.exception("Error in /analyze")
         return jsonify({"error": str(e)}), 500
 
+def sse(event, data):
+    """One server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_disease_info(predicted, lang_code):
+    """Yield delta and field events as Ollama writes the details, then return them"""
+    parser = JSONStreamParser()
+    for chunk in llm_client.stream(disease_info_prompt(predicted, lang_code)):
+        for kind, key, value in parser.feed(chunk):
+            if key in DISEASE_INFO_KEYS:
+                yield sse(kind, {"key": key, ("text" if kind == "delta" else "value"): value})
+    llm = parser.finish()
+    if knowledge_store:
+        knowledge_store.put(predicted, lang_code, llm)
+    return llm
+
+def field_events(llm):
+    """A field event for each of the details"""
+    for key in DISEASE_INFO_KEYS:
+        yield sse("field", {"key": key, "value": llm.get(key, "")})
+
+@app.route("/analyze/stream", methods=["POST"])
+@cross_origin()
+def analyze_stream():
+    """/analyze as server-sent events: the prediction first, then the details as Ollama generates them"""
+    if disease_engine is None:
+        return jsonify({"error": "Model not loaded - model file not found or failed to load"}), 500
+
+    try:
+        prediction, error = classify_request()
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Image file too large"}), 413
+    if error:
+        return error
+    predicted, confidence, top3, lang_code = prediction
+
+    def events():
+        yield sse("prediction", {"predicted": predicted, "confidence": confidence, "top3": top3})
+
+        llm = lookup_disease_info(predicted, lang_code)
+        enrichment = None
+        try:
+            if llm is None:
+                # Identical requests share one Ollama stream; if an /analyze call for the same
+                # details is already in flight, its result is sent as fields once it arrives
+                llm = yield from llm_flights.stream(
+                    (MODEL_NAME, predicted, lang_code), stream_disease_info, predicted, lang_code, replay=field_events
+                )
+            else:
+                yield from field_events(llm)
+        except LLMRejected as e:
+            llm = {}
+            enrichment = {"status": "unavailable" if isinstance(e, LLMCircuitOpen) else "busy"}
+        except LLMTimeout:
+            yield sse("error", {"error": "LLM call timed out"})
+            return
+        except LLMError as e:
+            app.logger.error("Ollama call failed: %s", e)
+            yield sse("error", {"error": "LLM call failed", "details": str(e)})
+            return
+        except ValueError:
+            yield sse("error", {"error": "Invalid LLM response"})
+            return
+
+        # The same body /analyze returns
+        resp = {
+            "predicted":      predicted,
+            "confidence":     confidence,
+            "top3":           top3,
+            **{key: llm.get(key, "") for key in DISEASE_INFO_KEYS}
+        }
+        if enrichment:
+            resp["enrichment"] = enrichment
+        yield sse("done", resp)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """Where disease details came from: plantResults.json and knowledge-store hit ratios, Ollama calls"""
+    return jsonify({
+        "plant_results": plant_results.stats() if plant_results else None,
+        "knowledge": knowledge_store.stats() if knowledge_store else None,
+        "llm": llm_client.stats(),
+        "llm_coalescing": llm_flights.stats()
+    })
+
 if __name__ == "__main__":
     app.run(port=5000, debug=True)
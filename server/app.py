@@ -1,115 +1,501 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 import numpy as np
-import tensorflow as tf
+from PIL import Image
 from flask_cors import CORS
 from routes.auth import auth_bp  # Import the auth blueprint
-from PIL import Image
-import io
 import random
 import os
-import subprocess
-import re
 import json
-from fertilizer_ml import fertilizer_predictor  # Import ML predictor
+import functools
+import hmac
+import io
+import threading
+import time
+import zipfile
+import zlib
+from werkzeug.exceptions import RequestEntityTooLarge
+from fertilizer_ml import fertilizer_predictor, FertilizerMLPredictor, MODEL_FILES as FERTILIZER_MODEL_FILES  # Import ML predictor
+from inference.engine import CLASS_NAMES, load_engine, build_detection_response
+from inference.cache import PredictionCache, file_digest, files_digest
+from inference.near_dup import NearDuplicateCache, dhash
+from inference.leaf_gate import LeafGate
+from inference.tiling import TiledPredictor
+from inference.preprocess import InvalidImage, ImageTooLarge, decode_leaf_image_fit, stats as preprocess_stats
+from inference.upload import read_upload, UploadTooLarge, format_bytes, FORM_OVERHEAD_BYTES
+from inference.batching import MicroBatcher
+from inference.decode_pool import DecodePool
+from inference.reload import ModelSlot, ServingModel, FileWatcher
+from inference import preprocess
+from llm.guard import LLMGuard, LLMRejected
+from llm.ollama import load_client as load_llm_client
+from llm.singleflight import SingleFlight
+from llm.jobs import EnrichmentJobs, JobQueueFull
+from llm.knowledge import KnowledgeStore
+from llm.prompts import DISEASE_INFO_KEYS, disease_info_prompt, normalize_lang, parse_json_reply, prompt_version
+from utils.metrics import Counter, Gauge, Histogram, collect, render_prometheus, PROMETHEUS_CONTENT_TYPE
+from config import (
+    DISEASE_POOL_SIZE, DISEASE_NUM_THREADS, DISEASE_POOL_TIMEOUT,
+    DISEASE_MAX_BATCH_SIZE, DISEASE_MAX_BATCH_WAIT_MS,
+    DISEASE_BATCH_CHUNK_SIZE, DISEASE_BATCH_MAX_IMAGES, DISEASE_RUNTIME,
+    DISEASE_CACHE_SIZE, DISEASE_CACHE_TTL,
+    DISEASE_NEAR_DUP_ENABLED, DISEASE_NEAR_DUP_THRESHOLD, DISEASE_NEAR_DUP_SIZE,
+    DISEASE_MODEL_PATH, DISEASE_BACKEND, DISEASE_DECODE_WORKERS, DISEASE_WARMUP_RUNS,
+    MODEL_WATCH_INTERVAL, ADMIN_TOKEN,
+    DISEASE_GATE_ENABLED, DISEASE_GATE_MIN_FOLIAGE, DISEASE_GATE_MIN_CONTRAST,
+    DISEASE_TILE_GATE, DISEASE_TILE_OVERLAP, DISEASE_TILE_MAX_SIDE, DISEASE_TILE_MAX_TILES,
+    OLLAMA_ENABLED, OLLAMA_URL, OLLAMA_MODEL, OLLAMA_BIN, OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUT, OLLAMA_POOL_SIZE,
+    OLLAMA_MAX_CONCURRENT, OLLAMA_MAX_QUEUE, OLLAMA_QUEUE_TIMEOUT, OLLAMA_BREAKER_FAILURES, OLLAMA_BREAKER_COOLDOWN,
+    DISEASE_KNOWLEDGE_PATH, ENRICHMENT_WORKERS, ENRICHMENT_MAX_PENDING, ENRICHMENT_JOB_TTL, ENRICHMENT_MAX_WAIT,
+    UPLOAD_MAX_BYTES, UPLOAD_MAX_PIXELS, UPLOAD_MAX_REQUEST_BYTES, UPLOAD_SPOOL_BYTES, UPLOAD_MAX_ZIP_RATIO
+)
+
+# Per-stage latency of the request path. /metrics exports these together with the counters
+# and histograms every component already keeps (caches, pool, batcher, decode workers, leaf gate)
+upload_read_seconds = Histogram("disease_upload_read_seconds", "Time to receive and spool a leaf upload")
+inference_seconds = Histogram(
+    "disease_inference_seconds", "Time from decoded image to scores, including pool and batch waits"
+)
+ollama_seconds = Histogram(
+    "ollama_enrichment_seconds", "Time to get disease details from Ollama",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+)
+response_json_seconds = Histogram(
+    "response_json_seconds", "Time to serialize a JSON response",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+)
+predict_npk_seconds = Histogram("fertilizer_predict_npk_seconds", "Time in fertilizer_predictor.predict_npk")
+recommend_plants_seconds = Histogram("recommend_plants_seconds", "Time to build plant recommendations")
+model_errors = Counter("disease_model_errors_total", "Disease detections that failed with a server error")
+fertilizer_errors = Counter("fertilizer_errors_total", "Fertilizer recommendations that failed with a server error")
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing every response body it serializes"""
+    def dumps(self, obj, **kwargs):
+        with response_json_seconds.time():
+            return super().dumps(obj, **kwargs)
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 CORS(app, origins=["http://localhost:5173"])  # This enables CORS for all routes
 app.register_blueprint(auth_bp)  # Register the auth blueprint
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_REQUEST_BYTES  # Werkzeug stops reading bodies past this with a 413
 
 # TFLite Model Setup - New high-accuracy model
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "model", "plant_leaf_diseases_model.tflite")
-CLASS_NAMES = [
-    "Pepper_bell_Bacterial_spot",
-    "Pepperbell_healthy",
-    "Potato_Early_blight",
-    "Potato_Late_blight",
-    "Potato_healthy",
-    "Tomato_Bacterial_spot",
-    "Tomato_Early_blight",
-    "Tomato_Late_blight",
-    "Tomato_Leaf_Mold",
-    "Tomato_Septoria_leaf_spot",
-    "Tomato_Spider_mites_Two_spotted_spider_mite",
-    "TomatoTarget_Spot",
-    "TomatoTomato_YellowLeafCurl_Virus",
-    "Tomato_Tomato_mosaic_virus",
-    "Tomato_healthy"
-]
+MODEL_PATH = DISEASE_MODEL_PATH or os.path.join(os.path.dirname(__file__), "model", "plant_leaf_diseases_model.tflite")
+
+# The disease model and the fertilizer predictor are served from slots that can be hot-swapped:
+# a reload builds and warms the new version off to the side, swaps it in, and the old one is
+# closed once its in-flight requests finish. Every response carries the version that served it.
+disease_slot = ModelSlot("disease")
+fertilizer_slot = ModelSlot("fertilizer")
+
+# Loading and warm-up run in a background thread so the server comes up immediately;
+# /healthz/ready returns 503 until the model is loaded and hot.
+model_loaded = False
+model_ready = threading.Event()  # set once loading and warm-up have finished, successfully or not
+model_watcher = None
+warmup_status = {
+    "state": "loading",
+    "error": None,
+    "load_ms": None
+}
 
-# Load TFLite model
-try:
+def build_disease_model() -> ServingModel:
+    """Load the disease model with its interpreter pool, batcher and decode pool, ready to be swapped in"""
     if not os.path.isfile(MODEL_PATH):
         raise RuntimeError(f"Model file not found at {MODEL_PATH}")
+    version = file_digest(MODEL_PATH)
+    
+    # TFLite prefers the standalone LiteRT/tflite-runtime interpreter over importing all of TensorFlow
+    engine = load_engine(
+        MODEL_PATH,
+        DISEASE_BACKEND,
+        pool_size=DISEASE_POOL_SIZE,
+        num_threads=DISEASE_NUM_THREADS,
+        runtime=DISEASE_RUNTIME
+    )
+    print(f"Inference backend: {engine.backend.name} ({engine.backend.runtime})")
+    
+    # Group concurrent requests into batched invokes when enabled (TFLite interpreter pool only)
+    interpreter_pool = getattr(engine.backend, "pool", None)
+    batcher = None
+    if DISEASE_MAX_BATCH_SIZE > 1 and interpreter_pool:
+        batcher = MicroBatcher(
+            interpreter_pool,
+            max_batch_size=DISEASE_MAX_BATCH_SIZE,
+            max_wait_ms=DISEASE_MAX_BATCH_WAIT_MS
+        )
+    # Decode and resize uploads in worker processes so that stage scales across cores on its own
+    decode_pool = None
+    if DISEASE_DECODE_WORKERS > 0:
+        decode_pool = DecodePool(
+            DISEASE_DECODE_WORKERS,
+            size=engine.input_size,
+            max_pixels=UPLOAD_MAX_PIXELS
+        )
+    
+    # Tiled mode cuts wide photos into tiles of this model's input size; with DISEASE_TILE_GATE
+    # on (the default, independent of the upload pre-filter) leafless tiles are skipped
+    tile_gate = LeafGate(
+        min_foliage=DISEASE_GATE_MIN_FOLIAGE if DISEASE_TILE_GATE else 0,
+        min_contrast=DISEASE_GATE_MIN_CONTRAST if DISEASE_TILE_GATE else 0
+    )
+    tiler = TiledPredictor(
+        engine.input_size, overlap=DISEASE_TILE_OVERLAP, max_side=DISEASE_TILE_MAX_SIDE,
+        gate=tile_gate, max_tiles=DISEASE_TILE_MAX_TILES
+    )
+    
+    def close():
+        if batcher:
+            batcher.close()
+        if decode_pool:
+            decode_pool.close()
     
-    interpreter = tf.lite.Interpreter(model_path=MODEL_PATH)
-    interpreter.allocate_tensors()
-    input_details = interpreter.get_input_details()[0]
-    output_details = interpreter.get_output_details()[0]
-    model_loaded = True
     print(f"TFLite disease detection model loaded successfully from {MODEL_PATH}!")
+    print(f"Inference pool: {DISEASE_POOL_SIZE} x {DISEASE_NUM_THREADS} threads")
+    if batcher:
+        print(f"Micro-batching: up to {DISEASE_MAX_BATCH_SIZE} images / {DISEASE_MAX_BATCH_WAIT_MS}ms")
+    if decode_pool:
+        print(f"Decode pool: {DISEASE_DECODE_WORKERS} worker processes")
+    print(f"Model version: {version}")
+    if interpreter_pool and interpreter_pool.quantized_input:
+        print(f"Quantized model input: {interpreter_pool.input_details['dtype'].__name__}")
     print(f"Model supports {len(CLASS_NAMES)} classes")
-except Exception as e:
-    print(f"Error loading TFLite disease detection model: {e}")
-    print("Disease detection will not be available")
-    interpreter = None
-    input_details = None
-    output_details = None
-    model_loaded = False
+    return ServingModel(
+        version,
+        close=close,
+        engine=engine,
+        interpreter_pool=interpreter_pool,
+        batcher=batcher,
+        decode_pool=decode_pool,
+        tiler=tiler,
+        warmup={}
+    )
+
+def fertilizer_version():
+    try:
+        return files_digest(FERTILIZER_MODEL_FILES)
+    except OSError:
+        return None
+
+def build_fertilizer_model() -> ServingModel:
+    """Load the fertilizer predictor from its .pkl files, ready to be swapped in"""
+    version = fertilizer_version()
+    predictor = FertilizerMLPredictor()
+    if not predictor.models_loaded:
+        raise RuntimeError("Fertilizer models failed to load")
+    return ServingModel(version, predictor=predictor)
+
+def warm_up_fertilizer_model(model):
+    """Run one prediction so the new predictor's first request isn't its slowest"""
+    info = model.predictor.get_model_info()
+    model.predictor.predict_npk(
+        info['supported_plants'][0], info['supported_stages'][0], info['supported_soils'][0], 25
+    )
+
+# The predictor fertilizer_ml loaded at import serves until the first reload
+fertilizer_slot.swap(ServingModel(fertilizer_version(), predictor=fertilizer_predictor))
+
+# Repeat uploads of the same photo are answered from this cache without touching the interpreter
+prediction_cache = PredictionCache(max_entries=DISEASE_CACHE_SIZE, ttl_seconds=DISEASE_CACHE_TTL)
+
+# Optional perceptual-hash cache for re-shot or recompressed copies of the same leaf
+near_dup_cache = None
+if DISEASE_NEAR_DUP_ENABLED:
+    near_dup_cache = NearDuplicateCache(
+        threshold=DISEASE_NEAR_DUP_THRESHOLD,
+        max_entries=DISEASE_NEAR_DUP_SIZE,
+        ttl_seconds=DISEASE_CACHE_TTL
+    )
+
+# Cheap colour check ahead of the model: blank frames, soil, selfies and screenshots are
+# answered without an invoke
+leaf_gate = None
+if DISEASE_GATE_ENABLED:
+    leaf_gate = LeafGate(min_foliage=DISEASE_GATE_MIN_FOLIAGE, min_contrast=DISEASE_GATE_MIN_CONTRAST)
+
+def rejected_image_response(rejection):
+    """(payload, status) for an upload the leaf pre-filter decided is not a leaf"""
+    if rejection["reason"] == "blank":
+        message = "The image looks blank - please upload a photo of a plant leaf"
+    else:
+        message = "No leaf found in the image - please upload a close-up photo of a plant leaf"
+    return {"error": message, "not_a_leaf": True, **rejection}, 422
 
 # Ollama Setup (Optional - for enhanced information)
-# Configure Ollama path and model name - set to None to disable
-OLLAMA_BIN = None  # Set to r"C:\Users\tomie\AppData\Local\Programs\Ollama\ollama.exe" if Ollama is installed
-OLLAMA_MODEL = "qwen3:4b"  # or "llama3:4b" or any other model you have
+# Set OLLAMA_ENABLED=true to enable. Calls go to Ollama's REST API over pooled keep-alive
+# connections; if the server is down and OLLAMA_BIN is set, `ollama run` answers instead.
+# The guard caps concurrent calls and skips Ollama while it is overloaded or failing.
+llm_backend = None
+llm_client = None
+if OLLAMA_ENABLED:
+    llm_backend = load_llm_client(
+        OLLAMA_URL, OLLAMA_MODEL, bin=OLLAMA_BIN,
+        connect_timeout=OLLAMA_CONNECT_TIMEOUT, timeout=OLLAMA_TIMEOUT, pool_size=OLLAMA_POOL_SIZE
+    )
+    llm_client = LLMGuard(
+        llm_backend, max_concurrent=OLLAMA_MAX_CONCURRENT, max_queue=OLLAMA_MAX_QUEUE,
+        queue_timeout=OLLAMA_QUEUE_TIMEOUT, failure_threshold=OLLAMA_BREAKER_FAILURES,
+        cooldown=OLLAMA_BREAKER_COOLDOWN
+    )
+
+# Disease details for every class and language, generated ahead of time by prewarm_knowledge.py.
+# Served without Ollama running; with Ollama enabled, anything missing is generated once and stored.
+KNOWLEDGE_PATH = DISEASE_KNOWLEDGE_PATH or os.path.join(os.path.dirname(__file__), "model", "disease_knowledge.sqlite3")
+knowledge_store = None
+if os.path.exists(KNOWLEDGE_PATH) or llm_client:
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(KNOWLEDGE_PATH)), exist_ok=True)
+        knowledge_store = KnowledgeStore(KNOWLEDGE_PATH, prompt_version(OLLAMA_MODEL))
+        print(f"Disease knowledge store: {knowledge_store.stats()['entries']} entries for {knowledge_store.version}")
+    except Exception as e:
+        print(f"Error opening disease knowledge store {KNOWLEDGE_PATH}: {e}")
+
+def preprocess_image(image, model) -> np.ndarray:
+    """Preprocess image for the disease model - validate and decode to its input size as uint8 in one pass
+
+    Accepts bytes or a file object. Images over UPLOAD_MAX_PIXELS are rejected from their header
+    before decoding. Normalization to [0, 1] happens when the pixels are written into the model's input.
+    With DISEASE_DECODE_WORKERS set, decoding runs in the decode pool's worker processes instead.
+    """
+    if model.decode_pool:
+        return model.decode_pool.decode(image.read() if hasattr(image, "read") else image, timeout=DISEASE_POOL_TIMEOUT)
+    return model.engine.preprocess(image, max_pixels=UPLOAD_MAX_PIXELS)
+
+def run_inference(image: np.ndarray, model) -> np.ndarray:
+    """Run the disease model on one preprocessed image and return its flat score vector"""
+    if model.batcher:
+        return np.asarray(model.batcher.predict(image, timeout=DISEASE_POOL_TIMEOUT)).flatten()
+    return model.engine.scores([image], timeout=DISEASE_POOL_TIMEOUT)[0]
+
+def run_batch_inference(batch: list, model) -> np.ndarray:
+    """Run a list of preprocessed images and return an (N, num_classes) score array"""
+    return model.engine.scores(batch, timeout=DISEASE_POOL_TIMEOUT)
+
+def synthetic_leaf_jpeg(width=1024, height=768) -> bytes:
+    """A noisy leaf-coloured JPEG for warm-up, large enough to take the reduced-resolution decode path"""
+    rng = np.random.default_rng(0)
+    pixels = np.clip(rng.normal((60, 140, 50), 30, (height, width, 3)), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+def warm_up_model(model, runs=None):
+    """Push synthetic uploads through a disease model's decode and inference until it is hot
+
+    Times one cold request, runs one concurrent round so every pooled interpreter has
+    invoked at least once, then records the median of `runs` sequential warm requests.
+    """
+    runs = DISEASE_WARMUP_RUNS if runs is None else runs
+    sample = synthetic_leaf_jpeg()
+    
+    def request_ms():
+        start = time.perf_counter()
+        run_inference(preprocess_image(sample, model), model)
+        return (time.perf_counter() - start) * 1000
+    
+    model.warmup["cold_latency_ms"] = round(request_ms(), 2)
+    pool_size = (model.engine.stats() or {}).get("size", 1)
+    if pool_size > 1:
+        threads = [threading.Thread(target=request_ms) for _ in range(pool_size)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    timings = sorted(request_ms() for _ in range(runs))
+    model.warmup["warm_latency_ms"] = round(timings[len(timings) // 2], 2) if timings else None
+    model.warmup["warmup_runs"] = runs
+    print(f"Disease model {model.version} warm: cold request {model.warmup['cold_latency_ms']}ms, "
+          f"warm request {model.warmup['warm_latency_ms']}ms")
+
+def reload_disease_model():
+    """Build and warm the disease model from MODEL_PATH and swap it in; returns (version, reloaded)"""
+    global model_loaded
+    if disease_slot.current and disease_slot.version == file_digest(MODEL_PATH):
+        return disease_slot.version, False
+    model = disease_slot.reload(build_disease_model, warm_up=warm_up_model)
+    model_loaded = True
+    warmup_status.update(state="ready", error=None)
+    return model.version, True
+
+def reload_fertilizer_model():
+    """Build and warm the fertilizer predictor from its .pkl files and swap it in; returns (version, reloaded)"""
+    if fertilizer_slot.current.predictor.models_loaded and fertilizer_slot.version == fertilizer_version():
+        return fertilizer_slot.version, False
+    model = fertilizer_slot.reload(build_fertilizer_model, warm_up=warm_up_fertilizer_model)
+    return model.version, True
+
+def watch_model_files():
+    """Reload whichever model's files changed on disk"""
+    def on_change():
+        for reload in (reload_disease_model, reload_fertilizer_model):
+            try:
+                reload()
+            except Exception as e:
+                print(f"Model reload failed, keeping the current version: {e}")
+    return FileWatcher([MODEL_PATH] + FERTILIZER_MODEL_FILES, on_change, interval=MODEL_WATCH_INTERVAL)
+
+def load_and_warm_up():
+    """Background startup: load and warm up the disease model, then mark the worker ready"""
+    global model_watcher
+    start = time.perf_counter()
+    try:
+        reload_disease_model()
+    except Exception as e:
+        print(f"Error loading TFLite disease detection model: {e}")
+        print("Disease detection will not be available")
+        warmup_status["state"] = "failed"
+        warmup_status["error"] = str(e)
+    finally:
+        warmup_status["load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        model_ready.set()
+    # Watch even after a failed load, so dropping the model file in place brings the worker up
+    if MODEL_WATCH_INTERVAL > 0:
+        model_watcher = watch_model_files()
 
-def preprocess_image(image_bytes: bytes) -> np.ndarray:
-    """Preprocess image for TFLite model - resize to 256x256 and normalize"""
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img = img.resize((256, 256), Image.BILINEAR)
-    arr = np.asarray(img, dtype=np.float32) / 255.0
-    return np.expand_dims(arr, axis=0)
+def readiness_response():
+    """Readiness for load balancers as (payload, status): 200 only once the model is loaded and warm"""
+    model = disease_slot.current
+    ready = model_ready.is_set() and model is not None
+    payload = {
+        "ready": ready,
+        "state": "ready" if model else warmup_status["state"],
+        "error": warmup_status["error"],
+        "load_ms": warmup_status["load_ms"],
+        "model_loaded": model_loaded,
+        "model_version": model.version if model else None,
+        "backend": model.engine.backend.name if model else None,
+        "cold_latency_ms": model.warmup.get("cold_latency_ms") if model else None,
+        "warm_latency_ms": model.warmup.get("warm_latency_ms") if model else None,
+        "warmup_runs": model.warmup.get("warmup_runs", 0) if model else 0
+    }
+    return payload, 200 if ready else 503
+
+def model_unavailable_response():
+    """(payload, status) for disease requests that arrive while the model is not loaded"""
+    if not model_ready.is_set():
+        return {'error': 'Disease model is still loading, please retry shortly'}, 503
+    return {'error': 'Model not loaded - TFLite model file not found or failed to load'}, 500
+
+def model_version_headers(payload):
+    """X-Model-Version header for a response payload that records the model version that served it"""
+    version = payload.get("model_version") if isinstance(payload, dict) else None
+    return {"X-Model-Version": version} if version else {}
+
+threading.Thread(target=load_and_warm_up, name="disease-model-loader", daemon=True).start()
+
+def list_batch_images(files):
+    """(filename, open, ZipInfo or None) for each image in the (filename, stream) files uploaded
+
+    Zip archives are listed from their central directory without extracting anything;
+    open() returns an image's stream once it is its turn. Raises zipfile.BadZipFile.
+    """
+    images = []
+    for filename, stream in files:
+        if zipfile.is_zipfile(stream):
+            stream.seek(0)
+            archive = zipfile.ZipFile(stream)
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                # Skip folders and OS metadata such as __MACOSX/ and .DS_Store
+                if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX'):
+                    continue
+                images.append((info.filename, functools.partial(archive.open, info), info))
+        else:
+            images.append((filename, functools.partial(rewound, stream), None))
+    return images
+
+def rewound(stream):
+    stream.seek(0)
+    return stream
+
+def check_batch_archives(images):
+    """Error message if the zipped images would unpack to more than the request allows, else None
+
+    Checked on the sizes the archive declares, which zipfile holds each member to when reading it.
+    """
+    unpacked = 0
+    for filename, _, info in images:
+        if info is None or info.file_size > UPLOAD_MAX_BYTES:
+            continue  # read as sent, or refused on its own line
+        if info.file_size > UPLOAD_MAX_ZIP_RATIO * max(info.compress_size, 1):
+            return f'{filename} is compressed over {UPLOAD_MAX_ZIP_RATIO:.0f}:1, which no leaf photo is'
+        unpacked += info.file_size
+        if unpacked > UPLOAD_MAX_REQUEST_BYTES:
+            return f'Zip archives unpack to more than {format_bytes(UPLOAD_MAX_REQUEST_BYTES)}'
+    return None
+
+def iter_batch_uploads(images):
+    """Yield (filename, Upload, error) for each listed image, unpacking one at a time
+
+    Each image is copied into a size-bounded Upload; images over UPLOAD_MAX_BYTES or
+    unreadable archive members are yielded with an error message instead.
+    """
+    for filename, open_image, info in images:
+        # Check the declared size first; reading is bounded too in case it lies
+        if info is not None and info.file_size > UPLOAD_MAX_BYTES:
+            yield filename, None, f"Image file too large (limit is {format_bytes(UPLOAD_MAX_BYTES)})"
+            continue
+        try:
+            stream = open_image()
+            try:
+                upload = read_upload(stream, UPLOAD_MAX_BYTES, UPLOAD_SPOOL_BYTES)
+            finally:
+                if info is not None:
+                    stream.close()
+        except UploadTooLarge as e:
+            yield filename, None, str(e)
+            continue
+        except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError):
+            # Corrupt, encrypted or using a compression method zipfile can't read
+            yield filename, None, "Unreadable zip archive member"
+            continue
+        yield filename, upload, None
 
 def get_ollama_info(predicted: str, lang: str = "en") -> dict:
-    """Get enhanced disease information from Ollama LLM (optional)"""
-    if not OLLAMA_BIN or not os.path.exists(OLLAMA_BIN):
+    """Get enhanced disease information, precomputed in the knowledge store or from Ollama LLM (optional)"""
+    lang = normalize_lang(lang)
+    if knowledge_store:
+        info = knowledge_store.get(predicted, lang)
+        if info is not None:
+            return info
+    if llm_client is None:
         return {}
     
     try:
-        plant = predicted.split('_')[0]
-        lang_map = {
-            "en": "English",
-            "hi": "Hindi",
-            "ta": "Tamil",
-            "gu": "Gujarati"
-        }
-        lang_name = lang_map.get(lang, "English")
-        
-        full_prompt = (
-            f"Plant: {plant}\n"
-            f"Disease: {predicted}\n\n"
-            "Respond ONLY with a raw JSON object. Do not include explanations or extra text.\n"
-            "The JSON must have these keys:\n"
-            "  disease_type, symptoms, prevention, treatments, fertilizers, expected_yield\n"
-            f"Please respond in {lang_name}."
-        )
-        
-        proc = subprocess.run(
-            [OLLAMA_BIN, "run", OLLAMA_MODEL, full_prompt],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='ignore',
-            timeout=120
-        )
-        
-        if proc.returncode == 0:
-            llm_out = proc.stdout.strip()
-            m = re.search(r"(\{.*\})", llm_out, re.DOTALL)
-            if m:
-                return json.loads(m.group(1))
+        return generate_disease_info(predicted, lang)
+    except LLMRejected:
+        # Overloaded or circuit open: answer without details now rather than wait (counted in /metrics)
+        return {}
     except Exception as e:
         app.logger.warning(f"Ollama call failed: {e}")
-    
-    return {}
+        return {}
+
+# Concurrent requests for the same class and language share one Ollama call
+llm_flights = SingleFlight()
+
+def generate_disease_info(predicted: str, lang: str) -> dict:
+    """Ask Ollama for disease information and store it; raises if the call or its reply fails"""
+    lang = normalize_lang(lang)
+    return llm_flights.do((OLLAMA_MODEL, predicted, lang), ask_ollama, predicted, lang)
+
+def ask_ollama(predicted: str, lang: str) -> dict:
+    """One Ollama call for disease information, stored for the next request"""
+    with ollama_seconds.time():
+        info = parse_json_reply(llm_client.generate(disease_info_prompt(predicted, lang)))
+    if knowledge_store:
+        knowledge_store.put(predicted, lang, info)
+    return info
+
+# Detections with ?enrich=async return at once; Ollama details are generated by these
+# background workers and fetched from /api/enrichment/<job_id>
+enrichment_jobs = None
+if llm_client:
+    enrichment_jobs = EnrichmentJobs(
+        generate_disease_info, workers=ENRICHMENT_WORKERS,
+        max_pending=ENRICHMENT_MAX_PENDING, ttl_seconds=ENRICHMENT_JOB_TTL
+    )
 
 @app.errorhandler(Exception)
 def handle_exception(e):
@@ -119,9 +505,141 @@ def handle_exception(e):
     response.headers.add("Access-Control-Allow-Credentials", "true")
     return response
 
+@app.errorhandler(RequestEntityTooLarge)
+def handle_request_too_large(e):
+    response = jsonify({"error": f"Request too large (limit is {format_bytes(UPLOAD_MAX_REQUEST_BYTES)})"})
+    response.status_code = 413
+    response.headers.add("Access-Control-Allow-Origin", "http://localhost:5173")
+    response.headers.add("Access-Control-Allow-Credentials", "true")
+    return response
+
+def home_response():
+    """(text, status) for the root page: running only once the disease model is ready, like the readiness probe"""
+    payload, status = readiness_response()
+    if status == 200:
+        return "AI Backend is Running", 200
+    if payload["state"] == "failed":
+        return f"AI Backend is Running, but the disease model failed to load: {payload['error']}", 503
+    return "AI Backend is starting - the disease model is still loading", 503
+
 @app.route('/')
 def home():
-    return "AI Backend is Running"
+    return home_response()
+
+@app.route('/healthz/ready')
+def healthz_ready():
+    """Readiness probe: 503 until the disease model is loaded and warmed up"""
+    payload, status = readiness_response()
+    return jsonify(payload), status
+
+def inference_stats_payload():
+    """Interpreter pool occupancy, wait times, cache counters and batch-size histograms"""
+    model = disease_slot.current
+    return {
+        "model_loaded": model_loaded,
+        "backend": model.engine.backend.name if model else None,
+        "runtime": model.engine.backend.runtime if model else None,
+        "model_version": model.version if model else None,
+        "preprocess": preprocess_stats(),
+        "cache": prediction_cache.stats(),
+        "near_dup_cache": near_dup_cache.stats() if near_dup_cache else None,
+        "leaf_gate": leaf_gate.stats() if leaf_gate else None,
+        "pool": model.engine.stats() if model else None,
+        "batching": model.batcher.stats() if model and model.batcher else None,
+        "decode_pool": model.decode_pool.stats() if model and model.decode_pool else None,
+        "tiling": model.tiler.stats() if model else None,
+        "llm": llm_client.stats() if llm_client else None,
+        "llm_coalescing": llm_flights.stats(),
+        "knowledge": knowledge_store.stats() if knowledge_store else None,
+        "enrichment": enrichment_jobs.stats() if enrichment_jobs else None,
+        "reload": {"disease": disease_slot.stats(), "fertilizer": fertilizer_slot.stats()}
+    }
+
+@app.route('/api/inference/stats', methods=['GET'])
+def inference_stats():
+    """Expose interpreter pool occupancy, wait times and batch-size histograms"""
+    return jsonify(inference_stats_payload())
+
+def serving_stat(part, key):
+    """One stats() field of a component of the serving disease model, 0 if it has no such component"""
+    model = disease_slot.current
+    component = getattr(model, part, None) if model else None
+    return component.stats()[key] if component else 0
+
+# Read when /metrics is scraped, from whichever model version is serving at the time
+queue_gauges = [
+    Gauge("disease_model_ready", "1 once the disease model is loaded and warmed up",
+          lambda: int(model_ready.is_set() and disease_slot.current is not None)),
+    Gauge("disease_requests_in_flight", "Detections running on the serving model",
+          lambda: disease_slot.stats()["in_flight"]),
+    Gauge("disease_interpreters_in_use", "Interpreters (or backend slots) currently running",
+          lambda: serving_stat("engine", "in_use")),
+    Gauge("disease_batch_queue_depth", "Images waiting to be micro-batched",
+          lambda: serving_stat("batcher", "queue_depth")),
+    Gauge("disease_decode_queue_depth", "Uploads waiting for a decode worker",
+          lambda: serving_stat("decode_pool", "queue_depth")),
+    Gauge("llm_calls_in_flight", "Ollama calls running", lambda: llm_client.stats()["guard"]["active"] if llm_client else 0),
+    Gauge("llm_calls_waiting", "Ollama calls waiting for a free slot",
+          lambda: llm_client.stats()["guard"]["waiting"] if llm_client else 0),
+    Gauge("llm_circuit_open", "1 while Ollama is being skipped after repeated failures",
+          lambda: int(llm_client is not None and llm_client.state() != "closed")),
+]
+
+def metrics_text():
+    """Prometheus text for stage latencies, error and cache counters, queue depths and model components"""
+    model = disease_slot.current
+    backend = model.engine.backend if model else None
+    return render_prometheus(
+        collect(
+            upload_read_seconds, inference_seconds, ollama_seconds, response_json_seconds,
+            predict_npk_seconds, recommend_plants_seconds, model_errors, fertilizer_errors
+        )
+        + queue_gauges
+        + collect(
+            preprocess, prediction_cache, near_dup_cache, leaf_gate,
+            backend, getattr(backend, "pool", None),
+            model and model.batcher, model and model.decode_pool, model and model.tiler,
+            disease_slot, fertilizer_slot, llm_client, llm_backend, getattr(llm_backend, "fallback", None), knowledge_store,
+            llm_flights, enrichment_jobs
+        )
+    )
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics_text(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def reload_models_response(token, which=None):
+    """Admin model reload as (payload, status); new versions are built and warmed before being swapped in"""
+    if not ADMIN_TOKEN:
+        return {'error': 'Model reload is disabled - set ADMIN_TOKEN to enable it'}, 403
+    if not hmac.compare_digest(token or '', ADMIN_TOKEN):
+        return {'error': 'Invalid admin token'}, 401
+    
+    reloads = {"disease": (disease_slot, reload_disease_model), "fertilizer": (fertilizer_slot, reload_fertilizer_model)}
+    names = list(reloads) if which in (None, "", "all") else [which]
+    if any(name not in reloads for name in names):
+        return {'error': f'Unknown model "{which}" - use disease, fertilizer or all'}, 400
+    
+    results = {}
+    status = 200
+    for name in names:
+        slot, reload = reloads[name]
+        try:
+            version, reloaded = reload()
+            results[name] = {"version": version, "reloaded": reloaded}
+        except Exception as e:
+            # The previous version keeps serving
+            results[name] = {"version": slot.version, "reloaded": False, "error": str(e)}
+            status = 500
+    return results, status
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_models():
+    """Reload the disease and/or fertilizer model from disk without restarting the worker"""
+    data = request.get_json(silent=True) or {}
+    payload, status = reload_models_response(request.headers.get('X-Admin-Token'), data.get('model'))
+    return jsonify(payload), status
 
 # @app.route('/predict', methods=['POST'])
 # def predict():
@@ -174,11 +692,10 @@ def detect_soil():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/recommend-plants', methods=['POST'])
-def recommend_plants():
-    """Get plant recommendations based on soil type, location, temperature, temperature range, and season"""
+@recommend_plants_seconds.time()
+def recommend_plants_response(data):
+    """Plant recommendations for a request body, as (payload, status)"""
     try:
-        data = request.json
         soil_type = data.get('soil_type', 'Loamy')
         location = data.get('location', 'Unknown')
         temperature = data.get('temperature', 25)
@@ -395,7 +912,7 @@ def recommend_plants():
         
         message = ", ".join(message_parts)
         
-        return jsonify({
+        return {
             "recommendations": recommendations,
             "soil_type": soil_type,
             "location": location,
@@ -404,25 +921,27 @@ def recommend_plants():
             "temperature_range": temperature_range,
             "season": season,
             "message": message
-        })
+        }, 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
-@app.route('/api/fertilizer-recommendation', methods=['POST'])
-def fertilizer_recommendation():
-    """Get fertilizer NPK recommendations using ML models"""
+def fertilizer_recommendation_response(data):
+    """Fertilizer NPK recommendation for a request body, as (payload, status)"""
+    # One predictor version for the whole request, even if a reload swaps it meanwhile
+    model = fertilizer_slot.current
+    fertilizer_predictor = model.predictor
     try:
-        data = request.json
         plant_type = data.get('plant_type', '').strip()
         growth_stage = data.get('growth_stage', '').strip()
         temperature = data.get('temperature', 25)
         soil_type = data.get('soil_type', '').strip()
         
         if not all([plant_type, growth_stage, soil_type]):
-            return jsonify({'error': 'Missing required fields'}), 400
+            return {'error': 'Missing required fields'}, 400
         
         # Try ML prediction first
-        ml_prediction = fertilizer_predictor.predict_npk(plant_type, growth_stage, soil_type, temperature)
+        with predict_npk_seconds.time():
+            ml_prediction = fertilizer_predictor.predict_npk(plant_type, growth_stage, soil_type, temperature)
         
         if ml_prediction:
             # Use ML prediction
@@ -455,7 +974,7 @@ def fertilizer_recommendation():
             notes += f"Application rate: {final_rate} kg per hectare. "
             notes += "Model accuracy: N-96.7%, P-97.6%, K-98.3%"
             
-            return jsonify({
+            return {
                 "plant_type": plant_type,
                 "growth_stage": growth_stage,
                 "temperature": temperature,
@@ -469,18 +988,20 @@ def fertilizer_recommendation():
                 "recommendations": recommendations,
                 "notes": notes,
                 "source": "ML-Powered Fertilizer Recommendation System",
-                "model_accuracy": fertilizer_predictor.get_model_info()['performance']
-            })
+                "model_accuracy": fertilizer_predictor.get_model_info()['performance'],
+                "model_version": model.version
+            }, 200
         
         else:
             # Fallback to rule-based system if ML fails
-            return jsonify({'error': 'ML model not available, please check model files'}), 500
+            return {'error': 'ML model not available, please check model files'}, 500
         
     except Exception as e:
         import traceback
+        fertilizer_errors.inc()
         print(f"Error in fertilizer recommendation: {e}")
         traceback.print_exc()
-        return jsonify({'error': f'Error generating recommendation: {str(e)}'}), 500
+        return {'error': f'Error generating recommendation: {str(e)}'}, 500
         fertilizer_rules = {
             'Rice': {
                 'Seedling': {'N': 20, 'P': 15, 'K': 10, 'base_rate': 80},
@@ -598,10 +1119,10 @@ def fertilizer_recommendation():
         
         # Get base NPK ratios for the plant and growth stage
         if plant_type not in fertilizer_rules:
-            return jsonify({'error': f'Plant type "{plant_type}" not supported'}), 400
+            return {'error': f'Plant type "{plant_type}" not supported'}, 400
         
         if growth_stage not in fertilizer_rules[plant_type]:
-            return jsonify({'error': f'Growth stage "{growth_stage}" not supported for {plant_type}'}), 400
+            return {'error': f'Growth stage "{growth_stage}" not supported for {plant_type}'}, 400
         
         base_ratios = fertilizer_rules[plant_type][growth_stage]
         
@@ -682,7 +1203,7 @@ def fertilizer_recommendation():
         notes += f"Application rate: {final_rate} kg per hectare. "
         notes += "Always conduct soil tests before major fertilizer applications and adjust based on local conditions."
         
-        return jsonify({
+        return {
             "plant_type": plant_type,
             "growth_stage": growth_stage,
             "temperature": temperature,
@@ -696,107 +1217,380 @@ def fertilizer_recommendation():
             "recommendations": recommendations,
             "notes": notes,
             "source": "Smart Fertilizer Recommendation System"
-        })
+        }, 200
         
     except Exception as e:
         import traceback
         print(f"Error in fertilizer recommendation: {e}")
         traceback.print_exc()
-        return jsonify({'error': f'Error generating recommendation: {str(e)}'}), 500
+        return {'error': f'Error generating recommendation: {str(e)}'}, 500
 
-@app.route('/api/detect-disease', methods=['POST'])
-def detect_disease():
-    """Detect disease from uploaded leaf image using TFLite model"""
-    if not model_loaded:
-        return jsonify({'error': 'Model not loaded - TFLite model file not found or failed to load'}), 500
-    
-    if 'leaf' not in request.files:
-        return jsonify({'error': 'No leaf image uploaded'}), 400
+@app.route('/api/recommend-plants', methods=['POST'])
+def recommend_plants():
+    """Get plant recommendations based on soil type, location, temperature, temperature range, and season"""
+    payload, status = recommend_plants_response(request.json)
+    return jsonify(payload), status
+
+@app.route('/api/fertilizer-recommendation', methods=['POST'])
+def fertilizer_recommendation():
+    """Get fertilizer NPK recommendations using ML models"""
+    payload, status = fertilizer_recommendation_response(request.json)
+    return jsonify(payload), status, model_version_headers(payload)
+
+def add_ollama_info(response, lang):
+    """Add enhanced disease information from Ollama to a detection response (optional)"""
+    ollama_info = get_ollama_info(response["predicted"], lang) if llm_client or knowledge_store else {}
     
+    # Add Ollama information if available
+    if ollama_info:
+        response.update({key: ollama_info.get(key, "") for key in DISEASE_INFO_KEYS})
+
+def add_enrichment_job(response, lang):
+    """Copy of a detection response with its Ollama details inline if precomputed, else the job generating them"""
+    response = dict(response)
+    info = knowledge_store.get(response["predicted"], normalize_lang(lang)) if knowledge_store else None
+    if info is not None:
+        response.update({key: info.get(key, "") for key in DISEASE_INFO_KEYS})
+        response["enrichment"] = {"status": "done"}
+    elif enrichment_jobs is None:
+        response["enrichment"] = {"status": "unavailable"}
+    else:
+        try:
+            job_id = enrichment_jobs.submit(response["predicted"], lang)
+            response["enrichment"] = {"status": "pending", "job_id": job_id, "poll_url": f"/api/enrichment/{job_id}"}
+        except JobQueueFull:
+            response["enrichment"] = {"status": "busy"}
+    return response
+
+def detect_disease_response(upload, lang):
+    """Disease detection for a size-bounded Upload, as (payload, status)"""
+    # Pin the current model version; a reload meanwhile swaps in the new one for later requests
+    with disease_slot.use() as model:
+        if model is None:
+            return model_unavailable_response()
+        return detect_with_model(model, upload, lang)
+
+def detect_disease_async_response(upload, lang):
+    """Disease detection that answers straight after the model, leaving Ollama details to an enrichment job"""
+    with disease_slot.use() as model:
+        if model is None:
+            return model_unavailable_response()
+        payload, status = detect_with_model(model, upload, lang, enrich=False)
+    if status != 200:
+        return payload, status
+    return add_enrichment_job(payload, lang), 200
+
+def detect_with_model(model, upload, lang, enrich=True):
+    """Disease detection on one model version; cache keys include that version"""
     try:
-        file = request.files['leaf']
-        lang = request.form.get('lang', 'en') if request.form else 'en'
+        # Un-enriched results are cached apart from enriched ones
+        variant = lang if enrich else f"{lang}:bare"
         
-        # Read image bytes
-        img_bytes = file.read()
+        # Answer re-uploads of the same photo from the cache (the digest was computed while reading)
+        cache_key = prediction_cache.make_digest_key(upload.digest, model.version, variant)
+        cached = prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached, 200
         
-        # Validate that the file is an image
+        # Validate and preprocess image for TFLite model (256x256) in a single decode
         try:
-            img = Image.open(io.BytesIO(img_bytes))
-            img.verify()  # Verify it's actually an image
-        except Exception as img_error:
-            return jsonify({'error': 'Invalid image file'}), 400
+            data = preprocess_image(upload.open(), model)
+        except ImageTooLarge as e:
+            return {'error': str(e)}, 400
+        except InvalidImage:
+            return {'error': 'Invalid image file'}, 400
+        except TimeoutError:
+            return {'error': 'Disease detection is busy, please retry'}, 503
         
-        # Preprocess image for TFLite model (256x256)
-        data = preprocess_image(img_bytes)
+        # Skip the model for images that are clearly not a leaf
+        if leaf_gate:
+            rejection = leaf_gate.check(data)
+            if rejection:
+                return rejected_image_response(rejection)
         
-        # Run TFLite inference
-        interpreter.set_tensor(input_details["index"], data)
-        interpreter.invoke()
-        raw_output = interpreter.get_tensor(output_details["index"])
-        out = np.array(raw_output).flatten()
+        # Answer near-identical frames (re-shot, recompressed) from the perceptual-hash cache
+        if near_dup_cache:
+            image_hash = dhash(data)
+            cached = near_dup_cache.lookup(image_hash, (model.version, variant))
+            if cached is not None:
+                prediction_cache.put(cache_key, cached)
+                return cached, 200
+        
+        # Run TFLite inference on a pooled interpreter (batched with other requests when enabled)
+        inference_start = time.perf_counter()
+        try:
+            out = run_inference(data, model)
+        except TimeoutError:
+            return {'error': 'Disease detection is busy, please retry'}, 503
+        inference_seconds.observe(time.perf_counter() - inference_start)
         
         if out.shape[0] != len(CLASS_NAMES):
-            return jsonify({
+            model_errors.inc()
+            return {
                 "error": "Model output length mismatch",
                 "output_len": int(out.shape[0]),
                 "num_classes": len(CLASS_NAMES)
-            }), 500
+            }, 500
         
-        # Get top prediction and top 3
-        top_idx = int(np.argmax(out))
-        top3_idx = np.argsort(out)[-3:][::-1]
-        top3 = [{"label": CLASS_NAMES[i], "score": float(out[i] * 100)} for i in top3_idx]
+        # Build response from the top prediction and top 3, tagged with the model version that produced it
+        response = build_detection_response(out)
+        response["model_version"] = model.version
         
-        predicted = CLASS_NAMES[top_idx]
-        confidence = float(out[top_idx] * 100)
+        if enrich:
+            add_ollama_info(response, lang)
         
-        # Determine if healthy
-        is_healthy = 'healthy' in predicted.lower()
+        prediction_cache.put(cache_key, response)
+        if near_dup_cache:
+            near_dup_cache.record_miss_cost(time.perf_counter() - inference_start)
+            near_dup_cache.add(image_hash, (model.version, variant), response)
+        return response, 200
+    except Exception as e:
+        import traceback
+        model_errors.inc()
+        print(f"Error in disease detection: {e}")
+        traceback.print_exc()
+        return {'error': f'Error processing image: {str(e)}'}, 500
+
+def detect_disease_tiled_response(upload, lang):
+    """Tiled disease detection for a wide photo of many leaves, as (payload, status)"""
+    with disease_slot.use() as model:
+        if model is None:
+            return model_unavailable_response()
+        return detect_tiled_with_model(model, upload, lang)
+
+def detect_tiled_with_model(model, upload, lang):
+    """Cut the photo into overlapping model-sized tiles, run the leaf tiles as one batch and aggregate them"""
+    try:
+        cache_key = prediction_cache.make_digest_key(upload.digest, model.version, f"{lang}:tiled")
+        cached = prediction_cache.get(cache_key)
+        if cached is not None:
+            return cached, 200
         
-        # Get enhanced information from Ollama (optional)
-        ollama_info = get_ollama_info(predicted, lang) if OLLAMA_BIN else {}
+        tiler = model.tiler
+        try:
+            image = decode_leaf_image_fit(
+                upload.open(), tiler.max_side, min_side=min(tiler.tile_size), max_pixels=UPLOAD_MAX_PIXELS
+            )
+        except ImageTooLarge as e:
+            return {'error': str(e)}, 400
+        except InvalidImage:
+            return {'error': 'Invalid image file'}, 400
         
-        # Create user-friendly disease name
-        disease_display = predicted.replace('_', ' ').title()
-        if 'Healthy' in disease_display:
-            result_message = "No disease detected - Plant appears healthy"
-            disease_status = "Healthy"
-        else:
-            result_message = f"Disease detected: {disease_display}"
-            disease_status = disease_display
-
-        # Build response
-        response = {
-            "disease": disease_status,
-            "predicted": predicted,
-            "confidence": confidence,
-            "message": result_message,
-            "top3": top3,
-            "prediction_details": {
-                "detected_condition": disease_display,
-                "confidence_percentage": confidence,
-                "is_healthy": is_healthy
-            }
-        }
+        # Tiles with no foliage never reach the model, which keeps the cost bounded
+        try:
+            tiles, grid = tiler.split(np.asarray(image))
+        except ImageTooLarge as e:
+            return {'error': str(e)}, 400
+        if not tiles:
+            return rejected_image_response({"reason": "no_foliage", "tiles": len(grid["cells"])})
         
-        # Add Ollama information if available
-        if ollama_info:
-            response.update({
-                "disease_type": ollama_info.get("disease_type", ""),
-                "symptoms": ollama_info.get("symptoms", ""),
-                "prevention": ollama_info.get("prevention", ""),
-                "treatments": ollama_info.get("treatments", ""),
-                "fertilizers": ollama_info.get("fertilizers", ""),
-                "expected_yield": ollama_info.get("expected_yield", "")
-            })
-        
-        return jsonify(response)
+        # Score the leaf tiles in invokes of at most DISEASE_BATCH_CHUNK_SIZE images
+        try:
+            pixels = [tile for _, tile in tiles]
+            scores = np.concatenate([
+                run_batch_inference(pixels[i:i + DISEASE_BATCH_CHUNK_SIZE], model)
+                for i in range(0, len(pixels), DISEASE_BATCH_CHUNK_SIZE)
+            ])
+        except TimeoutError:
+            return {'error': 'Disease detection is busy, please retry'}, 503
+        
+        response = tiler.aggregate(tiles, grid, scores)
+        response["model_version"] = model.version
+        add_ollama_info(response, lang)
+        prediction_cache.put(cache_key, response)
+        return response, 200
     except Exception as e:
         import traceback
-        print(f"Error in disease detection: {e}")
+        model_errors.inc()
+        print(f"Error in tiled disease detection: {e}")
         traceback.print_exc()
-        return jsonify({'error': f'Error processing image: {str(e)}'}), 500
+        return {'error': f'Error processing image: {str(e)}'}, 500
+
+@app.route('/api/detect-disease', methods=['POST'])
+def detect_disease():
+    """Detect disease from uploaded leaf image using TFLite model; ?enrich=async returns before Ollama runs"""
+    return detect_upload(detect_responder(request.args.get('enrich')))
+
+def detect_responder(enrich):
+    """The detection response function for the ?enrich= query parameter"""
+    return detect_disease_async_response if enrich == 'async' else detect_disease_response
+
+def enrichment_job_response(job_id, wait=0):
+    """An enrichment job as (payload, status), waiting up to `wait` seconds for it to finish"""
+    if enrichment_jobs is None:
+        return {'error': 'Disease details are not enabled - set OLLAMA_ENABLED=true'}, 404
+    job = enrichment_jobs.wait(job_id, min(wait, ENRICHMENT_MAX_WAIT)) if wait > 0 else enrichment_jobs.get(job_id)
+    if job is None:
+        return {'error': 'Unknown or expired enrichment job'}, 404
+    return job, 200
+
+@app.route('/api/enrichment/<job_id>', methods=['GET'])
+def enrichment_job(job_id):
+    """Poll an enrichment job; ?wait=N holds the request up to N seconds for it to finish"""
+    payload, status = enrichment_job_response(job_id, request.args.get('wait', 0, type=float))
+    return jsonify(payload), status
+
+@app.route('/api/detect-disease/tiled', methods=['POST'])
+def detect_disease_tiled():
+    """Detect disease across a wide photo of many leaves, with a per-tile disease map"""
+    return detect_upload(detect_disease_tiled_response)
+
+def detect_upload(respond):
+    """Read the 'leaf' upload within the size limits and answer it with respond(upload, lang)"""
+    if not model_loaded:
+        payload, status = model_unavailable_response()
+        return jsonify(payload), status
+    
+    # Refuse an oversized body from its Content-Length before any of it is read
+    if request.content_length and request.content_length > UPLOAD_MAX_BYTES + FORM_OVERHEAD_BYTES:
+        return jsonify({'error': f'Image file too large (limit is {format_bytes(UPLOAD_MAX_BYTES)})'}), 413
+    
+    # Werkzeug parses the multipart body on first access to request.files
+    read_start = time.perf_counter()
+    if 'leaf' not in request.files:
+        return jsonify({'error': 'No leaf image uploaded'}), 400
+    
+    lang = request.form.get('lang', 'en') if request.form else 'en'
+    try:
+        upload = read_upload(request.files['leaf'].stream, UPLOAD_MAX_BYTES, UPLOAD_SPOOL_BYTES)
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    upload_read_seconds.observe(time.perf_counter() - read_start)
+    with upload:
+        payload, status = respond(upload, lang)
+    return jsonify(payload), status, model_version_headers(payload)
+
+@app.route('/api/detect-disease/batch', methods=['POST'])
+def detect_disease_batch():
+    """Detect disease for many leaf images (or a zip of them), streaming one JSON line per image"""
+    if not model_loaded:
+        payload, status = model_unavailable_response()
+        return jsonify(payload), status
+    
+    # Flask closes the request's files once the view returns, but images are unpacked as the
+    # results stream; so each file (a zip at most) is kept in a copy the response closes when done
+    copies = []
+    try:
+        for file in request.files.getlist('leaf') + request.files.getlist('archive'):
+            copies.append((file.filename, read_upload(file.stream, UPLOAD_MAX_REQUEST_BYTES, UPLOAD_SPOOL_BYTES)))
+        uploads, error = unpack_batch_uploads([(filename, copy.file) for filename, copy in copies])
+    except UploadTooLarge:
+        close_batch_files(copies)
+        return jsonify({'error': f'Request too large (limit is {format_bytes(UPLOAD_MAX_REQUEST_BYTES)})'}), 413
+    except BaseException:
+        close_batch_files(copies)
+        raise
+    if error:
+        close_batch_files(copies)
+        payload, status = error
+        return jsonify(payload), status
+    response = Response(stream_with_context(detect_disease_batch_lines(uploads)), mimetype='application/x-ndjson')
+    response.call_on_close(lambda: close_batch_files(copies))
+    return response
+
+def close_batch_files(copies):
+    for _, copy in copies:
+        copy.close()
+
+def unpack_batch_uploads(files):
+    """(uploads, None) for the batch's (filename, stream) files, or (None, (payload, status)) to refuse it
+
+    Only the archive listings are read here; `uploads` unpacks each image as it is iterated.
+    """
+    if not files:
+        return None, ({'error': 'No leaf images uploaded'}, 400)
+    too_many = ({'error': f'Too many images (limit is {DISEASE_BATCH_MAX_IMAGES} per request)'}, 413)
+    if len(files) > DISEASE_BATCH_MAX_IMAGES:
+        return None, too_many
+    try:
+        images = list_batch_images(files)
+    except zipfile.BadZipFile:
+        return None, ({'error': 'Invalid zip archive'}, 400)
+    if len(images) > DISEASE_BATCH_MAX_IMAGES:
+        return None, too_many
+    error = check_batch_archives(images)
+    if error:
+        return None, ({'error': error}, 413)
+    return iter_batch_uploads(images), None
+
+def detect_disease_batch_lines(uploads):
+    """Yield the NDJSON result lines for unpacked batch uploads, all on one model version"""
+    def run_chunk(pending, model):
+        """Invoke the model once for a chunk of preprocessed images and emit their result lines"""
+        try:
+            scores = run_batch_inference([data for _, _, data in pending], model)
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                error = 'Disease detection is busy, please retry'
+            else:
+                model_errors.inc()
+                error = f'Error processing image: {str(e)}'
+            for index, filename, _ in pending:
+                yield {"index": index, "filename": filename, "error": error}
+            return
+        for (index, filename, _), out in zip(pending, scores):
+            if out.shape[0] != len(CLASS_NAMES):
+                yield {"index": index, "filename": filename, "error": "Model output length mismatch"}
+            else:
+                yield {"index": index, "filename": filename, **build_detection_response(out), "model_version": model.version}
+    
+    def generate(model):
+        pending = []
+        count = 0
+        errors = 0
+        for filename, upload, error in uploads:
+            index = count
+            count += 1
+            if error:
+                errors += 1
+                yield json.dumps({"index": index, "filename": filename, "error": error}) + "\n"
+                continue
+            
+            # Validate and preprocess each image the same way as the single-image endpoint
+            try:
+                with upload:
+                    data = preprocess_image(upload.open(), model)
+            except (InvalidImage, TimeoutError) as e:
+                errors += 1
+                if isinstance(e, TimeoutError):
+                    error = "Disease detection is busy, please retry"
+                else:
+                    error = str(e) if isinstance(e, ImageTooLarge) else "Invalid image file"
+                yield json.dumps({"index": index, "filename": filename, "error": error}) + "\n"
+                continue
+            
+            rejection = leaf_gate.check(data) if leaf_gate else None
+            if rejection:
+                errors += 1
+                payload, _ = rejected_image_response(rejection)
+                yield json.dumps({"index": index, "filename": filename, **payload}) + "\n"
+                continue
+            
+            pending.append((index, filename, data))
+            if len(pending) >= DISEASE_BATCH_CHUNK_SIZE:
+                for line in run_chunk(pending, model):
+                    errors += 'error' in line
+                    yield json.dumps(line) + "\n"
+                pending = []
+        
+        if pending:
+            for line in run_chunk(pending, model):
+                errors += 'error' in line
+                yield json.dumps(line) + "\n"
+        
+        yield json.dumps({"done": True, "count": count, "errors": errors, "model_version": model.version}) + "\n"
+    
+    # The whole batch runs on one model version, even if a reload swaps it mid-stream
+    try:
+        with disease_slot.use() as model:
+            if model is None:
+                payload, _ = model_unavailable_response()
+                yield json.dumps(payload) + "\n"
+                return
+            yield from generate(model)
+    finally:
+        # Stop unpacking if the model was missing or the client went away
+        uploads.close()
 
 if __name__ == '__main__':
     app.run(debug=True)
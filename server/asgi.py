@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Async serving mode for the disease, fertilizer and recommendation endpoints
+Request bodies (including slow mobile uploads) are received on the event loop
+without holding a worker; decoding, TFLite inference, Ollama calls and the
+fertilizer model run on a bounded thread pool. Handlers reuse the Flask app's
+response functions, interpreter pool and caches, and serialize JSON with the
+Flask app's provider so response bodies are byte-for-byte identical.
+
+Usage: uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import contextlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import app as flask_app
+from config import ASGI_INFERENCE_WORKERS, UPLOAD_MAX_BYTES, UPLOAD_MAX_REQUEST_BYTES, UPLOAD_SPOOL_BYTES
+from inference.upload import CHUNK_SIZE, FORM_OVERHEAD_BYTES, Upload, UploadTooLarge, format_bytes
+from utils.metrics import PROMETHEUS_CONTENT_TYPE
+
+class RequestTooLarge(Exception):
+    """Raised while receiving a body that passes UPLOAD_MAX_REQUEST_BYTES"""
+
+
+class BodySizeLimitMiddleware:
+    """Stop receiving request bodies past `max_bytes`, with or without a Content-Length"""
+
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise RequestTooLarge()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+executor = ThreadPoolExecutor(max_workers=ASGI_INFERENCE_WORKERS, thread_name_prefix="asgi-worker")
+
+
+def json_response(payload, status=200, headers=None):
+    """Serialize like Flask's jsonify so both serving modes return the same bytes"""
+    provider = flask_app.app.json
+    if (provider.compact is None and flask_app.app.debug) or provider.compact is False:
+        body = provider.dumps(payload, indent=2)
+    else:
+        body = provider.dumps(payload, separators=(",", ":"))
+    return Response(body + "\n", status_code=status, headers=headers, media_type="application/json")
+
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def iterate_blocking(lines):
+    """Pull each item of a blocking generator on the thread pool"""
+    end = object()
+    while (line := await run_blocking(next, lines, end)) is not end:
+        yield line
+
+
+async def read_json(request):
+    body = await request.body()
+    return json.loads(body) if body else None
+
+
+async def home(request):
+    text, status = flask_app.home_response()
+    return Response(text, status_code=status, media_type="text/html; charset=utf-8")
+
+
+async def healthz_ready(request):
+    return json_response(*flask_app.readiness_response())
+
+
+async def receive_leaf_upload(request, respond):
+    """Stream the 'leaf' form field into a bounded Upload and answer it with respond(upload, lang)"""
+    if not flask_app.model_loaded:
+        return json_response(*flask_app.model_unavailable_response())
+
+    # Refuse an oversized body from its Content-Length before any of it is read
+    content_length = request.headers.get('content-length', '')
+    if content_length.isdigit() and int(content_length) > UPLOAD_MAX_BYTES + FORM_OVERHEAD_BYTES:
+        return json_response({'error': f'Image file too large (limit is {format_bytes(UPLOAD_MAX_BYTES)})'}, 413)
+
+    read_start = time.perf_counter()
+    form = await request.form()
+    try:
+        leaf = form.get('leaf')
+        if leaf is None or isinstance(leaf, str):
+            return json_response({'error': 'No leaf image uploaded'}, 400)
+        lang = form.get('lang', 'en')
+        upload = Upload(UPLOAD_MAX_BYTES, UPLOAD_SPOOL_BYTES)
+        try:
+            while chunk := await leaf.read(CHUNK_SIZE):
+                upload.write(chunk)
+        except UploadTooLarge as e:
+            upload.close()
+            return json_response({'error': str(e)}, 413)
+    finally:
+        await form.close()
+    flask_app.upload_read_seconds.observe(time.perf_counter() - read_start)
+
+    with upload:
+        payload, status = await run_blocking(respond, upload, lang)
+    return json_response(payload, status, flask_app.model_version_headers(payload))
+
+
+async def detect_disease(request):
+    return await receive_leaf_upload(request, flask_app.detect_responder(request.query_params.get('enrich')))
+
+
+async def detect_disease_tiled(request):
+    return await receive_leaf_upload(request, flask_app.detect_disease_tiled_response)
+
+
+async def detect_disease_batch(request):
+    """Stream one JSON line per image like the Flask route, running the batch on the thread pool"""
+    if not flask_app.model_loaded:
+        return json_response(*flask_app.model_unavailable_response())
+
+    form = await request.form()
+    try:
+        files = [
+            (upload.filename, upload.file)
+            for upload in form.getlist('leaf') + form.getlist('archive')
+            if not isinstance(upload, str)
+        ]
+        uploads, error = await run_blocking(flask_app.unpack_batch_uploads, files)
+    except BaseException:
+        await form.close()
+        raise
+    if error:
+        await form.close()
+        return json_response(*error)
+    # Images are unpacked as the results stream, so the form's files are closed afterwards
+    return StreamingResponse(
+        iterate_blocking(flask_app.detect_disease_batch_lines(uploads)), media_type='application/x-ndjson',
+        background=BackgroundTask(form.close)
+    )
+
+
+async def enrichment_job(request):
+    """Poll an enrichment job; a ?wait= long-poll waits on the event loop rather than a worker thread"""
+    job_id = request.path_params['job_id']
+    try:
+        wait = min(float(request.query_params.get('wait', 0)), flask_app.ENRICHMENT_MAX_WAIT)
+    except ValueError:
+        wait = 0
+    payload, status = flask_app.enrichment_job_response(job_id)
+    if status != 200 or payload["status"] in ("done", "failed") or wait <= 0:
+        return json_response(payload, status)
+
+    loop = asyncio.get_running_loop()
+    finished = loop.create_future()
+
+    def resolve(job):
+        if not finished.done():
+            finished.set_result(job)
+
+    flask_app.enrichment_jobs.subscribe(job_id, lambda job: loop.call_soon_threadsafe(resolve, job))
+    try:
+        payload = await asyncio.wait_for(finished, wait)
+    except asyncio.TimeoutError:
+        payload, status = flask_app.enrichment_job_response(job_id)
+    return json_response(payload, status)
+
+
+async def fertilizer_recommendation(request):
+    payload, status = await run_blocking(flask_app.fertilizer_recommendation_response, await read_json(request))
+    return json_response(payload, status, flask_app.model_version_headers(payload))
+
+
+async def recommend_plants(request):
+    payload, status = await run_blocking(flask_app.recommend_plants_response, await read_json(request))
+    return json_response(payload, status)
+
+
+async def inference_stats(request):
+    return json_response(flask_app.inference_stats_payload())
+
+
+async def metrics(request):
+    return Response(flask_app.metrics_text(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+
+async def reload_models(request):
+    try:
+        data = await read_json(request) or {}
+    except ValueError:
+        data = {}
+    token = request.headers.get('x-admin-token')
+    payload, status = await run_blocking(flask_app.reload_models_response, token, data.get('model'))
+    return json_response(payload, status)
+
+
+async def handle_request_too_large(request, exc):
+    return json_response({"error": f"Request too large (limit is {format_bytes(UPLOAD_MAX_REQUEST_BYTES)})"}, 413)
+
+
+async def handle_exception(request, exc):
+    return json_response({"error": str(exc)}, 500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    executor.shutdown(wait=False)
+    model = flask_app.disease_slot.current
+    if model:
+        model.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/healthz/ready', healthz_ready),
+        Route('/api/detect-disease', detect_disease, methods=['POST']),
+        Route('/api/detect-disease/tiled', detect_disease_tiled, methods=['POST']),
+        Route('/api/detect-disease/batch', detect_disease_batch, methods=['POST']),
+        Route('/api/enrichment/{job_id}', enrichment_job, methods=['GET']),
+        Route('/api/fertilizer-recommendation', fertilizer_recommendation, methods=['POST']),
+        Route('/api/recommend-plants', recommend_plants, methods=['POST']),
+        Route('/api/inference/stats', inference_stats, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+        Route('/api/admin/reload', reload_models, methods=['POST']),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=["http://localhost:5173"], allow_credentials=True,
+                   allow_methods=["*"], allow_headers=["*"]),
+        Middleware(BodySizeLimitMiddleware, max_bytes=UPLOAD_MAX_REQUEST_BYTES),
+    ],
+    exception_handlers={RequestTooLarge: handle_request_too_large, Exception: handle_exception},
+    lifespan=lifespan,
+)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark upload decoding: the old verify + full decode + resize path against
+the single-pass reduced-resolution decode in inference/preprocess.py
+
+Usage: python benchmark_decode.py [IMAGE ...] [--runs N]
+Without images, synthetic phone-camera JPEGs (12 MP and 48 MP) are generated.
+"""
+
+import argparse
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from inference.preprocess import decode_leaf_image
+
+
+def legacy_preprocess(image_bytes):
+    """The original detect_disease() path: verify, reopen, full decode, convert, resize"""
+    Image.open(io.BytesIO(image_bytes)).verify()
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    img = img.resize((256, 256), Image.BILINEAR)
+    return np.asarray(img, dtype=np.float32) / 255.0
+
+
+def single_pass_preprocess(image_bytes):
+    return np.asarray(decode_leaf_image(image_bytes), dtype=np.float32) / 255.0
+
+
+PATHS = {"legacy": legacy_preprocess, "single_pass": single_pass_preprocess}
+
+
+def synthetic_jpeg(width, height, quality=90):
+    """A leaf-coloured gradient with noise, roughly as compressible as a camera photo"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        60 + 40 * np.sin(x / 97.0),
+        140 + 60 * np.cos(y / 131.0),
+        50 + 30 * np.sin((x + y) / 71.0),
+    ], axis=-1)
+    img = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+# Runs in the child process; reports the high-water RSS added by one decode.
+# /proc VmHWM is used where available because ru_maxrss is inherited from the
+# forking parent on Linux, which would hide the child's own peak.
+RSS_CHILD_SCRIPT = r"""
+import sys
+sys.path.insert(0, sys.argv[3])
+import benchmark_decode as b
+
+def peak_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+data = open(sys.argv[2], "rb").read()
+base = peak_mb()
+b.PATHS[sys.argv[1]](data)
+print(peak_mb() - base)
+"""
+
+
+def peak_rss_mb(path_name, image_file):
+    """Peak RSS growth of a fresh process that decodes `image_file` once with `path_name`"""
+    proc = subprocess.run(
+        [sys.executable, "-c", RSS_CHILD_SCRIPT, path_name, image_file, os.path.dirname(os.path.abspath(__file__))],
+        capture_output=True, text=True, timeout=300
+    )
+    if proc.returncode != 0:
+        return None
+    return float(proc.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare upload decode paths")
+    parser.add_argument("images", nargs="*", help="Image files to decode (default: synthetic JPEGs)")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per image and path")
+    args = parser.parse_args()
+
+    samples = [(name, open(name, "rb").read()) for name in args.images]
+    if not samples:
+        samples = [("synthetic 12MP", synthetic_jpeg(4032, 3024)), ("synthetic 48MP", synthetic_jpeg(8000, 6000))]
+
+    print(f"{'Image':<18} {'Path':<12} {'Median ms':>10} {'Peak RSS +MB':>13} {'Max abs diff':>13}")
+    print("-" * 70)
+    for label, data in samples:
+        reference = legacy_preprocess(data)
+        tmp_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmark_decode.img")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        for path_name, fn in PATHS.items():
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                out = fn(data)
+                timings.append((time.perf_counter() - start) * 1000)
+            rss = peak_rss_mb(path_name, tmp_path)
+            rss_text = f"{rss:>13.1f}" if rss is not None else f"{'n/a':>13}"
+            diff = float(np.abs(out - reference).max())
+            print(f"{label:<18} {path_name:<12} {statistics.median(timings):>10.1f} {rss_text} {diff:>13.4f}")
+        os.remove(tmp_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compare inference engine backends (TFLite, ONNX Runtime, Keras) on the same images
+Reports load time, median batch latency and throughput per batch size, and
+top-1 agreement with the first model given.
+
+Usage:
+  python benchmark_engine.py --model model/plant_leaf_diseases_model.tflite --model model/leaf.onnx
+  python benchmark_engine.py --model a.tflite --model b.h5 --data ml-backend/data --batch 1,8,16
+Without --data, synthetic leaf-coloured images are used.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from inference.engine import benchmark, load_engine
+from quantize_model import list_images
+
+
+def synthetic_images(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        Image.fromarray(np.clip(rng.normal((60, 140, 50), 30, (512, 512, 3)), 0, 255).astype(np.uint8))
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark disease model backends on the same inputs")
+    parser.add_argument("--model", action="append", required=True, help="Model file (.tflite, .onnx, .h5, .keras); repeatable")
+    parser.add_argument("--backend", action="append", help="Backend per --model (default: from the file extension)")
+    parser.add_argument("--data", help="Image directory in collect_data.py layout")
+    parser.add_argument("--images", type=int, default=64, help="Images to run through every model")
+    parser.add_argument("--batch", default="1,8", help="Comma-separated batch sizes")
+    parser.add_argument("--runs", type=int, default=20, help="Timed runs per batch size")
+    parser.add_argument("--threads", type=int, default=None, help="Threads per backend session")
+    args = parser.parse_args()
+
+    backends = args.backend or ["auto"] * len(args.model)
+    if len(backends) != len(args.model):
+        print("Pass --backend once per --model, or not at all")
+        sys.exit(1)
+
+    if args.data:
+        paths = list_images(args.data)
+        random.Random(0).shuffle(paths)
+        sources = [Image.open(p).convert("RGB") for p in paths[:args.images]]
+    else:
+        sources = synthetic_images(args.images)
+    batch_sizes = [int(b) for b in args.batch.split(",")]
+
+    rows = []
+    reference = None
+    for model_path, backend in zip(args.model, backends):
+        start = time.perf_counter()
+        engine = load_engine(model_path, backend, num_threads=args.threads)
+        load_ms = (time.perf_counter() - start) * 1000
+        # Same source images for every model, resized to each model's own input size
+        images = [np.asarray(img.resize(engine.input_size, Image.BILINEAR)) for img in sources]
+        result = benchmark(engine, images, batch_sizes=batch_sizes, runs=args.runs)
+        if reference is None:
+            reference = result["top1"]
+        agreement = 100.0 * sum(a == b for a, b in zip(result["top1"], reference)) / len(reference)
+        rows.append((model_path, engine.backend.name, load_ms, result["batches"], agreement))
+
+    print(f"\n{len(sources)} images, {args.runs} runs per batch size")
+    print(f"{'Model':<40} {'Backend':<8} {'Load ms':>8} {'Batch':>6} {'Median ms':>10} {'Images/s':>9} {'Top-1 agree':>12}")
+    print("-" * 99)
+    for model_path, name, load_ms, batches, agreement in rows:
+        for batch_size, timing in batches.items():
+            print(f"{model_path[-40:]:<40} {name:<8} {load_ms:>8.0f} {batch_size:>6} "
+                  f"{timing['median_ms']:>10.2f} {timing['images_per_second']:>9.1f} {agreement:>11.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the leaf pre-filter gate's thresholds
+Every image in a collect_data.py style training set is a leaf, so any image the
+gate rejects there is a false reject. Non-leaf images (a directory of your own,
+or synthetic blank frames, soil, skin and screenshot-like images) measure how
+many useless invokes each threshold saves.
+
+Usage:
+  python benchmark_leaf_gate.py --data ml-backend/data
+  python benchmark_leaf_gate.py --data ml-backend/data --negatives ~/not_leaves --foliage 0.02,0.05,0.1
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from inference.leaf_gate import DEFAULT_MIN_CONTRAST, foliage_stats
+from inference.preprocess import InvalidImage, decode_leaf_image
+from quantize_model import IMAGE_EXTENSIONS, list_images
+
+
+def synthetic_negatives(count=200, seed=0):
+    """Blank frames, soil, skin tones and flat UI-like images at 256x256"""
+    rng = np.random.default_rng(seed)
+    images = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:  # blank or lens-cap frame
+            img = np.full((256, 256, 3), rng.integers(0, 256), dtype=np.float64) + rng.normal(0, 1.5, (256, 256, 3))
+        elif kind in (1, 2):  # soil close-up, face / skin: brightness texture plus a little sensor noise
+            base = np.array((115, 85, 60) if kind == 1 else (215, 165, 135), dtype=np.float64)
+            img = base * rng.normal(1, 0.15, (256, 256, 1)) + rng.normal(0, 4, (256, 256, 3))
+        else:  # screenshot: flat panels of UI colours
+            img = np.zeros((256, 256, 3))
+            for row in range(0, 256, 32):
+                img[row:row + 32] = rng.choice([(250, 250, 250), (33, 150, 243), (60, 60, 60), (255, 255, 255)])
+        images.append(np.clip(img, 0, 255).astype(np.uint8))
+    return images
+
+
+def load_images(paths):
+    images = []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                images.append(np.asarray(decode_leaf_image(f.read())))
+        except (OSError, InvalidImage):
+            print(f"Skipping unreadable image {path}")
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="False-reject rate and rejection rate of the leaf gate per threshold")
+    parser.add_argument("--data", required=True, help="Training images in collect_data.py layout (all leaves)")
+    parser.add_argument("--negatives", help="Directory of non-leaf images (default: synthetic negatives)")
+    parser.add_argument("--foliage", default="0.01,0.02,0.05,0.1,0.2", help="Comma-separated min foliage ratios")
+    parser.add_argument("--contrast", type=float, default=DEFAULT_MIN_CONTRAST, help="Minimum grey-level std")
+    args = parser.parse_args()
+
+    leaves = load_images(list_images(args.data))
+    if not leaves:
+        print(f"No images found under {args.data}")
+        sys.exit(1)
+    if args.negatives:
+        # Class subfolders like the training set, or just a flat folder of images
+        paths = list_images(args.negatives) or [
+            os.path.join(args.negatives, f) for f in sorted(os.listdir(args.negatives))
+            if f.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        negatives = load_images(paths)
+    else:
+        negatives = synthetic_negatives()
+
+    timings = []
+    leaf_stats = []
+    for image in leaves:
+        start = time.perf_counter()
+        leaf_stats.append(foliage_stats(image))
+        timings.append((time.perf_counter() - start) * 1000)
+    negative_stats = [foliage_stats(image) for image in negatives]
+
+    def rejected(stats, min_foliage):
+        return sum(1 for foliage, contrast in stats if contrast < args.contrast or foliage < min_foliage)
+
+    print(f"\n{len(leaves)} leaf images, {len(negatives)} non-leaf images, "
+          f"median gate time {statistics.median(timings):.3f}ms")
+    print(f"{'Min foliage':>12} {'False rejects':>14} {'FRR':>7} {'Non-leaf rejected':>18}")
+    print("-" * 55)
+    for min_foliage in [float(t) for t in args.foliage.split(",")]:
+        false_rejects = rejected(leaf_stats, min_foliage)
+        caught = rejected(negative_stats, min_foliage)
+        print(f"{min_foliage:>12.3f} {false_rejects:>14} {100.0 * false_rejects / len(leaves):>6.2f}% "
+              f"{100.0 * caught / max(1, len(negatives)):>17.1f}%")
+
+
+if __name__ == "__main__":
+    main()
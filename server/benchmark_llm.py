@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-call overhead of the Ollama transports: the REST client on a
+pooled keep-alive connection, the REST client opening a new connection per
+call, and spawning `ollama run` per call
+
+By default it runs against the fake server and a fake CLI with no generation
+delay, so the numbers are pure transport overhead. Point --url and --bin at a
+real Ollama to include model attach and generation time.
+
+Usage:
+  python benchmark_llm.py
+  python benchmark_llm.py --url http://localhost:11434 --bin /usr/local/bin/ollama --model qwen3:4b --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from llm.fake_server import FakeOllama
+from llm.ollama import OllamaCLI, OllamaClient
+from llm.prompts import disease_info_prompt
+
+FAKE_CLI = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm", "fake_server.py")]
+
+
+def time_calls(generate, prompt, runs):
+    generate(prompt)  # warm-up: first connection, or first process spawn
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        generate(prompt)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples) * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call overhead of Ollama over REST vs the CLI")
+    parser.add_argument("--url", help="Ollama server (default: a local fake server)")
+    parser.add_argument("--bin", help="ollama executable (default: a fake CLI)")
+    parser.add_argument("--model", default="qwen3:4b")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    fake = None
+    url = args.url
+    if not url:
+        fake = FakeOllama().start()
+        url = fake.url
+    prompt = disease_info_prompt("Tomato_Early_blight", "en")
+
+    transports = {
+        "http keep-alive": OllamaClient(url, args.model, timeout=args.timeout),
+        "http new connection": OllamaClient(url, args.model, timeout=args.timeout, pool_size=0),
+        "cli subprocess": OllamaCLI(args.bin or FAKE_CLI, args.model, timeout=args.timeout),
+    }
+    results = {}
+    try:
+        for name, client in transports.items():
+            results[name] = time_calls(client.generate, prompt, args.runs)
+    finally:
+        if fake:
+            fake.stop()
+
+    print(f"\n{'Transport':<22} {'Median':>10} {'p95':>10}")
+    print("-" * 44)
+    for name, r in results.items():
+        print(f"{name:<22} {r['median_ms']:>8.2f}ms {r['p95_ms']:>8.2f}ms")
+    pooled = results["http keep-alive"]["median_ms"]
+    print(f"\nThe CLI costs {results['cli subprocess']['median_ms'] - pooled:.1f}ms more per call than "
+          f"a pooled connection ({results['cli subprocess']['median_ms'] / max(pooled, 1e-6):.0f}x)")
+    if not args.bin:
+        print("(fake CLI: a Python start-up, the real ollama CLI also has to attach to the model)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark startup time and memory of each available TFLite runtime backend
+Each backend is measured in a fresh subprocess so import costs aren't shared.
+
+Usage: python benchmark_runtime.py [--model PATH] [--runs N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from inference.runtime import available_backends
+
+DEFAULT_MODEL = os.path.join(os.path.dirname(__file__), "model", "plant_leaf_diseases_model.tflite")
+
+# Runs in the child process: import the runtime, load the model, run one invoke, report timings and peak RSS
+CHILD_SCRIPT = r"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[3])
+from inference.runtime import load_interpreter_class
+Interpreter, backend = load_interpreter_class(sys.argv[1])
+imported = time.perf_counter()
+interpreter = Interpreter(model_path=sys.argv[2])
+interpreter.allocate_tensors()
+loaded = time.perf_counter()
+import numpy as np
+details = interpreter.get_input_details()[0]
+interpreter.set_tensor(details["index"], np.zeros(details["shape"], dtype=details["dtype"]))
+interpreter.invoke()
+invoked = time.perf_counter()
+try:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+except ImportError:
+    peak_mb = None
+print(json.dumps({
+    "backend": backend,
+    "import_s": imported - start,
+    "load_s": loaded - imported,
+    "first_invoke_s": invoked - loaded,
+    "total_s": invoked - start,
+    "peak_rss_mb": peak_mb,
+}))
+"""
+
+
+def measure(backend, model_path):
+    """Run the child script once for `backend` and return its measurements"""
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, backend, model_path, os.path.dirname(os.path.abspath(__file__))],
+        capture_output=True,
+        text=True,
+        timeout=300
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "child failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Path to the .tflite model")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per backend")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.model):
+        print(f"Model file not found at {args.model}")
+        sys.exit(1)
+
+    backends = available_backends()
+    if not backends:
+        print("No TFLite runtime installed (pip install ai-edge-litert, tflite-runtime or tensorflow)")
+        sys.exit(1)
+
+    print(f"{'Backend':<16} {'Import s':>9} {'Load s':>8} {'Invoke s':>9} {'Total s':>8} {'Peak RSS MB':>12}")
+    print("-" * 66)
+    for backend in backends:
+        try:
+            runs = [measure(backend, args.model) for _ in range(args.runs)]
+        except Exception as e:
+            print(f"{backend:<16} failed: {e}")
+            continue
+        med = {key: statistics.median(r[key] for r in runs) for key in ("import_s", "load_s", "first_invoke_s", "total_s")}
+        rss = [r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None]
+        rss_text = f"{statistics.median(rss):>12.1f}" if rss else f"{'n/a':>12}"
+        print(f"{backend:<16} {med['import_s']:>9.3f} {med['load_s']:>8.3f} "
+              f"{med['first_invoke_s']:>9.3f} {med['total_s']:>8.3f} {rss_text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,4 +5,59 @@ load_dotenv()
 
 MONGO_URI=os.getenv("MONGO_URI")
 JWT_SECRET=os.getenv("JWT_SECRET", "yoursecretkey")
-DB_NAME=os.getenv("DB_NAME", "cropiq")
\ No newline at end of file
+DB_NAME=os.getenv("DB_NAME", "cropiq")
+
+# Disease detection inference settings
+DISEASE_POOL_SIZE=int(os.getenv("DISEASE_POOL_SIZE", str(os.cpu_count() or 1)))
+DISEASE_NUM_THREADS=int(os.getenv("DISEASE_NUM_THREADS", "1"))
+DISEASE_POOL_TIMEOUT=float(os.getenv("DISEASE_POOL_TIMEOUT", "30"))
+DISEASE_MAX_BATCH_SIZE=int(os.getenv("DISEASE_MAX_BATCH_SIZE", "1"))
+DISEASE_MAX_BATCH_WAIT_MS=float(os.getenv("DISEASE_MAX_BATCH_WAIT_MS", "5"))
+DISEASE_BATCH_CHUNK_SIZE=int(os.getenv("DISEASE_BATCH_CHUNK_SIZE", "8"))
+DISEASE_BATCH_MAX_IMAGES=int(os.getenv("DISEASE_BATCH_MAX_IMAGES", "200"))
+DISEASE_RUNTIME=os.getenv("DISEASE_RUNTIME", "auto")  # auto, litert, tflite_runtime or tensorflow
+DISEASE_CACHE_SIZE=int(os.getenv("DISEASE_CACHE_SIZE", "1024"))  # 0 disables the prediction cache
+DISEASE_CACHE_TTL=float(os.getenv("DISEASE_CACHE_TTL", "3600"))
+DISEASE_NEAR_DUP_ENABLED=os.getenv("DISEASE_NEAR_DUP_ENABLED", "false").lower() == "true"
+DISEASE_NEAR_DUP_THRESHOLD=int(os.getenv("DISEASE_NEAR_DUP_THRESHOLD", "6"))  # max Hamming distance between dHashes
+DISEASE_NEAR_DUP_SIZE=int(os.getenv("DISEASE_NEAR_DUP_SIZE", "100000"))
+DISEASE_MODEL_PATH=os.getenv("DISEASE_MODEL_PATH")  # e.g. a quantized variant from quantize_model.py
+ASGI_INFERENCE_WORKERS=int(os.getenv("ASGI_INFERENCE_WORKERS", str((os.cpu_count() or 1) + 4)))  # threads for blocking work under asgi.py
+DISEASE_BACKEND=os.getenv("DISEASE_BACKEND", "auto")  # auto (from the model file extension), tflite, onnx or keras
+DISEASE_DECODE_WORKERS=int(os.getenv("DISEASE_DECODE_WORKERS", "0"))  # 0 decodes uploads on the request thread
+DISEASE_WARMUP_RUNS=int(os.getenv("DISEASE_WARMUP_RUNS", "5"))  # synthetic requests timed at startup before reporting ready
+MODEL_WATCH_INTERVAL=float(os.getenv("MODEL_WATCH_INTERVAL", "0"))  # seconds between model file checks, 0 disables hot reload on change
+ADMIN_TOKEN=os.getenv("ADMIN_TOKEN")  # enables POST /api/admin/reload when set
+DISEASE_GATE_ENABLED=os.getenv("DISEASE_GATE_ENABLED", "false").lower() == "true"  # off until benchmark_leaf_gate.py validates the thresholds on your images
+DISEASE_GATE_MIN_FOLIAGE=float(os.getenv("DISEASE_GATE_MIN_FOLIAGE", "0.05"))  # share of leaf-coloured pixels, see benchmark_leaf_gate.py
+DISEASE_GATE_MIN_CONTRAST=float(os.getenv("DISEASE_GATE_MIN_CONTRAST", "6"))  # grey-level std below which a frame counts as blank
+DISEASE_TILE_GATE=os.getenv("DISEASE_TILE_GATE", "true").lower() == "true"  # skip leafless tiles in tiled mode; a wrongly skipped tile only costs coverage, not the whole photo
+DISEASE_TILE_OVERLAP=float(os.getenv("DISEASE_TILE_OVERLAP", "0.25"))  # share of each tile overlapping its neighbour
+DISEASE_TILE_MAX_SIDE=int(os.getenv("DISEASE_TILE_MAX_SIDE", "1024"))  # long side tiled photos are decoded at; bounds the tile count
+DISEASE_TILE_MAX_TILES=int(os.getenv("DISEASE_TILE_MAX_TILES", "64"))  # tiled photos needing more tiles are refused
+
+# Ollama disease details (optional): the local REST API, with `ollama run` as the fallback when OLLAMA_BIN is set
+OLLAMA_ENABLED=os.getenv("OLLAMA_ENABLED", "false").lower() == "true"
+OLLAMA_URL=os.getenv("OLLAMA_URL", "http://localhost:11434")  # empty runs the CLI only
+OLLAMA_MODEL=os.getenv("OLLAMA_MODEL", "qwen3:4b")
+OLLAMA_BIN=os.getenv("OLLAMA_BIN")  # path to the ollama executable for the CLI fallback
+OLLAMA_CONNECT_TIMEOUT=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "2"))
+OLLAMA_TIMEOUT=float(os.getenv("OLLAMA_TIMEOUT", "120"))  # seconds to wait for a reply, or between streamed chunks
+OLLAMA_POOL_SIZE=int(os.getenv("OLLAMA_POOL_SIZE", "4"))  # idle keep-alive connections kept open
+OLLAMA_MAX_CONCURRENT=int(os.getenv("OLLAMA_MAX_CONCURRENT", "2"))  # Ollama calls running at once, across all requests
+OLLAMA_MAX_QUEUE=int(os.getenv("OLLAMA_MAX_QUEUE", "8"))  # calls waiting for a slot before new ones skip enrichment
+OLLAMA_QUEUE_TIMEOUT=float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "5"))  # seconds a call may wait for a slot
+OLLAMA_BREAKER_FAILURES=int(os.getenv("OLLAMA_BREAKER_FAILURES", "3"))  # consecutive failures that open the circuit
+OLLAMA_BREAKER_COOLDOWN=float(os.getenv("OLLAMA_BREAKER_COOLDOWN", "30"))  # seconds Ollama is skipped once it opens
+DISEASE_KNOWLEDGE_PATH=os.getenv("DISEASE_KNOWLEDGE_PATH")  # SQLite store filled by prewarm_knowledge.py, default model/disease_knowledge.sqlite3
+ENRICHMENT_WORKERS=int(os.getenv("ENRICHMENT_WORKERS", "2"))  # background Ollama calls for ?enrich=async detections
+ENRICHMENT_MAX_PENDING=int(os.getenv("ENRICHMENT_MAX_PENDING", "64"))  # jobs waiting for a worker before new ones are refused
+ENRICHMENT_JOB_TTL=float(os.getenv("ENRICHMENT_JOB_TTL", "600"))  # seconds a finished job can still be polled
+ENRICHMENT_MAX_WAIT=float(os.getenv("ENRICHMENT_MAX_WAIT", "30"))  # longest ?wait= a poll may hold the request open
+
+# Upload limits (bytes per image, declared pixels per image, whole request, in-memory buffer before spilling to disk)
+UPLOAD_MAX_BYTES=int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_MAX_PIXELS=int(os.getenv("UPLOAD_MAX_PIXELS", "50000000"))
+UPLOAD_MAX_REQUEST_BYTES=int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES=int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+UPLOAD_MAX_ZIP_RATIO=float(os.getenv("UPLOAD_MAX_ZIP_RATIO", "100"))  # unpacked:compressed size above which a zipped image is refused
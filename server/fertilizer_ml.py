@@ -8,6 +8,17 @@ import joblib
 import json
 import numpy as np
 
+# Everything the predictor loads; a change to any of them is a new model version
+MODEL_FILES = [
+    'fertilizer_nitrogen_model.pkl',
+    'fertilizer_phosphorus_model.pkl',
+    'fertilizer_potassium_model.pkl',
+    'plant_encoder.pkl',
+    'stage_encoder.pkl',
+    'soil_encoder.pkl',
+    'fertilizer_model_metadata.json'
+]
+
 class FertilizerMLPredictor:
     def __init__(self):
         """Load trained fertilizer models"""
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Dynamic micro-batching for leaf disease inference
+Concurrent requests are queued and grouped into a single batched invoke of up
+to `max_batch_size` images, waiting at most `max_wait_ms` for a batch to fill.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+
+from inference.pool import padded_batch_size
+from utils.metrics import Counter, Histogram
+
+
+class MicroBatcher:
+    def __init__(self, pool, max_batch_size=8, max_wait_ms=5.0):
+        """Start one dispatcher thread per pooled interpreter"""
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._batched_invoke = max_batch_size > 1
+
+        self.batch_sizes = Histogram(
+            "disease_batch_size",
+            "Images per batched invoke",
+            buckets=range(1, max_batch_size + 1)
+        )
+        self.batch_latency = Histogram("disease_batch_invoke_seconds", "Time per batched invoke")
+        self.queue_wait = Histogram("disease_batch_queue_seconds", "Time a request waits to be batched")
+        self.failures = Counter("disease_batch_failures_total", "Batches whose invoke raised")
+
+        self._workers = []
+        for i in range(pool.size):
+            worker = threading.Thread(target=self._dispatch_loop, name=f"disease-batcher-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, image):
+        """Queue one decoded uint8 HxWx3 image; the future resolves to its score vector"""
+        future = Future()
+        self._queue.put((image, future, time.perf_counter()))
+        return future
+
+    def predict(self, image, timeout=None):
+        """Blocking helper around submit(); a timed-out request is dropped from the queue
+
+        Raises the builtin TimeoutError, which the futures one only became on Python 3.11.
+        """
+        future = self.submit(image)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"Batched invoke did not finish within {timeout}s")
+
+    def close(self):
+        """Stop the dispatcher threads once the requests already queued have been run"""
+        for _ in self._workers:
+            self._queue.put(None)
+
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the batch is full or the deadline passes"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while self._batched_invoke and len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Leave the stop signal for the next loop of this or another dispatcher
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            # Skip requests whose caller already gave up waiting
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            dispatched = time.perf_counter()
+            for _, _, queued_at in batch:
+                self.queue_wait.observe(dispatched - queued_at)
+            try:
+                outputs = self._invoke(batch)
+            except Exception as e:
+                self.failures.inc()
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), row in zip(batch, outputs):
+                future.set_result(row)
+
+    def _invoke(self, batch):
+        """Run the batch on one interpreter and return one flat score vector per image"""
+        if len(batch) > 1 and not self._batched_invoke:
+            return [row for item in batch for row in self._invoke([item])]
+
+        start = time.perf_counter()
+        with self.pool.checkout() as interpreter:
+            try:
+                self.pool.ensure_batch_size(interpreter, padded_batch_size(len(batch), self.max_batch_size))
+            except Exception as e:
+                if len(batch) == 1:
+                    raise
+                # Model has a fixed batch dimension - fall back to one invoke per image
+                print(f"Batched invoke not supported by model, disabling micro-batching: {e}")
+                self._batched_invoke = False
+                raw_output = None
+            else:
+                self.pool.fill_input(interpreter, [image for image, _, _ in batch])
+                interpreter.invoke()
+                raw_output = self.pool.read_output(interpreter)
+        if raw_output is None:
+            return self._invoke(batch)
+
+        self.batch_latency.observe(time.perf_counter() - start)
+        self.batch_sizes.observe(len(batch))
+        # Padded rows past the last request are dropped
+        return list(np.asarray(raw_output)[:len(batch)].reshape(len(batch), -1))
+
+    def stats(self):
+        """Batch size histogram, queue depth and invoke latency"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batched_invoke": self._batched_invoke,
+            "queue_depth": self._queue.qsize(),
+            "failures": self.failures.value,
+            "batch_size": self.batch_sizes.snapshot(),
+            "invoke_seconds": self.batch_latency.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+        }
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Content-addressed prediction cache
+Repeated uploads of the same photo (retries, flaky submissions) are answered
+from a bounded LRU cache with a TTL, keyed by a hash of the raw image bytes,
+the model version and the response language.
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import Counter
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """Stable content hash of an upload"""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+def file_digest(path, digest_size=6) -> str:
+    """Short content hash of a file, used as a model version tag"""
+    h = hashlib.blake2b(digest_size=digest_size)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def files_digest(paths, digest_size=6) -> str:
+    """Short content hash over several files, for models saved as more than one file"""
+    h = hashlib.blake2b(digest_size=digest_size)
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, max_entries=1024, ttl_seconds=3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+
+        self.hits = Counter("disease_cache_hits_total", "Detections answered from the cache")
+        self.misses = Counter("disease_cache_misses_total", "Detections not found in the cache")
+        self.evictions = Counter("disease_cache_evictions_total", "Entries dropped to stay within max_entries")
+        self.expirations = Counter("disease_cache_expirations_total", "Entries dropped because their TTL passed")
+
+    @staticmethod
+    def make_key(image_bytes, model_version, lang):
+        return (image_digest(image_bytes), model_version, lang)
+
+    @staticmethod
+    def make_digest_key(digest, model_version, lang):
+        """Key for an upload whose image_digest() was computed while it streamed in"""
+        return (digest, model_version, lang)
+
+    def get(self, key):
+        """Return a copy of the cached response for `key`, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expirations.inc()
+                entry = None
+            if entry is None:
+                self.misses.inc()
+                return None
+            self._entries.move_to_end(key)
+        self.hits.inc()
+        return copy.deepcopy(entry[1])
+
+    def put(self, key, response):
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, copy.deepcopy(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions.inc()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Size and hit/miss/eviction counters"""
+        lookups = self.hits.value + self.misses.value
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+            "hit_rate": (self.hits.value / lookups) if lookups else 0.0,
+            "evictions": self.evictions.value,
+            "expirations": self.expirations.value,
+        }
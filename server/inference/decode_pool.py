@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Process-pool image decode and resize
+Moves PIL decode/resize off the request threads into worker processes so it
+scales across cores independently of the interpreter pool and doesn't hold
+the GIL the serving threads need. Workers write the resized uint8 pixels into
+slots of one shared-memory block; only the compressed upload and a slot index
+cross the process boundary, never a pickled array.
+"""
+
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from inference.preprocess import INPUT_SIZE, decode_leaf_image
+from utils.metrics import Counter, Histogram
+
+# Shared-memory blocks this worker process has attached, by name
+_attached = {}
+
+
+def _slots_view(shm, slots, size):
+    width, height = size
+    return np.ndarray((slots, height, width, 3), dtype=np.uint8, buffer=shm.buf)
+
+
+def _decode_into_slot(shm_name, slots, size, slot, image_bytes, max_pixels):
+    """Worker side: decode one upload into its shared-memory slot and return stage timings"""
+    started = time.time()
+    if shm_name not in _attached:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _attached[shm_name] = (shm, _slots_view(shm, slots, size))
+    view = _attached[shm_name][1]
+    start = time.perf_counter()
+    view[slot] = np.asarray(decode_leaf_image(image_bytes, size=size, max_pixels=max_pixels))
+    return started, time.perf_counter() - start
+
+
+def _start_context():
+    """forkserver where available, else spawn; never fork
+
+    The pool is started from the model-loader thread, on hot reload and after a
+    crash from a request thread, while the server's other threads may hold locks
+    a forked child would inherit forever. The fork server is a fresh process that
+    only imports this module, so workers fork from it cheaply and safely.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+@contextmanager
+def _without_main_script():
+    """Keep new workers from re-running the server script
+
+    spawn and forkserver children re-import the parent's __main__, which for
+    `python app.py` would load the models and start the loader thread again in
+    every worker. They only need this module, so the script is hidden from
+    multiprocessing while they start.
+    """
+    main = sys.modules["__main__"]
+    saved = {name: main.__dict__[name] for name in ("__file__", "__spec__") if name in main.__dict__}
+    main.__dict__.pop("__file__", None)
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        main.__dict__.pop("__spec__", None)
+        main.__dict__.update(saved)
+
+
+def _kill_workers(executor):
+    """Terminate an executor's worker processes, which shutdown() leaves running"""
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class DecodePool:
+    def __init__(self, workers=2, size=INPUT_SIZE, max_pixels=None, slots=None):
+        """Start `workers` decode processes sharing `slots` result buffers (default 2 per worker)"""
+        if workers < 1:
+            raise ValueError("Decode pool needs at least 1 worker")
+
+        self.workers = workers
+        self.size = tuple(size)
+        self.max_pixels = max_pixels
+        self.slots = slots or workers * 2
+        width, height = self.size
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * width * height * 3)
+        self._view = _slots_view(self._shm, self.slots, self.size)
+        self._free = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._lock = threading.Lock()
+
+        self.queue_wait = Histogram("disease_decode_pool_queue_seconds", "Time an upload waits for a decode worker")
+        self.decode_time = Histogram("disease_decode_pool_decode_seconds", "Decode and resize time inside a worker")
+        self.total_time = Histogram("disease_decode_pool_total_seconds", "Round trip from submit to pixels in hand")
+        self.slot_timeouts = Counter(
+            "disease_decode_pool_timeouts_total", "Decodes that gave up waiting for a slot or a worker"
+        )
+        self.restarts = Counter("disease_decode_pool_restarts_total", "Times a crashed or stuck worker pool was replaced")
+
+        self._executor = self._start_executor()
+
+    def _start_executor(self):
+        executor = ProcessPoolExecutor(self.workers, mp_context=_start_context())
+        # Start every worker now, while the script is hidden, rather than on demand from a request
+        with _without_main_script():
+            list(executor.map(time.sleep, [0] * self.workers))
+        return executor
+
+    def decode(self, image_bytes, timeout=None):
+        """Decode and resize upload bytes in a worker and return a uint8 HxWx3 array
+
+        Raises InvalidImage / ImageTooLarge like decode_leaf_image(), and TimeoutError
+        when the result isn't back within `timeout`, waiting for a slot included. A
+        worker that overruns is presumed stuck and the pool is restarted.
+        """
+        submitted = time.time()
+        start = time.perf_counter()
+        deadline = None if timeout is None else start + timeout
+        try:
+            slot = self._free.get(timeout=timeout)
+        except queue.Empty:
+            self.slot_timeouts.inc()
+            raise TimeoutError(f"No decode slot available after {timeout}s")
+
+        with self._lock:
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+        executor = self._executor
+        try:
+            future = executor.submit(
+                _decode_into_slot, self._shm.name, self.slots, self.size, slot, bytes(image_bytes), self.max_pixels
+            )
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            started, decode_seconds = future.result(timeout=remaining)
+            # Copy out so the slot can be reused as soon as we return
+            image = self._view[slot].copy()
+        except FutureTimeout:
+            # The worker may still write into the slot, so it is killed before the slot is freed
+            self.slot_timeouts.inc()
+            self._restart(executor, f"Decode worker took longer than {timeout}s")
+            raise TimeoutError(f"Image decode did not finish within {timeout}s")
+        except BrokenProcessPool:
+            self._restart(executor, "Decode worker died")
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._free.put(slot)
+
+        self.queue_wait.observe(max(0.0, started - submitted))
+        self.decode_time.observe(decode_seconds)
+        self.total_time.observe(time.perf_counter() - start)
+        return image
+
+    def _restart(self, broken, reason):
+        """Replace a pool whose worker died or hung; concurrent callers restart it only once"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            print(f"{reason}, restarting the decode pool")
+            _kill_workers(broken)
+            self._executor = self._start_executor()
+        self.restarts.inc()
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+        self._shm.close()
+        self._shm.unlink()
+
+    def stats(self):
+        """Queue depth and per-stage latency histograms"""
+        in_flight = self._in_flight
+        return {
+            "workers": self.workers,
+            "slots": self.slots,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.workers),
+            "max_in_flight": self._max_in_flight,
+            "timeouts": self.slot_timeouts.value,
+            "restarts": self.restarts.value,
+            "queue_seconds": self.queue_wait.snapshot(),
+            "decode_seconds": self.decode_time.snapshot(),
+            "total_seconds": self.total_time.snapshot(),
+        }
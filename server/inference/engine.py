@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Disease inference engine shared by every CropIQ backend
+Owns the class list, preprocessing, the model backend and the top-3 logic so
+server/app.py, ml-backend/app.py and the LeafLens backend run the same code.
+Backends are pluggable: TFLite (through the interpreter pool), ONNX Runtime
+and Keras .h5/.keras models such as the one ml-backend/train_model.py saves.
+"""
+
+import os
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from inference.pool import BatchResizeError, InterpreterPool, PoolTimeout
+from inference.preprocess import INPUT_SIZE, decode_leaf_image
+from inference.runtime import load_interpreter_class
+from utils.metrics import Counter, Histogram
+
+CLASS_NAMES = [
+    "Pepper_bell_Bacterial_spot",
+    "Pepperbell_healthy",
+    "Potato_Early_blight",
+    "Potato_Late_blight",
+    "Potato_healthy",
+    "Tomato_Bacterial_spot",
+    "Tomato_Early_blight",
+    "Tomato_Late_blight",
+    "Tomato_Leaf_Mold",
+    "Tomato_Septoria_leaf_spot",
+    "Tomato_Spider_mites_Two_spotted_spider_mite",
+    "TomatoTarget_Spot",
+    "TomatoTomato_YellowLeafCurl_Virus",
+    "Tomato_Tomato_mosaic_virus",
+    "Tomato_healthy"
+]
+
+# Backend picked from the model file extension when none is named
+MODEL_EXTENSIONS = {".tflite": "tflite", ".onnx": "onnx", ".h5": "keras", ".keras": "keras"}
+
+
+def top_predictions(scores, class_names=CLASS_NAMES):
+    """Return (predicted, confidence, top3) from a flat score vector"""
+    top_idx = int(np.argmax(scores))
+    top3_idx = np.argsort(scores)[-3:][::-1]
+    top3 = [{"label": class_names[i], "score": float(scores[i] * 100)} for i in top3_idx]
+    return class_names[top_idx], float(scores[top_idx] * 100), top3
+
+
+def build_detection_response(scores, class_names=CLASS_NAMES) -> dict:
+    """Build the disease detection response body from a flat score vector"""
+    predicted, confidence, top3 = top_predictions(scores, class_names)
+
+    # Determine if healthy
+    is_healthy = 'healthy' in predicted.lower()
+
+    # Create user-friendly disease name
+    disease_display = predicted.replace('_', ' ').title()
+    if 'Healthy' in disease_display:
+        result_message = "No disease detected - Plant appears healthy"
+        disease_status = "Healthy"
+    else:
+        result_message = f"Disease detected: {disease_display}"
+        disease_status = disease_display
+
+    return {
+        "disease": disease_status,
+        "predicted": predicted,
+        "confidence": confidence,
+        "message": result_message,
+        "top3": top3,
+        "prediction_details": {
+            "detected_condition": disease_display,
+            "confidence_percentage": confidence,
+            "is_healthy": is_healthy
+        }
+    }
+
+
+def normalize_batch(images, dtype=np.float32):
+    """Stack uint8 HxWx3 images into one batch, scaled to [0, 1] unless the model takes raw uint8"""
+    batch = np.stack(images)
+    if np.dtype(dtype) == np.uint8:
+        return batch
+    out = np.empty(batch.shape, dtype=dtype)
+    np.multiply(batch, np.float32(1.0 / 255.0), out=out, casting="unsafe")
+    return out
+
+
+class TFLiteBackend:
+    name = "tflite"
+
+    def __init__(self, model_path, pool_size=1, num_threads=None, runtime="auto", interpreter_class=None):
+        if interpreter_class is None:
+            interpreter_class, runtime = load_interpreter_class(runtime)
+        self.runtime = runtime
+        self.pool = InterpreterPool(model_path, interpreter_class, size=pool_size, num_threads=num_threads)
+        self.input_size = tuple(int(d) for d in self.pool.input_details["shape"][1:3])[::-1]
+        self.batched_invoke = True
+
+    def run(self, images, timeout=None):
+        """Scores for uint8 HxWx3 images, one batched invoke when the model allows it"""
+        if self.batched_invoke and len(images) > 1:
+            try:
+                return self.pool.run(images, timeout=timeout)
+            except BatchResizeError as e:
+                # Model has a fixed batch dimension - run the images one at a time from now on
+                print(f"Batched invoke not supported by model, falling back to single images: {e}")
+                self.batched_invoke = False
+        if len(images) == 1:
+            return self.pool.run(images, timeout=timeout)
+        return np.concatenate([self.pool.run([image], timeout=timeout) for image in images])
+
+    def stats(self):
+        return self.pool.stats()
+
+
+class _SessionBackend:
+    """Shared concurrency limit for backends whose session object runs many batches itself"""
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError("Backend pool size must be at least 1")
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self.timeouts = Counter("disease_backend_timeouts_total", "Runs that gave up waiting for a free slot")
+        self.invoke_time = Histogram("disease_invoke_seconds", "Time a run holds a slot: input conversion and invoke")
+
+    @contextmanager
+    def _slot(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            self.timeouts.inc()
+            raise PoolTimeout(f"No {self.name} slot available after {timeout}s")
+        with self._lock:
+            self._in_use += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.invoke_time.observe(time.perf_counter() - start)
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "in_use": self._in_use,
+            "timeouts": self.timeouts.value,
+            "invoke_seconds": self.invoke_time.snapshot(),
+        }
+
+
+class OnnxBackend(_SessionBackend):
+    name = "onnx"
+
+    def __init__(self, model_path, pool_size=1, num_threads=None, **_):
+        import onnxruntime as ort  # optional: only needed to serve .onnx models
+
+        super().__init__(pool_size)
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.runtime = f"onnxruntime {ort.__version__}"
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = list(model_input.shape)
+        # Models exported from PyTorch are usually NCHW, from Keras NHWC
+        self.channels_first = shape[1] == 3 and shape[-1] != 3
+        dims = shape[2:4] if self.channels_first else shape[1:3]
+        self.input_size = tuple(int(d) for d in dims)[::-1] if all(isinstance(d, int) for d in dims) else INPUT_SIZE
+        self.input_dtype = np.uint8 if model_input.type == "tensor(uint8)" else np.float32
+        self.fixed_batch = shape[0] if isinstance(shape[0], int) else None
+
+    def _invoke(self, images):
+        batch = normalize_batch(images, self.input_dtype)
+        if self.channels_first:
+            batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+        return self.session.run(None, {self.input_name: batch})[0]
+
+    def run(self, images, timeout=None):
+        with self._slot(timeout):
+            if self.fixed_batch and self.fixed_batch != len(images):
+                return np.concatenate([self._invoke([image]) for image in images])
+            return self._invoke(images)
+
+
+class KerasBackend(_SessionBackend):
+    name = "keras"
+
+    def __init__(self, model_path, pool_size=1, **_):
+        from tensorflow import keras  # optional: only needed to serve .h5/.keras models
+
+        super().__init__(pool_size)
+        self.model = keras.models.load_model(model_path, compile=False)
+        self.runtime = f"keras {keras.__version__}"
+        _, height, width, _ = self.model.input_shape
+        self.input_size = (int(width), int(height)) if width and height else INPUT_SIZE
+
+    def run(self, images, timeout=None):
+        with self._slot(timeout):
+            return np.asarray(self.model.predict_on_batch(normalize_batch(images)))
+
+
+ENGINE_BACKENDS = {"tflite": TFLiteBackend, "onnx": OnnxBackend, "keras": KerasBackend}
+
+
+class DiseaseEngine:
+    def __init__(self, backend, class_names=CLASS_NAMES):
+        self.backend = backend
+        self.class_names = list(class_names)
+        self.input_size = backend.input_size
+
+    def preprocess(self, image, max_pixels=None) -> np.ndarray:
+        """Validate and decode an upload (bytes or file object) to the model's input size as a uint8 array"""
+        return np.asarray(decode_leaf_image(image, size=self.input_size, max_pixels=max_pixels))
+
+    def scores(self, images, timeout=None) -> np.ndarray:
+        """Run preprocessed images through the backend and return an (N, num_classes) array"""
+        return np.asarray(self.backend.run(list(images), timeout=timeout)).reshape(len(images), -1)
+
+    def predict(self, images, timeout=None):
+        """Return {"predicted", "confidence", "top3"} for each image (uint8 array or encoded bytes)"""
+        images = [self.preprocess(i) if isinstance(i, (bytes, bytearray)) else i for i in images]
+        results = []
+        for scores in self.scores(images, timeout=timeout):
+            predicted, confidence, top3 = top_predictions(scores, self.class_names)
+            results.append({"predicted": predicted, "confidence": confidence, "top3": top3})
+        return results
+
+    def stats(self):
+        return self.backend.stats()
+
+
+def load_engine(model_path, backend="auto", class_names=CLASS_NAMES, **backend_options):
+    """Build a DiseaseEngine for `model_path`, picking the backend from its extension unless named
+
+    `backend_options` (pool_size, num_threads, runtime, ...) are passed to the backend.
+    """
+    backend = (backend or "auto").strip().lower()
+    if backend == "auto":
+        extension = os.path.splitext(model_path)[1].lower()
+        if extension not in MODEL_EXTENSIONS:
+            raise ValueError(f"Can't tell the backend for '{model_path}' (expected {', '.join(MODEL_EXTENSIONS)})")
+        backend = MODEL_EXTENSIONS[extension]
+    if backend not in ENGINE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}' (expected auto, {', '.join(ENGINE_BACKENDS)})")
+    return DiseaseEngine(ENGINE_BACKENDS[backend](model_path, **backend_options), class_names)
+
+
+def benchmark(engine, images, batch_sizes=(1, 8), runs=20):
+    """Time an engine on uint8 images already sized for it
+
+    Returns the top-1 index per image and, per batch size, the median batch
+    latency in ms and throughput in images per second.
+    """
+    chunk = max(batch_sizes)
+    top1 = [int(np.argmax(s)) for i in range(0, len(images), chunk) for s in engine.scores(images[i:i + chunk])]
+    timings = {}
+    for batch_size in batch_sizes:
+        batch = [images[i % len(images)] for i in range(batch_size)]
+        engine.scores(batch)  # warm-up, also resizes the input for this batch size
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            engine.scores(batch)
+            samples.append(time.perf_counter() - start)
+        median = statistics.median(samples)
+        timings[batch_size] = {"median_ms": median * 1000, "images_per_second": batch_size / median}
+    return {"top1": top1, "batches": timings}
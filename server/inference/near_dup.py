@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Perceptual-hash near-duplicate cache
+Catches re-shot or recompressed copies of a leaf photo that the exact
+content-hash cache misses. A 64-bit dHash of the already-resized image is
+looked up within a Hamming-distance threshold using multi-index hashing:
+the hash is split into four 16-bit blocks, each block is indexed in its own
+table, and by the pigeonhole principle any hash within distance t must match
+some block within distance t // 4. Lookups touch a handful of buckets
+regardless of how many entries are stored.
+"""
+
+import copy
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from utils.metrics import Counter
+
+BLOCKS = 4
+BLOCK_BITS = 64 // BLOCKS
+BLOCK_MASK = (1 << BLOCK_BITS) - 1
+
+
+def dhash(image: np.ndarray) -> int:
+    """64-bit difference hash of an HxWx3 uint8 image"""
+    gray = Image.fromarray(image).convert("L").resize((9, 8), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _neighbours(value, radius):
+    """All BLOCK_BITS-bit values within `radius` bit flips of `value`"""
+    yield value
+    for r in range(1, radius + 1):
+        for positions in itertools.combinations(range(BLOCK_BITS), r):
+            flipped = value
+            for p in positions:
+                flipped ^= 1 << p
+            yield flipped
+
+
+class NearDuplicateCache:
+    def __init__(self, threshold=6, max_entries=100000, ttl_seconds=3600.0):
+        if not 0 <= threshold < 64:
+            raise ValueError("Hamming threshold must be between 0 and 63")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._radius = threshold // BLOCKS
+
+        self._entries = OrderedDict()  # entry id -> (hash, scope, expires_at, response)
+        self._tables = [dict() for _ in range(BLOCKS)]  # block value -> set of entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = Counter("disease_near_dup_hits_total", "Detections answered by a near-duplicate")
+        self.misses = Counter("disease_near_dup_misses_total", "Near-duplicate lookups with no match")
+        self.evictions = Counter("disease_near_dup_evictions_total", "Entries dropped to stay within max_entries")
+        self._time_saved = 0.0
+        self._miss_cost = 0.0  # running mean of the inference time a hit avoids
+        self._miss_cost_samples = 0
+
+    @staticmethod
+    def _blocks(h):
+        return [(h >> (i * BLOCK_BITS)) & BLOCK_MASK for i in range(BLOCKS)]
+
+    def _remove(self, entry_id):
+        h = self._entries.pop(entry_id)[0]
+        for table, block in zip(self._tables, self._blocks(h)):
+            bucket = table.get(block)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del table[block]
+
+    def lookup(self, h, scope):
+        """Return a copy of the closest cached response within the threshold, or None
+
+        `scope` (e.g. model version and language) must match exactly.
+        """
+        now = time.monotonic()
+        best = None
+        with self._lock:
+            seen = set()
+            expired = []
+            for table, block in zip(self._tables, self._blocks(h)):
+                for candidate in _neighbours(block, self._radius):
+                    for entry_id in table.get(candidate, ()):
+                        if entry_id in seen:
+                            continue
+                        seen.add(entry_id)
+                        entry_hash, entry_scope, expires_at, response = self._entries[entry_id]
+                        if expires_at <= now:
+                            expired.append(entry_id)
+                            continue
+                        if entry_scope != scope:
+                            continue
+                        distance = bin(entry_hash ^ h).count("1")
+                        if distance <= self.threshold and (best is None or distance < best[0]):
+                            best = (distance, entry_id, response)
+            for entry_id in expired:
+                self._remove(entry_id)
+            if best is None:
+                self.misses.inc()
+                return None
+            self._entries.move_to_end(best[1])
+            self._time_saved += self._miss_cost
+        self.hits.inc()
+        return copy.deepcopy(best[2])
+
+    def add(self, h, scope, response):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (h, scope, time.monotonic() + self.ttl, copy.deepcopy(response))
+            for table, block in zip(self._tables, self._blocks(h)):
+                table.setdefault(block, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions.inc()
+
+    def record_miss_cost(self, seconds):
+        """Feed the time a full inference took, used to estimate time saved per hit"""
+        with self._lock:
+            self._miss_cost_samples += 1
+            self._miss_cost += (seconds - self._miss_cost) / self._miss_cost_samples
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for table in self._tables:
+                table.clear()
+
+    def stats(self):
+        """Size, hit rate and estimated inference time saved"""
+        lookups = self.hits.value + self.misses.value
+        return {
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+            "hit_rate": (self.hits.value / lookups) if lookups else 0.0,
+            "evictions": self.evictions.value,
+            "time_saved_seconds": self._time_saved,
+        }
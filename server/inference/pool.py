@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+TFLite interpreter pool
+Holds several interpreters built from the same model so concurrent requests
+can run inference in parallel instead of sharing one interpreter.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from utils.metrics import Counter, Histogram
+
+
+class PoolTimeout(TimeoutError):
+    """Raised when no interpreter becomes free within the checkout timeout"""
+
+
+class BatchResizeError(RuntimeError):
+    """Raised when the model refuses an input resized to a new batch size"""
+
+
+def padded_batch_size(count, limit=None):
+    """Smallest of 1, 2, 4, 8, ... (capped at `limit`) that holds `count` images
+
+    Batches are padded up to one of these sizes so each interpreter is resized,
+    and its tensors re-allocated, for only a handful of input shapes.
+    """
+    size = 1 << max(count - 1, 0).bit_length()
+    if limit is not None and count <= limit:
+        size = min(size, limit)
+    return size
+
+
+class InterpreterPool:
+    def __init__(self, model_path, interpreter_class, size=1, num_threads=None):
+        """Build `size` interpreters from the same model file"""
+        if size < 1:
+            raise ValueError("Interpreter pool size must be at least 1")
+
+        self.model_path = model_path
+        self.size = size
+        self.num_threads = num_threads
+        self._idle = queue.LifoQueue()  # LIFO keeps recently used interpreters cache-warm
+        self._batch_sizes = {}  # id(interpreter) -> batch dimension its input is currently sized for
+        self._scratch = {}  # id(interpreter) -> reusable input buffer for runtimes without tensor() views
+        self._in_use = 0
+        self._lock = threading.Lock()
+
+        self.wait_time = Histogram("disease_pool_wait_seconds", "Time spent waiting for a free interpreter")
+        self.timeouts = Counter("disease_pool_timeouts_total", "Checkouts that gave up waiting")
+        self.invoke_time = Histogram("disease_invoke_seconds", "Time spent in interpreter.invoke() per batch")
+        self.resizes = Counter("disease_interpreter_resizes_total", "Input resizes that re-allocated an interpreter's tensors")
+
+        for _ in range(size):
+            interpreter = interpreter_class(model_path=model_path, num_threads=num_threads)
+            interpreter.allocate_tensors()
+            self._idle.put(interpreter)
+
+        # All interpreters share the same model, so the first one describes them all
+        sample = self._idle.get()
+        self.input_details = sample.get_input_details()[0]
+        self.output_details = sample.get_output_details()[0]
+        self._idle.put(sample)
+        self._default_batch_size = int(self.input_details["shape"][0])
+        self.quantized_input = np.dtype(self.input_details["dtype"]).kind in "iu"
+        self._input_scale, self._input_zero_point = self.input_details.get("quantization", (0.0, 0))
+        # uint8 input whose quantization maps q straight to q/255 takes raw pixels with no conversion
+        self._raw_pixels = (
+            np.dtype(self.input_details["dtype"]) == np.uint8
+            and self._input_zero_point == 0
+            and abs(self._input_scale * 255.0 - 1.0) < 1e-3
+        )
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an interpreter for the duration of the `with` block"""
+        start = time.perf_counter()
+        try:
+            interpreter = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            self.timeouts.inc()
+            raise PoolTimeout(f"No interpreter available after {timeout}s")
+        self.wait_time.observe(time.perf_counter() - start)
+
+        with self._lock:
+            self._in_use += 1
+        try:
+            yield interpreter
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(interpreter)
+
+    def ensure_batch_size(self, interpreter, batch_size):
+        """Resize a checked-out interpreter's input to `batch_size` images if it isn't already"""
+        current = self._batch_sizes.get(id(interpreter), self._default_batch_size)
+        if current == batch_size:
+            return
+        shape = [batch_size] + [int(d) for d in self.input_details["shape"][1:]]
+        try:
+            interpreter.resize_tensor_input(self.input_details["index"], shape)
+            interpreter.allocate_tensors()
+        except Exception as e:
+            # Shape is unknown after a failed resize, so force one on next use
+            self._batch_sizes[id(interpreter)] = None
+            raise BatchResizeError(f"Cannot resize input to a batch of {batch_size}: {e}") from e
+        self._batch_sizes[id(interpreter)] = batch_size
+        self.resizes.inc()
+
+    def _write_pixels(self, image, out):
+        """Convert one uint8 HxWx3 image into the model's input encoding, writing into `out`"""
+        if not self.quantized_input:
+            np.multiply(image, np.float32(1.0 / 255.0), out=out, casting="unsafe")
+        elif self._raw_pixels:
+            np.copyto(out, image)
+        else:
+            # General quantized input: q = x / scale + zero_point with x = pixel / 255
+            info = np.iinfo(out.dtype)
+            q = np.rint(image / (255.0 * self._input_scale) + self._input_zero_point)
+            np.copyto(out, np.clip(q, info.min, info.max), casting="unsafe")
+
+    def fill_input(self, interpreter, images):
+        """Write uint8 HxWx3 images into a checked-out interpreter's input, normalizing in place
+
+        Pixels are scaled straight into the interpreter's own input buffer through a
+        tensor() view, so no float copy of the batch is allocated per request. Quantized
+        uint8 models take the pixels as-is without the /255 float conversion. Rows past
+        the last image (padding up to the input's batch size) are left as they are.
+        """
+        index = self.input_details["index"]
+        if hasattr(interpreter, "tensor"):
+            view = interpreter.tensor(index)()
+            for i, image in enumerate(images):
+                self._write_pixels(image, view[i])
+            # The view must be released before invoke(), which refuses to run while it is referenced
+            del view
+            return
+
+        # Fallback: normalize into a reusable scratch buffer and copy it in with set_tensor()
+        batch_size = self._batch_sizes.get(id(interpreter), self._default_batch_size)
+        shape = (batch_size,) + tuple(int(d) for d in self.input_details["shape"][1:])
+        scratch = self._scratch.get(id(interpreter))
+        if scratch is None or scratch.shape != shape:
+            # Zeroed so padded rows past the last image never hold garbage such as NaNs
+            scratch = np.zeros(shape, dtype=self.input_details["dtype"])
+            self._scratch[id(interpreter)] = scratch
+        for i, image in enumerate(images):
+            self._write_pixels(image, scratch[i])
+        interpreter.set_tensor(index, scratch)
+
+    def read_output(self, interpreter):
+        """Copy the output tensor, dequantizing integer outputs to float scores"""
+        raw = interpreter.get_tensor(self.output_details["index"])
+        if np.dtype(self.output_details["dtype"]).kind in "iu":
+            scale, zero_point = self.output_details.get("quantization", (0.0, 0))
+            if scale:
+                return (raw.astype(np.float32) - zero_point) * scale
+        return raw
+
+    def run(self, images, timeout=None):
+        """Run one forward pass over uint8 HxWx3 images and return the output scores"""
+        with self.checkout(timeout=timeout) as interpreter:
+            self.ensure_batch_size(interpreter, padded_batch_size(len(images)))
+            self.fill_input(interpreter, images)
+            with self.invoke_time.time():
+                interpreter.invoke()
+            return self.read_output(interpreter)[:len(images)]
+
+    def stats(self):
+        """Current pool occupancy and wait-time histogram"""
+        return {
+            "size": self.size,
+            "num_threads": self.num_threads,
+            "in_use": self._in_use,
+            "idle": self._idle.qsize(),
+            "timeouts": self.timeouts.value,
+            "resizes": self.resizes.value,
+            "wait_seconds": self.wait_time.snapshot(),
+            "invoke_seconds": self.invoke_time.snapshot(),
+        }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Single-pass image decode for disease detection uploads
+Validates and decodes the upload in one go, and for JPEGs asks libjpeg for a
+DCT-scaled decode close to the model's input size instead of decoding the full
+camera resolution and throwing most of it away.
+"""
+
+import io
+import time
+
+from PIL import Image
+
+from utils.metrics import Histogram
+
+INPUT_SIZE = (256, 256)
+
+decode_seconds = Histogram("disease_decode_seconds", "Time to open and decode an upload")
+resize_seconds = Histogram("disease_resize_seconds", "Time to convert and resize a decoded upload")
+
+
+class InvalidImage(ValueError):
+    """Raised when upload bytes are not a decodable image"""
+
+
+class ImageTooLarge(InvalidImage):
+    """Raised when an image's declared dimensions pass the pixel limit"""
+
+
+def _open_checked(image, max_pixels):
+    """Open upload bytes or a file object and check its declared size against `max_pixels`"""
+    try:
+        img = Image.open(io.BytesIO(image) if isinstance(image, (bytes, bytearray)) else image)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(f"Image dimensions too large ({e})") from e
+    except Exception as e:
+        raise InvalidImage(f"Invalid image file: {e}") from e
+    width, height = img.size
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLarge(
+            f"Image dimensions too large ({width}x{height}, limit is {max_pixels / 1e6:.0f} megapixels)"
+        )
+    return img
+
+
+def _load(img, size):
+    """Decode pixel data, letting libjpeg scale by 1/2, 1/4 or 1/8 while decoding, never going below `size`"""
+    try:
+        if img.format == "JPEG":
+            img.draft("RGB", size)
+        img.load()  # full decode - truncated or corrupt files fail here
+    except Exception as e:
+        raise InvalidImage(f"Invalid image file: {e}") from e
+    return img
+
+
+def decode_leaf_image(image, size=INPUT_SIZE, max_pixels=None) -> Image.Image:
+    """Decode upload bytes (or a file object) into an RGB image of `size`
+
+    Raises InvalidImage for bad files, and ImageTooLarge from the header alone,
+    before any pixel data is decoded, when width x height passes `max_pixels`.
+    """
+    start = time.perf_counter()
+    img = _load(_open_checked(image, max_pixels), size)
+    decoded = time.perf_counter()
+
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    img = img.resize(size, Image.BILINEAR)
+
+    decode_seconds.observe(decoded - start)
+    resize_seconds.observe(time.perf_counter() - decoded)
+    return img
+
+
+def decode_leaf_image_fit(image, max_side, min_side=INPUT_SIZE[0], max_pixels=None) -> Image.Image:
+    """Decode an upload keeping its aspect ratio, scaled so its long side is at most `max_side`
+
+    Small images are scaled up until their short side reaches `min_side`. Used by
+    tiled inference, which needs the whole frame at a usable resolution rather
+    than squashed to the model's input size. Raises ImageTooLarge, before any
+    pixel data is decoded, for images too elongated to fit `max_side` at
+    `min_side`, or whose resized size passes `max_pixels`.
+    """
+    start = time.perf_counter()
+    img = _open_checked(image, max_pixels)
+    width, height = img.size
+    scale = min(1.0, max_side / max(width, height))
+    scale = max(scale, min_side / min(width, height))
+    size = (max(min_side, round(width * scale)), max(min_side, round(height * scale)))
+    if max(size) > max(max_side, min_side):
+        raise ImageTooLarge(
+            f"Image aspect ratio too extreme ({width}x{height}): its long side would be {max(size)} pixels "
+            f"at a short side of {min_side}, limit is {max_side}"
+        )
+    if max_pixels and size[0] * size[1] > max_pixels:
+        raise ImageTooLarge(
+            f"Image dimensions too large once resized ({size[0]}x{size[1]}, limit is {max_pixels / 1e6:.0f} megapixels)"
+        )
+    img = _load(img, size)
+    decoded = time.perf_counter()
+
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if img.size != size:
+        img = img.resize(size, Image.BILINEAR)
+
+    decode_seconds.observe(decoded - start)
+    resize_seconds.observe(time.perf_counter() - decoded)
+    return img
+
+
+def stats():
+    """Per-stage decode/resize timing histograms"""
+    return {
+        "decode_seconds": decode_seconds.snapshot(),
+        "resize_seconds": resize_seconds.snapshot(),
+    }
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Hot model reload
+A ModelSlot holds the model version being served. Requests take it with use()
+and keep that version for their whole lifetime; reload() builds and warms a
+replacement off to the side, swaps it in atomically and closes the old one
+once its last in-flight request has finished. FileWatcher polls model files
+and triggers a reload once a changed file has stopped changing.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.metrics import Counter
+
+
+class ServingModel:
+    def __init__(self, version, close=None, **parts):
+        """One loaded model version plus the serving pieces built around it (engine, batcher, ...)"""
+        self.version = version
+        self.loaded_at = time.time()
+        self._close = close
+        self.__dict__.update(parts)
+
+    def close(self):
+        if self._close:
+            self._close()
+
+
+class ModelSlot:
+    def __init__(self, name):
+        self.name = name
+        self._current = None
+        self._in_use = {}  # id(model) -> requests still running on it
+        self._retired = {}  # id(model) -> replaced model waiting for its requests to finish
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # one reload at a time
+        self.last_reload = None
+
+        self.swaps = Counter(f"{name}_model_swaps_total", "Model versions swapped in")
+        self.failures = Counter(f"{name}_model_reload_failures_total", "Reloads that failed and kept the old model")
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def version(self):
+        current = self._current
+        return current.version if current else None
+
+    @contextmanager
+    def use(self):
+        """Yield the current model (or None) and keep it open until the block exits"""
+        with self._lock:
+            model = self._current
+            if model is not None:
+                self._in_use[id(model)] = self._in_use.get(id(model), 0) + 1
+        try:
+            yield model
+        finally:
+            if model is not None:
+                self._release(model)
+
+    def _release(self, model):
+        with self._lock:
+            key = id(model)
+            self._in_use[key] -= 1
+            if self._in_use[key]:
+                return
+            del self._in_use[key]
+            retired = self._retired.pop(key, None)
+        if retired is not None:
+            self._close(retired)
+
+    def _close(self, model):
+        try:
+            model.close()
+        except Exception as e:
+            print(f"Error closing retired {self.name} model {model.version}: {e}")
+
+    def swap(self, model):
+        """Make `model` current; the old one is closed now if idle, else after its last request"""
+        with self._lock:
+            old, self._current = self._current, model
+            drained = old is not None and not self._in_use.get(id(old))
+            if old is not None and not drained:
+                self._retired[id(old)] = old
+        self.swaps.inc()
+        if drained:
+            self._close(old)
+        return old
+
+    def reload(self, build, warm_up=None):
+        """Build a replacement with build(), warm it with warm_up(model), then swap it in
+
+        If either step raises, the current model keeps serving and the error propagates.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            model = None
+            try:
+                model = build()
+                built = time.perf_counter()
+                if warm_up:
+                    warm_up(model)
+            except Exception as e:
+                self.failures.inc()
+                self.last_reload = {"at": time.time(), "version": None, "error": str(e)}
+                if model is not None:
+                    self._close(model)
+                raise
+            old = self.swap(model)
+            self.last_reload = {
+                "at": time.time(),
+                "version": model.version,
+                "previous_version": old.version if old else None,
+                "build_ms": round((built - start) * 1000, 1),
+                "warm_up_ms": round((time.perf_counter() - built) * 1000, 1),
+                "error": None,
+            }
+            print(f"{self.name.capitalize()} model {model.version} swapped in "
+                  f"(was {old.version if old else None})")
+            return model
+
+    def stats(self):
+        with self._lock:
+            in_flight = self._in_use.get(id(self._current), 0) if self._current else 0
+            draining = len(self._retired)
+        return {
+            "version": self.version,
+            "in_flight": in_flight,
+            "draining_versions": draining,
+            "swaps": self.swaps.value,
+            "reload_failures": self.failures.value,
+            "last_reload": self.last_reload,
+        }
+
+
+class FileWatcher:
+    def __init__(self, paths, on_change, interval=5.0):
+        """Poll `paths` every `interval` seconds and call on_change() when any of them changes"""
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.interval = interval
+        self._seen = self._snapshot()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-file-watcher", daemon=True)
+        self._thread.start()
+
+    def _snapshot(self):
+        state = {}
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                state[path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                state[path] = None
+        return state
+
+    def _run(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            current = self._snapshot()
+            if current == self._seen:
+                pending = None
+                continue
+            # Wait until the files look the same for a full interval, so a copy in progress isn't loaded
+            if current != pending:
+                pending = current
+                continue
+            self._seen, pending = current, None
+            try:
+                self.on_change()
+            except Exception as e:
+                print(f"Error reloading after model file change: {e}")
+
+    def stop(self):
+        self._stop.set()
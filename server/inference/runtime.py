@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+TFLite runtime selection
+Prefers the standalone LiteRT / tflite-runtime interpreter packages, which load
+in a fraction of the time and memory of full TensorFlow, and only falls back to
+`tensorflow.lite` when neither is installed.
+"""
+
+import importlib
+import importlib.util
+
+# (backend name, module path, attribute path) in order of preference
+RUNTIME_BACKENDS = [
+    ("litert", "ai_edge_litert.interpreter", "Interpreter"),
+    ("tflite_runtime", "tflite_runtime.interpreter", "Interpreter"),
+    ("tensorflow", "tensorflow", "lite.Interpreter"),
+]
+
+
+def load_interpreter_class(preferred="auto"):
+    """Return (Interpreter class, backend name) for the lightest available runtime
+
+    `preferred` may name a single backend ("litert", "tflite_runtime", "tensorflow")
+    to force it, or be "auto" / empty to try them in order.
+    """
+    preferred = (preferred or "auto").strip().lower()
+    if preferred == "auto":
+        candidates = RUNTIME_BACKENDS
+    else:
+        candidates = [b for b in RUNTIME_BACKENDS if b[0] == preferred]
+        if not candidates:
+            names = ", ".join(b[0] for b in RUNTIME_BACKENDS)
+            raise ValueError(f"Unknown TFLite runtime '{preferred}' (expected auto, {names})")
+
+    errors = []
+    for name, module_path, attr in candidates:
+        try:
+            module = importlib.import_module(module_path)
+        except ImportError as e:
+            errors.append(f"{name}: {e}")
+            continue
+        interpreter_class = module
+        for part in attr.split("."):
+            interpreter_class = getattr(interpreter_class, part)
+        return interpreter_class, name
+
+    raise ImportError("No TFLite runtime available (" + "; ".join(errors) + ")")
+
+
+def available_backends():
+    """Names of the runtime backends importable in this environment"""
+    names = []
+    for name, module_path, _ in RUNTIME_BACKENDS:
+        if importlib.util.find_spec(module_path.split(".")[0]) is not None:
+            names.append(name)
+    return names
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tiled multi-leaf inference for wide field photos
+The photo is decoded at a bounded working resolution and cut into overlapping
+model-sized tiles instead of being squashed into one input, so lesions on
+individual leaves survive. Tiles the leaf gate finds no foliage in are skipped
+before the model runs; the rest go through one batched invoke. Per-tile
+results are aggregated into a disease map and an overall verdict.
+"""
+
+import numpy as np
+
+from inference.engine import CLASS_NAMES, build_detection_response
+from inference.leaf_gate import LeafGate
+from inference.preprocess import ImageTooLarge
+from utils.metrics import Counter, Histogram
+
+DEFAULT_OVERLAP = 0.25
+DEFAULT_MAX_SIDE = 1024  # at most 5 x 5 tiles of 256 with 25% overlap
+DEFAULT_MAX_TILES = 64
+DEFAULT_MIN_CONFIDENCE = 50.0
+
+
+def tile_starts(length, tile, stride):
+    """Offsets of tiles covering `length`, the last one flush with the far edge"""
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    return starts + [length - tile]
+
+
+def tile_boxes(width, height, tile_size=(256, 256), overlap=DEFAULT_OVERLAP, max_tiles=DEFAULT_MAX_TILES):
+    """(left, top, right, bottom) boxes of overlapping tiles covering a width x height image
+
+    Raises ImageTooLarge if that takes more than `max_tiles` tiles.
+    """
+    tile_w, tile_h = tile_size
+    xs = tile_starts(width, tile_w, max(1, int(tile_w * (1 - overlap))))
+    ys = tile_starts(height, tile_h, max(1, int(tile_h * (1 - overlap))))
+    if max_tiles and len(xs) * len(ys) > max_tiles:
+        raise ImageTooLarge(f"Image needs {len(xs) * len(ys)} tiles ({width}x{height}), limit is {max_tiles}")
+    return [(x, y, x + tile_w, y + tile_h) for y in ys for x in xs], len(ys), len(xs)
+
+
+class TiledPredictor:
+    def __init__(self, tile_size=(256, 256), overlap=DEFAULT_OVERLAP, max_side=DEFAULT_MAX_SIDE,
+                 gate=None, min_confidence=DEFAULT_MIN_CONFIDENCE, class_names=CLASS_NAMES,
+                 max_tiles=DEFAULT_MAX_TILES):
+        """Split photos into at most `max_tiles` `tile_size` tiles, skipping tiles `gate` rejects"""
+        self.tile_size = tuple(tile_size)
+        self.overlap = overlap
+        self.max_side = max_side
+        self.max_tiles = max_tiles
+        self.gate = gate or LeafGate()
+        self.min_confidence = min_confidence
+        self.class_names = class_names
+
+        self.tiles_total = Counter("disease_tiles_total", "Tiles cut from tiled uploads")
+        self.tiles_skipped = Counter("disease_tiles_skipped_total", "Tiles skipped by the leaf gate")
+        self.tiles_per_image = Histogram("disease_tiles_per_image", "Tiles run through the model per tiled upload",
+                                         buckets=(1, 2, 4, 8, 12, 16, 25, 36))
+
+    def split(self, image: np.ndarray):
+        """Return (tiles, grid) for an HxWx3 uint8 image
+
+        `tiles` holds (cell index, pixels) for tiles worth running; `grid` lists every
+        tile's box, with the gate's reason on skipped ones, plus the rows and columns.
+        """
+        height, width = image.shape[:2]
+        boxes, rows, cols = tile_boxes(width, height, self.tile_size, self.overlap, self.max_tiles)
+        tiles = []
+        cells = []
+        for box in boxes:
+            left, top, right, bottom = box
+            pixels = image[top:bottom, left:right]
+            rejection = self.gate.check(pixels)
+            if rejection:
+                cells.append({"box": list(box), "skipped": rejection["reason"]})
+            else:
+                cells.append({"box": list(box)})
+                tiles.append((len(cells) - 1, np.ascontiguousarray(pixels)))
+        self.tiles_total.inc(len(boxes))
+        self.tiles_skipped.inc(len(boxes) - len(tiles))
+        return tiles, {"image_size": [width, height], "rows": rows, "cols": cols, "cells": cells}
+
+    def aggregate(self, tiles, grid, scores) -> dict:
+        """Detection response for the whole photo plus a per-tile disease map
+
+        The verdict is the disease found with at least `min_confidence` in the most
+        leaf tiles (ties go to the more confident), so one diseased leaf in a wide
+        shot is not averaged away by the healthy ones. With no such tile the
+        verdict comes from the mean scores of all leaf tiles.
+        """
+        scores = np.asarray(scores).reshape(len(tiles), -1)
+        self.tiles_per_image.observe(len(tiles))
+        findings = {}
+        for (cell_index, _), row in zip(tiles, scores):
+            top = int(np.argmax(row))
+            label = self.class_names[top]
+            confidence = float(row[top] * 100)
+            grid["cells"][cell_index].update(predicted=label, confidence=confidence)
+            if "healthy" not in label.lower() and confidence >= self.min_confidence:
+                count, best, best_row = findings.get(label, (0, -1.0, None))
+                findings[label] = (count + 1, max(best, confidence), row if confidence > best else best_row)
+
+        if findings:
+            label, (count, _, best_row) = max(findings.items(), key=lambda item: (item[1][0], item[1][1]))
+            response = build_detection_response(best_row, self.class_names)
+        else:
+            count = 0
+            response = build_detection_response(scores.mean(axis=0), self.class_names)
+
+        response["tiling"] = {
+            "tile_size": list(self.tile_size),
+            "tiles": len(grid["cells"]),
+            "leaf_tiles": len(tiles),
+            "skipped_tiles": len(grid["cells"]) - len(tiles),
+            "affected_tiles": count,
+            "affected_share": round(count / len(tiles), 4) if tiles else 0.0,
+            "diseases": {label: found[0] for label, found in sorted(findings.items())},
+            "map": grid
+        }
+        return response
+
+    def stats(self):
+        return {
+            "tile_size": list(self.tile_size),
+            "overlap": self.overlap,
+            "max_side": self.max_side,
+            "max_tiles": self.max_tiles,
+            "tiles": self.tiles_total.value,
+            "skipped_tiles": self.tiles_skipped.value,
+            "tiles_per_image": self.tiles_per_image.snapshot(),
+        }
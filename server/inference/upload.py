@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Size-bounded upload ingestion
+Uploads are copied in chunks into a buffer that spills to a temp file past
+`spool_bytes`, hashed on the way in for the prediction cache, and rejected as
+soon as they pass the byte limit, so a flood of large files never has to fit
+in memory. The pixel limit is enforced from the image header by
+decode_leaf_image() before any pixel data is decoded.
+"""
+
+import hashlib
+import tempfile
+
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_MAX_PIXELS = 50_000_000  # above a 48 MP phone photo
+DEFAULT_SPOOL_BYTES = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Multipart boundaries and the other form fields on top of the image itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload passes the configured byte limit"""
+
+
+def format_bytes(n):
+    return f"{n / (1024 * 1024):.0f} MB" if n >= 1024 * 1024 else f"{n / 1024:.0f} KB"
+
+
+class Upload:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spool_bytes=DEFAULT_SPOOL_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+        self._hash = hashlib.blake2b(digest_size=16)  # same digest as cache.image_digest()
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise UploadTooLarge(f"Image file too large (limit is {format_bytes(self.max_bytes)})")
+        self._hash.update(chunk)
+        self.file.write(chunk)
+
+    @property
+    def digest(self):
+        return self._hash.hexdigest()
+
+    @property
+    def spilled(self):
+        """True once the upload no longer fits in the in-memory buffer"""
+        return bool(getattr(self.file, "_rolled", False))
+
+    def open(self):
+        """The upload as a file object positioned at the start"""
+        self.file.seek(0)
+        return self.file
+
+    def read(self):
+        return self.open().read()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_upload(stream, max_bytes=DEFAULT_MAX_BYTES, spool_bytes=DEFAULT_SPOOL_BYTES):
+    """Copy a readable stream into a bounded Upload, raising UploadTooLarge past `max_bytes`"""
+    upload = Upload(max_bytes, spool_bytes)
+    try:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            upload.write(chunk)
+    except Exception:
+        upload.close()
+        raise
+    return upload
+
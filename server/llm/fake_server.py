@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Stand-in for a local Ollama server
+Speaks the parts of Ollama's REST API the clients use (/api/generate, whole
+or streamed, and /api/tags) with a canned reply and a configurable delay, so
+tests and benchmarks run without Ollama or a model. It counts the TCP
+connections it accepts, which shows whether clients reuse them.
+
+Usage: python -m llm.fake_server --port 11434 --delay 0.5
+       python llm/fake_server.py run <model> <prompt>   (stands in for the ollama CLI)
+"""
+
+import argparse
+import json
+import socket
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = json.dumps({
+    "disease_type": "Fungal",
+    "symptoms": "Dark concentric spots on older leaves",
+    "prevention": "Rotate crops and avoid overhead watering",
+    "treatments": "Remove infected leaves and apply a copper fungicide",
+    "fertilizers": "Balanced NPK with extra potassium",
+    "expected_yield": "Minor loss if treated early"
+})
+
+
+class FakeOllama:
+    def __init__(self, reply=DEFAULT_REPLY, delay=0.0, chunk_size=16, host="127.0.0.1", port=0):
+        """Serve `reply` (a string, or a function of the prompt) after `delay` seconds"""
+        self.reply = reply
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.status = 200  # set to e.g. 500 to make every generate call fail
+        self.fault = None  # set to "bad_json", "truncated", "reset" or "bad_headers" to break every generate reply
+        self.prompts = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like Ollama
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; don't let Nagle hold the body back
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": "fake:latest"}]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path != "/api/generate":
+                    self._send_json(404, {"error": "not found"})
+                    return
+                prompt = body.get("prompt", "")
+                with fake._lock:
+                    fake.prompts.append(prompt)
+                if fake.status != 200:
+                    self._send_json(fake.status, {"error": "fake failure"})
+                    return
+                if fake.fault:
+                    self._send_fault(fake.fault)
+                    return
+                reply = fake.reply(prompt) if callable(fake.reply) else fake.reply
+                if not body.get("stream", True):
+                    time.sleep(fake.delay)
+                    self._send_json(200, {"model": body.get("model"), "response": reply, "done": True})
+                    return
+
+                # Streamed: one JSON object per line in HTTP chunks, the delay spread across them
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pieces = [reply[i:i + fake.chunk_size] for i in range(0, len(reply), fake.chunk_size)] or [""]
+                for piece in pieces:
+                    time.sleep(fake.delay / len(pieces))
+                    self._write_chunk({"model": body.get("model"), "response": piece, "done": False})
+                self._write_chunk({"model": body.get("model"), "response": "", "done": True})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _send_fault(self, fault):
+                """A 200 whose body is not JSON, or is cut short by a close or a connection reset,
+                or a reply whose header line is too long for http.client to parse"""
+                if fault == "bad_headers":
+                    self.send_response(200)
+                    self.send_header("X-Padding", "x" * 70000)
+                    self.end_headers()
+                    self.close_connection = True
+                    return
+                if fault == "bad_json":
+                    data = b"{not json"
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                data = b'{"response": "cut sh'
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data) * 2))
+                self.end_headers()
+                self.wfile.write(data)
+                self.wfile.flush()
+                self.close_connection = True
+                if fault == "reset":
+                    # Linger 0 makes the close send RST instead of FIN
+                    self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                    self.connection.close()
+
+            def _write_chunk(self, obj):
+                data = (json.dumps(obj) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.server.handle_error = lambda request, address: None  # clients that time out hang up mid-reply
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "run":
+        print(DEFAULT_REPLY)
+        return
+    parser = argparse.ArgumentParser(description="Serve a canned Ollama reply for local development")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds before each reply, like model generation time")
+    args = parser.parse_args()
+    fake = FakeOllama(delay=args.delay, port=args.port)
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Concurrency limit and circuit breaker for LLM calls
+LLMGuard wraps an Ollama client so that at most `max_concurrent` calls run at
+once and at most `max_queue` wait for a turn; anything beyond that fails fast
+instead of piling more work onto an overloaded model. After
+`failure_threshold` consecutive failures (timeouts, errors, CLI non-zero
+exits) the circuit opens and calls are refused for `cooldown` seconds, then a
+single trial call decides whether it closes again. Callers treat the refusals
+like any unavailable LLM and skip enrichment, so detection keeps answering.
+"""
+
+import threading
+import time
+
+from llm.ollama import LLMError, LLMUnavailable
+from utils.metrics import Counter, Histogram
+
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_MAX_QUEUE = 8
+DEFAULT_QUEUE_TIMEOUT = 5.0
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN = 30.0
+
+
+class LLMRejected(LLMUnavailable):
+    """Raised without calling the LLM because it is overloaded or failing"""
+
+
+class LLMOverloaded(LLMRejected):
+    """Raised when the LLM queue is full, or a call waited too long for its turn"""
+
+
+class LLMCircuitOpen(LLMRejected):
+    """Raised while the circuit breaker is open after repeated LLM failures"""
+
+
+class LLMGuard:
+    def __init__(self, client, max_concurrent=DEFAULT_MAX_CONCURRENT, max_queue=DEFAULT_MAX_QUEUE,
+                 queue_timeout=DEFAULT_QUEUE_TIMEOUT, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 cooldown=DEFAULT_COOLDOWN):
+        """Run `client` calls at most `max_concurrent` at a time, with `max_queue` more waiting up to `queue_timeout`s"""
+        if max_concurrent < 1:
+            raise ValueError("LLM concurrency must be at least 1")
+        self.client = client
+        self.model = getattr(client, "model", None)
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._failures = 0  # consecutive
+        self._opened_at = None  # monotonic time the circuit opened, None while closed
+        self._trial = False  # a half-open trial call is running
+
+        self.rejected = Counter("llm_guard_rejected_total", "LLM calls refused because the queue was full or too slow")
+        self.short_circuited = Counter("llm_circuit_short_circuited_total", "LLM calls refused while the circuit was open")
+        self.opened = Counter("llm_circuit_opened_total", "Times repeated failures opened the LLM circuit")
+        self.queue_wait = Histogram("llm_queue_wait_seconds", "Time an LLM call waited for a free slot")
+
+    def state(self):
+        """closed, open, or half_open once the cooldown has passed"""
+        if self._opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self._opened_at < self.cooldown else "half_open"
+
+    def _acquire(self):
+        """Take a call slot; returns True if this call is the half-open trial"""
+        with self._cond:
+            trial = False
+            if self._opened_at is not None:
+                if time.monotonic() - self._opened_at < self.cooldown or self._trial:
+                    self.short_circuited.inc()
+                    raise LLMCircuitOpen(f"LLM circuit open after {self._failures} consecutive failures")
+                self._trial = trial = True
+
+            start = time.perf_counter()
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    if trial:
+                        self._trial = False
+                    self.rejected.inc()
+                    raise LLMOverloaded(f"LLM busy: {self._active} calls running and {self._waiting} waiting")
+                self._waiting += 1
+                try:
+                    ready = self._cond.wait_for(lambda: self._active < self.max_concurrent, self.queue_timeout)
+                finally:
+                    self._waiting -= 1
+                if not ready:
+                    if trial:
+                        self._trial = False
+                    self.rejected.inc()
+                    raise LLMOverloaded(f"LLM busy: no free slot within {self.queue_timeout}s")
+            self.queue_wait.observe(time.perf_counter() - start)
+            self._active += 1
+            return trial
+
+    def _release(self, trial, ok):
+        """Free the slot and record the outcome; `ok` is None if the call was abandoned or broke locally"""
+        with self._cond:
+            self._active -= 1
+            if trial:
+                self._trial = False
+            if ok:
+                if self._opened_at is not None:
+                    print("LLM circuit closed")
+                self._failures = 0
+                self._opened_at = None
+            elif ok is not None:
+                self._failures += 1
+                if (trial or self._opened_at is None) and self._failures >= self.failure_threshold:
+                    self._opened_at = time.monotonic()
+                    self.opened.inc()
+                    print(f"LLM circuit opened after {self._failures} consecutive failures; "
+                          f"skipping LLM calls for {self.cooldown:.0f}s")
+            self._cond.notify()
+
+    def generate(self, prompt, format=None, options=None) -> str:
+        """The client's reply to `prompt`, or LLMRejected without calling it"""
+        trial = self._acquire()
+        ok = None
+        try:
+            reply = self.client.generate(prompt, format=format, options=options)
+            ok = True
+            return reply
+        except LLMError:
+            ok = False
+            raise
+        finally:
+            self._release(trial, ok)
+
+    def stream(self, prompt, format=None, options=None):
+        """The client's streamed reply to `prompt`; the slot is held until the stream ends"""
+        trial = self._acquire()
+        ok = None
+        try:
+            yield from self.client.stream(prompt, format=format, options=options)
+            ok = True
+        except LLMError:
+            ok = False
+            raise
+        finally:
+            self._release(trial, ok)
+
+    def available(self) -> bool:
+        return self.client.available() if hasattr(self.client, "available") else True
+
+    def close(self):
+        self.client.close()
+
+    def stats(self):
+        return {
+            **self.client.stats(),
+            "guard": {
+                "state": self.state(),
+                "active": self._active,
+                "waiting": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "consecutive_failures": self._failures,
+                "rejected": self.rejected.value,
+                "short_circuited": self.short_circuited.value,
+                "circuit_opened": self.opened.value,
+                "queue_wait_seconds": self.queue_wait.snapshot(),
+            },
+        }
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Background enrichment jobs
+Detection returns the classification straight away and hands the slow LLM
+call to a job that runs on a small, bounded pool of worker threads. Clients
+poll the job (optionally long-polling until it finishes) or subscribe a
+callback, so detection latency no longer depends on how long the LLM takes.
+Finished jobs are kept for `ttl_seconds` and then forgotten.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import Counter, Histogram
+
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when too many jobs are already waiting for a worker"""
+
+
+class EnrichmentJob:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = "pending"  # pending -> running -> done | failed
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.finished = threading.Event()
+        self.callbacks = []
+
+    def snapshot(self):
+        """JSON-ready view of the job"""
+        job = {"job_id": self.id, "status": self.status}
+        if self.status == "done":
+            job["result"] = self.result
+        elif self.status == "failed":
+            job["error"] = self.error
+        return job
+
+
+class EnrichmentJobs:
+    def __init__(self, run, workers=2, max_pending=64, ttl_seconds=600.0):
+        """Run `run(*args)` for each submitted job on `workers` threads, with at most `max_pending` waiting"""
+        if workers < 1:
+            raise ValueError("Enrichment needs at least one worker")
+        self.run = run
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrichment")
+        self._jobs = OrderedDict()  # job id -> EnrichmentJob, oldest first
+        self._pending = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+        self.submitted = Counter("enrichment_jobs_submitted_total", "Enrichment jobs accepted")
+        self.completed = Counter("enrichment_jobs_completed_total", "Enrichment jobs that finished with a result")
+        self.failed = Counter("enrichment_jobs_failed_total", "Enrichment jobs whose LLM call failed")
+        self.rejected = Counter("enrichment_jobs_rejected_total", "Jobs refused because the queue was full")
+        self.queue_wait = Histogram("enrichment_queue_seconds", "Time a job waits for a worker", buckets=JOB_BUCKETS)
+        self.run_time = Histogram("enrichment_run_seconds", "Time a worker spends on a job", buckets=JOB_BUCKETS)
+
+    def _expire(self, now):
+        """Forget finished jobs older than the TTL; called with the lock held"""
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            if job.finished_at is not None and now - job.finished_at > self.ttl_seconds:
+                del self._jobs[job_id]
+
+    def submit(self, *args) -> str:
+        """Queue run(*args) and return the job ID; raises JobQueueFull when `max_pending` jobs are waiting"""
+        with self._lock:
+            self._expire(time.time())
+            if self._pending >= self.max_pending:
+                self.rejected.inc()
+                raise JobQueueFull(f"{self._pending} enrichment jobs already waiting")
+            job = EnrichmentJob(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+            self._pending += 1
+        self.submitted.inc()
+        self._executor.submit(self._run_job, job, args)
+        return job.id
+
+    def _run_job(self, job, args):
+        start = time.perf_counter()
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+            job.status = "running"
+        self.queue_wait.observe(time.time() - job.created_at)
+        try:
+            result = self.run(*args)
+            status, error = "done", None
+            self.completed.inc()
+        except Exception as e:
+            result, status, error = None, "failed", str(e) or type(e).__name__
+            self.failed.inc()
+        self.run_time.observe(time.perf_counter() - start)
+
+        with self._lock:
+            self._running -= 1
+            job.result, job.error, job.status = result, error, status
+            job.finished_at = time.time()
+            callbacks, job.callbacks = job.callbacks, []
+        job.finished.set()
+        snapshot = job.snapshot()
+        for callback in callbacks:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"Enrichment job callback failed: {e}")
+
+    def get(self, job_id):
+        """Snapshot of a job, or None if the ID is unknown or has expired"""
+        job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    def wait(self, job_id, timeout):
+        """Snapshot of a job once it finishes, or as it stands after `timeout` seconds"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job.finished.wait(timeout)
+        return job.snapshot()
+
+    def subscribe(self, job_id, callback) -> bool:
+        """Call callback(snapshot) from a worker thread when the job finishes (now, if it already has)
+
+        Returns False if the job ID is unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            if job.finished_at is None:
+                job.callbacks.append(callback)
+                return True
+        callback(job.snapshot())
+        return True
+
+    def close(self):
+        """Stop taking jobs; queued ones are dropped, running ones finish in the background"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "running": self._running,
+            "jobs": len(self._jobs),
+            "submitted": self.submitted.value,
+            "completed": self.completed.value,
+            "failed": self.failed.value,
+            "rejected": self.rejected.value,
+            "queue_seconds": self.queue_wait.snapshot(),
+            "run_seconds": self.run_time.snapshot(),
+        }
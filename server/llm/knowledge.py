@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Persistent disease-knowledge store
+Ollama's disease details depend only on the predicted class and the language,
+so there are just len(CLASS_NAMES) x len(LANG_NAMES) distinct answers per
+model and prompt version. They are generated ahead of time by
+prewarm_knowledge.py, kept in a SQLite file, and loaded into memory when the
+server starts, so serving an enriched detection is a dict lookup instead of
+a multi-second LLM call.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from llm.ollama import LLMError
+from llm.prompts import LANG_NAMES, disease_info_prompt, parse_json_reply
+from utils.metrics import Counter
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS disease_info (
+    class_name TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    version TEXT NOT NULL,
+    info TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (class_name, lang, version)
+)
+"""
+
+
+class KnowledgeStore:
+    def __init__(self, path, version):
+        """Open (or create) the store at `path`, serving entries generated under `version`"""
+        self.path = path
+        self.version = version
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(SCHEMA)
+        rows = self._db.execute(
+            "SELECT class_name, lang, info FROM disease_info WHERE version = ?", (version,)
+        ).fetchall()
+        self._entries = {(class_name, lang): json.loads(info) for class_name, lang, info in rows}
+
+        self.hits = Counter("knowledge_hits_total", "Disease details served from the knowledge store")
+        self.misses = Counter("knowledge_misses_total", "Disease details not in the knowledge store")
+
+    def get(self, class_name, lang):
+        """Stored details for a class and language under the current version, or None"""
+        info = self._entries.get((class_name, lang))
+        if info is None:
+            self.misses.inc()
+        else:
+            self.hits.inc()
+        return info
+
+    def put(self, class_name, lang, info):
+        """Store details for a class and language under the current version, replacing any earlier ones"""
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO disease_info VALUES (?, ?, ?, ?, ?)",
+                    (class_name, lang, self.version, json.dumps(info, ensure_ascii=False), time.time())
+                )
+            self._entries[(class_name, lang)] = info
+
+    def missing(self, class_names, langs):
+        """(class, lang) pairs with no entry under the current version"""
+        return [(c, l) for c in class_names for l in langs if (c, l) not in self._entries]
+
+    def versions(self):
+        """Entry count per stored version, including ones no longer served"""
+        with self._lock:
+            return dict(self._db.execute("SELECT version, COUNT(*) FROM disease_info GROUP BY version").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "version": self.version,
+            "entries": len(self._entries),
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+        }
+
+
+def prewarm(store, client, class_names, langs=tuple(LANG_NAMES), force=False, retries=1):
+    """Generate and store details for every missing (class, lang); returns (generated, failed) pairs"""
+    todo = [(c, l) for c in class_names for l in langs] if force else store.missing(class_names, langs)
+    generated = []
+    failed = []
+    for i, (class_name, lang) in enumerate(todo, 1):
+        start = time.perf_counter()
+        info = None
+        for _ in range(retries + 1):
+            try:
+                info = parse_json_reply(client.generate(disease_info_prompt(class_name, lang)))
+                break
+            except (LLMError, ValueError) as e:
+                error = e
+        if info is None:
+            failed.append((class_name, lang))
+            print(f"[{i}/{len(todo)}] {class_name} ({lang}) failed: {error}")
+            continue
+        store.put(class_name, lang, info)
+        generated.append((class_name, lang))
+        print(f"[{i}/{len(todo)}] {class_name} ({lang}) {time.perf_counter() - start:.1f}s")
+    return generated, failed
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Ollama clients
+OllamaClient talks to Ollama's local REST API (/api/generate) over a small
+pool of keep-alive HTTP connections, so a call costs one request on an open
+socket instead of spawning `ollama run`, starting the CLI and attaching to the
+model every time. Replies can be read whole or streamed chunk by chunk.
+OllamaCLI keeps the old subprocess path with the same interface; it is used as
+the fallback when the REST API can't be reached.
+"""
+
+import http.client
+import json
+import queue
+import socket
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit
+
+from utils.metrics import Counter, Histogram
+
+DEFAULT_URL = "http://localhost:11434"
+DEFAULT_MODEL = "qwen3:4b"
+DEFAULT_CONNECT_TIMEOUT = 2.0
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_POOL_SIZE = 4
+
+LLM_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+class LLMError(RuntimeError):
+    """Raised when the LLM call fails"""
+
+
+class LLMTimeout(LLMError, TimeoutError):
+    """Raised when the LLM doesn't answer within the timeout"""
+
+
+class LLMUnavailable(LLMError):
+    """Raised when the LLM server can't be reached at all"""
+
+
+class OllamaClient:
+    def __init__(self, url=DEFAULT_URL, model=DEFAULT_MODEL, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE, fallback=None):
+        """Client for the Ollama server at `url`, keeping up to `pool_size` idle connections open
+
+        `connect_timeout` bounds opening a connection; `timeout` bounds each wait for
+        data, i.e. the time to the whole reply, or between chunks when streaming.
+        `fallback` (e.g. an OllamaCLI) answers instead when the server can't be reached.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "") or not parts.hostname:
+            raise ValueError(f"Unsupported Ollama URL '{url}' (expected http://host:port)")
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 11434
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.fallback = fallback
+        self._idle = queue.LifoQueue()  # LIFO reuses the most recently used socket
+        self._closed = False
+
+        self.requests = Counter("llm_requests_total", "Generate calls sent to the Ollama REST API")
+        self.failures = Counter("llm_failures_total", "Generate calls that failed or timed out")
+        self.fallbacks = Counter("llm_fallback_total", "Calls answered by the fallback because the server was down")
+        self.connections = Counter("llm_connections_opened_total", "HTTP connections opened to Ollama")
+        self.reused = Counter("llm_connections_reused_total", "Calls sent on an already open connection")
+        self.latency = Histogram("llm_request_seconds", "Time to the complete reply", buckets=LLM_BUCKETS)
+        self.first_chunk = Histogram("llm_first_chunk_seconds", "Time to the first streamed chunk", buckets=LLM_BUCKETS)
+
+    def _connect(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        try:
+            conn.connect()
+        except socket.timeout as e:
+            raise LLMUnavailable(f"Timed out connecting to Ollama at {self.url}") from e
+        except OSError as e:
+            raise LLMUnavailable(f"Can't reach Ollama at {self.url}: {e}") from e
+        conn.sock.settimeout(self.timeout)
+        # Small request/response pairs on a reused socket: avoid Nagle + delayed-ACK stalls
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections.inc()
+        return conn
+
+    def _release(self, conn):
+        """Return a connection whose response has been fully read to the idle pool"""
+        if self._closed or self._idle.qsize() >= self.pool_size:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    def _post(self, path, body):
+        """Send a POST and return (connection, response), retrying once if a pooled socket went stale"""
+        payload = json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        for attempt in range(2):
+            try:
+                conn = self._idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self._connect()
+                reused = False
+            try:
+                conn.request("POST", path, payload, headers)
+                response = conn.getresponse()
+            except socket.timeout as e:
+                conn.close()
+                raise LLMTimeout(f"Ollama did not answer within {self.timeout}s") from e
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.BadStatusLine) as e:
+                conn.close()
+                # The server closed an idle keep-alive socket; that says nothing about the server
+                if reused and attempt == 0:
+                    continue
+                raise LLMError(f"Ollama connection failed: {e}") from e
+            except (OSError, http.client.HTTPException) as e:
+                # Oversized or malformed headers, or any other socket error: the connection is unusable
+                conn.close()
+                raise LLMError(f"Ollama reply could not be read: {e}") from e
+            if reused:
+                self.reused.inc()
+            return conn, response
+
+    def _request_body(self, prompt, stream, format=None, options=None):
+        body = {"model": self.model, "prompt": prompt, "stream": stream}
+        if format:
+            body["format"] = format
+        if options:
+            body["options"] = options
+        return body
+
+    def _check(self, conn, response):
+        if response.status != 200:
+            try:
+                detail = response.read().decode("utf-8", "replace")
+            except (OSError, http.client.HTTPException) as e:
+                detail = f"(reply unreadable: {e})"
+            conn.close()
+            try:
+                detail = json.loads(detail).get("error", detail)
+            except ValueError:
+                pass
+            raise LLMError(f"Ollama returned {response.status}: {detail}")
+
+    def generate(self, prompt, format=None, options=None) -> str:
+        """Return the model's complete reply to `prompt`"""
+        start = time.perf_counter()
+        try:
+            conn, response = self._post("/api/generate", self._request_body(prompt, False, format, options))
+            self.requests.inc()
+            self._check(conn, response)
+            try:
+                reply = json.loads(response.read())
+            except socket.timeout as e:
+                conn.close()
+                raise LLMTimeout(f"Ollama did not finish within {self.timeout}s") from e
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                # Reset, cut short or not JSON: the socket is in an unknown state, so it isn't pooled
+                conn.close()
+                raise LLMError(f"Ollama reply could not be read: {e}") from e
+            if not isinstance(reply, dict):
+                conn.close()
+                raise LLMError("Ollama reply is not a JSON object")
+            self._release(conn)
+        except LLMUnavailable:
+            if self.fallback is None:
+                self.failures.inc()
+                raise
+            self.fallbacks.inc()
+            return self.fallback.generate(prompt, format=format, options=options)
+        except LLMError:
+            self.failures.inc()
+            raise
+        self.latency.observe(time.perf_counter() - start)
+        return reply.get("response", "")
+
+    def stream(self, prompt, format=None, options=None):
+        """Yield the reply to `prompt` in chunks as the model produces them"""
+        start = time.perf_counter()
+        try:
+            conn, response = self._post("/api/generate", self._request_body(prompt, True, format, options))
+        except LLMUnavailable:
+            if self.fallback is None:
+                self.failures.inc()
+                raise
+            self.fallbacks.inc()
+            yield from self.fallback.stream(prompt, format=format, options=options)
+            return
+        except LLMError:
+            self.failures.inc()
+            raise
+        self.requests.inc()
+        finished = False
+        try:
+            self._check(conn, response)
+            first = True
+            # Ollama streams one JSON object per line until one says "done"
+            while True:
+                try:
+                    line = response.readline()
+                except socket.timeout as e:
+                    raise LLMTimeout(f"Ollama stalled for more than {self.timeout}s") from e
+                except (OSError, http.client.HTTPException) as e:
+                    raise LLMError(f"Ollama stream broke: {e}") from e
+                if not line:
+                    raise LLMError("Ollama closed the stream before it was done")
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except ValueError as e:
+                    raise LLMError(f"Ollama stream line is not JSON: {line[:80]!r}") from e
+                if not isinstance(chunk, dict):
+                    raise LLMError("Ollama stream line is not a JSON object")
+                if chunk.get("error"):
+                    raise LLMError(f"Ollama error: {chunk['error']}")
+                if chunk.get("response"):
+                    if first:
+                        self.first_chunk.observe(time.perf_counter() - start)
+                        first = False
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
+            finished = True
+        except LLMError:
+            self.failures.inc()
+            raise
+        finally:
+            if finished and self._drained(response):
+                self._release(conn)
+            else:
+                # Abandoned or broken mid-stream: the socket still has unread data
+                conn.close()
+        self.latency.observe(time.perf_counter() - start)
+
+    def _drained(self, response):
+        """True if nothing is left to read after the final chunk, so the socket can be pooled"""
+        try:
+            return response.read() == b""
+        except (OSError, http.client.HTTPException):
+            return False
+
+    def available(self) -> bool:
+        """True if the server answers /api/tags"""
+        try:
+            conn = self._connect()
+        except LLMUnavailable:
+            return False
+        try:
+            conn.request("GET", "/api/tags")
+            response = conn.getresponse()
+            response.read()
+            return response.status == 200
+        except OSError:
+            return False
+        finally:
+            conn.close()
+
+    def close(self):
+        """Close idle connections; connections in use are closed when they are handed back"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        return {
+            "transport": "http",
+            "url": self.url,
+            "model": self.model,
+            "idle_connections": self._idle.qsize(),
+            "requests": self.requests.value,
+            "failures": self.failures.value,
+            "fallbacks": self.fallbacks.value,
+            "connections_opened": self.connections.value,
+            "connections_reused": self.reused.value,
+            "request_seconds": self.latency.snapshot(),
+            "first_chunk_seconds": self.first_chunk.snapshot(),
+        }
+
+
+class OllamaCLI:
+    def __init__(self, bin, model=DEFAULT_MODEL, timeout=DEFAULT_TIMEOUT):
+        """Run `bin run <model> <prompt>` per call, like the original integration
+
+        `bin` is the ollama executable, or a list of arguments that stands in for it.
+        """
+        self.bin = bin
+        self.model = model
+        self.timeout = timeout
+        self.requests = Counter("llm_cli_requests_total", "Prompts run through the ollama CLI")
+        self.failures = Counter("llm_cli_failures_total", "CLI runs that failed or timed out")
+        self.latency = Histogram("llm_cli_request_seconds", "Time per CLI run", buckets=LLM_BUCKETS)
+
+    def _command(self, prompt):
+        command = list(self.bin) if isinstance(self.bin, (list, tuple)) else [self.bin]
+        return command + ["run", self.model, prompt]
+
+    def generate(self, prompt, format=None, options=None) -> str:
+        """Return the CLI's output for `prompt`; `format` and `options` are not supported by the CLI"""
+        start = time.perf_counter()
+        self.requests.inc()
+        try:
+            proc = subprocess.run(
+                self._command(prompt),
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                errors='ignore',
+                timeout=self.timeout
+            )
+        except subprocess.TimeoutExpired as e:
+            self.failures.inc()
+            raise LLMTimeout(f"ollama run did not finish within {self.timeout}s") from e
+        except OSError as e:
+            self.failures.inc()
+            raise LLMUnavailable(f"Can't run {self.bin}: {e}") from e
+        if proc.returncode != 0:
+            self.failures.inc()
+            raise LLMError(f"ollama run failed: {proc.stderr.strip()}")
+        self.latency.observe(time.perf_counter() - start)
+        return proc.stdout.strip()
+
+    def stream(self, prompt, format=None, options=None):
+        """Yield the CLI's output line by line as it is printed"""
+        start = time.perf_counter()
+        self.requests.inc()
+        try:
+            proc = subprocess.Popen(
+                self._command(prompt),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                errors='ignore'
+            )
+        except OSError as e:
+            self.failures.inc()
+            raise LLMUnavailable(f"Can't run {self.bin}: {e}") from e
+        timer = threading.Timer(self.timeout, proc.kill)
+        timer.start()
+        try:
+            for line in proc.stdout:
+                yield line
+            proc.wait()
+        finally:
+            timer.cancel()
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+            proc.stderr.close()
+        if proc.returncode != 0:
+            self.failures.inc()
+            if proc.returncode < 0:
+                raise LLMTimeout(f"ollama run did not finish within {self.timeout}s")
+            raise LLMError(f"ollama run exited with {proc.returncode}")
+        self.latency.observe(time.perf_counter() - start)
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {
+            "transport": "cli",
+            "bin": self.bin,
+            "model": self.model,
+            "requests": self.requests.value,
+            "failures": self.failures.value,
+            "request_seconds": self.latency.snapshot(),
+        }
+
+
+def load_client(url=DEFAULT_URL, model=DEFAULT_MODEL, bin=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
+    """REST client for `url`, falling back to the `bin` CLI (if given) when the server is down
+
+    With no `url` only the CLI is used.
+    """
+    cli = OllamaCLI(bin, model, timeout=timeout) if bin else None
+    if not url:
+        if cli is None:
+            raise ValueError("Need an Ollama URL or binary")
+        return cli
+    return OllamaClient(url, model, connect_timeout=connect_timeout, timeout=timeout, pool_size=pool_size,
+                        fallback=cli)
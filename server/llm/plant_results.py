@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+In-memory index over plantResults.json
+Scripts/convert_csv_to_json.py exports curated per-plant disease information
+(disease type, symptoms, prevention, ...) as a list of records. The index is
+built once at start-up, keyed by normalized plant, disease and language, so a
+detection whose class has a record is answered with a dict lookup and only
+the rest go to the LLM.
+
+Records are matched loosely, since the CSV's columns are up to whoever made
+it: the plant comes from `plant`/`plant_en`/`crop`, the disease from
+`disease`/`disease_en`/`class_name`/..., and each detail field is read as
+`<field>_<lang>` (e.g. `symptoms_hi`), or `<field>` for the record's
+`lang` column, English if there is none.
+"""
+
+import json
+import re
+
+from llm.prompts import DISEASE_INFO_KEYS, LANG_NAMES
+from utils.metrics import Counter
+
+PLANT_COLUMNS = ("plant", "plant_en", "plant_name", "crop")
+DISEASE_COLUMNS = ("disease", "disease_en", "disease_name", "condition", "class_name", "class", "label", "predicted")
+LANG_COLUMNS = ("lang", "language")
+
+
+def compact(name):
+    """Lower-case letters and digits only, so 'Pepper, bell' and 'Pepper__bell' both become 'pepperbell'"""
+    return re.sub(r"[^0-9a-z]", "", str(name).lower())
+
+
+def strip_plant(disease, plant):
+    """The disease without the plant name repeated in front of it ('tomatomosaicvirus' for tomato)"""
+    while plant and disease.startswith(plant) and len(disease) > len(plant):
+        disease = disease[len(plant):]
+    return disease
+
+
+def first_value(record, columns):
+    for column in columns:
+        value = record.get(column)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+class PlantResultsIndex:
+    def __init__(self, path):
+        """Load the plantResults.json records at `path` into memory"""
+        self.path = path
+        with open(path, encoding="utf-8") as f:
+            records = json.load(f)
+        if isinstance(records, dict):
+            records = records.get("records", [])
+        self.records = len(records)
+        self._index = {}  # (plant, disease, lang) -> details
+        self._resolved = {}  # model class name -> (plant, disease) key, or None
+        for record in records:
+            if isinstance(record, dict):
+                self._add(record)
+        # Longest first, so 'pepperbell' is tried before 'pepper'
+        self._plants = sorted({plant for plant, _, _ in self._index}, key=len, reverse=True)
+
+        self.hits = Counter("plant_results_hits_total", "Disease details answered from plantResults.json")
+        self.misses = Counter("plant_results_misses_total", "Lookups with no plantResults.json record")
+
+    def _add(self, record):
+        disease = first_value(record, DISEASE_COLUMNS)
+        if disease is None:
+            return
+        plant = compact(first_value(record, PLANT_COLUMNS) or "")
+        disease = strip_plant(compact(disease), plant)
+        record_lang = first_value(record, LANG_COLUMNS) or "en"
+        for lang in LANG_NAMES:
+            info = {}
+            for key in DISEASE_INFO_KEYS:
+                value = record.get(f"{key}_{lang}")
+                if value in (None, "") and lang == record_lang:
+                    value = record.get(key)
+                if value not in (None, ""):
+                    info[key] = value
+            if info:
+                # Later records only fill in fields the earlier ones left out
+                entry = self._index.setdefault((plant, disease, lang), {})
+                for key, value in info.items():
+                    entry.setdefault(key, value)
+
+    def _resolve(self, class_name):
+        """(plant, disease) for a model class like 'TomatoTomato_YellowLeafCurl_Virus', None if no record has it"""
+        if class_name not in self._resolved:
+            name = compact(class_name)
+            key = None
+            for plant in self._plants:
+                if name.startswith(plant):
+                    candidate = (plant, strip_plant(name[len(plant):], plant) if plant else name)
+                    if any((*candidate, lang) in self._index for lang in LANG_NAMES):
+                        key = candidate
+                        break
+            self._resolved[class_name] = key
+        return self._resolved[class_name]
+
+    def get(self, class_name, lang):
+        """Details for a class in `lang` (missing fields left out), or None if no record covers it"""
+        key = self._resolve(class_name)
+        info = self._index.get((*key, lang)) if key else None
+        if info is None:
+            self.misses.inc()
+        else:
+            self.hits.inc()
+        return info
+
+    def stats(self):
+        hits, misses = self.hits.value, self.misses.value
+        return {
+            "path": self.path,
+            "records": self.records,
+            "entries": len(self._index),
+            "plants": len(self._plants),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Disease information prompt shared by the CropIQ server and LeafLens
+"""
+
+import hashlib
+import json
+import re
+
+DISEASE_INFO_KEYS = ("disease_type", "symptoms", "prevention", "treatments", "fertilizers", "expected_yield")
+
+# Map front-end language codes to human names
+LANG_NAMES = {
+    "en": "English",
+    "hi": "Hindi",
+    "ta": "Tamil",
+    "gu": "Gujarati"
+}
+
+
+def normalize_lang(lang):
+    """Language code the prompt is actually written for; unknown codes fall back to English"""
+    return lang if lang in LANG_NAMES else "en"
+
+
+def disease_info_prompt(predicted, lang="en"):
+    """Prompt asking for a JSON object with DISEASE_INFO_KEYS about the predicted class, in `lang`"""
+    plant = predicted.split('_')[0]
+    lang_name = LANG_NAMES.get(lang, "English")
+    return (
+        f"Plant: {plant}\n"
+        f"Disease: {predicted}\n\n"
+        "Respond ONLY with a raw JSON object. Do not include explanations or extra text.\n"
+        "The JSON must have these keys:\n"
+        f"  {', '.join(DISEASE_INFO_KEYS)}\n"
+        f"Please respond in {lang_name}."
+    )
+
+
+def parse_json_reply(text):
+    """The outermost JSON object in an LLM reply; raises ValueError if there is none"""
+    m = re.search(r"(\{.*\})", text, re.DOTALL)
+    if not m:
+        raise ValueError("No JSON object in LLM reply")
+    return json.loads(m.group(1))
+
+
+def prompt_version(model):
+    """Tag for replies generated by `model` from the current prompt template; changes when either does"""
+    template = disease_info_prompt("Plant_Condition", "en")
+    return f"{model}@{hashlib.blake2b(template.encode('utf-8'), digest_size=4).hexdigest()}"
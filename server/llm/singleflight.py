@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing of identical LLM calls
+During an outbreak many users get the same prediction at once, and each would
+send Ollama the same prompt. Concurrent calls with the same key share the one
+already in flight: the first caller runs it, the rest wait for its result (or
+its exception). Nothing is cached - once the call returns, the next caller
+runs it again.
+
+Streamed calls fan out the same way: one upstream stream runs on its own
+thread and every caller with the same key gets all of its items, from the
+first, however late it joined.
+"""
+
+import threading
+
+from utils.metrics import Counter
+
+
+class _Call:
+    def __init__(self, streaming=False):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.streaming = streaming
+        self.items = []  # what a streamed call has produced so far
+        self.changed = threading.Condition()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}  # key -> _Call in flight
+        self._lock = threading.Lock()
+        self.calls = Counter("llm_singleflight_calls_total", "LLM calls that ran")
+        self.coalesced = Counter(
+            "llm_singleflight_coalesced_total", "LLM calls answered by an identical call already in flight"
+        )
+
+    def do(self, key, fn, *args):
+        """fn(*args), or the result of the identical call with this key already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            self.coalesced.inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        self.calls.inc()
+        try:
+            call.result = fn(*args)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key, fn, *args, replay=None):
+        """Yield the items of generator fn(*args) and return its return value, sharing the identical call in flight
+
+        If the call in flight is a do(), there is nothing to fan out: the caller waits for
+        its result and gets the items of replay(result) instead (none without `replay`).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call(streaming=True)
+            else:
+                call.waiters += 1
+
+        if leader:
+            self.calls.inc()
+            # The stream runs apart from its first caller, so the others still get it if that one hangs up
+            pump = threading.Thread(target=self._pump, args=(key, call, fn, args), name="singleflight-stream", daemon=True)
+            pump.start()
+        else:
+            self.coalesced.inc()
+
+        if not call.streaming:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            if replay is not None:
+                yield from replay(call.result)
+            return call.result
+
+        sent = 0
+        finished = False
+        while not finished:
+            with call.changed:
+                call.changed.wait_for(lambda: len(call.items) > sent or call.done.is_set())
+                items = call.items[sent:]
+                finished = call.done.is_set()
+            sent += len(items)
+            yield from items
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _pump(self, key, call, fn, args):
+        """Run a streamed call, publishing each item to everyone reading it"""
+        try:
+            stream = fn(*args)
+            while True:
+                try:
+                    item = next(stream)
+                except StopIteration as stop:
+                    call.result = stop.value
+                    break
+                with call.changed:
+                    call.items.append(item)
+                    call.changed.notify_all()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            with call.changed:
+                call.done.set()
+                call.changed.notify_all()
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+            waiting = sum(call.waiters for call in self._calls.values())
+        return {
+            "in_flight": in_flight,
+            "waiting": waiting,
+            "calls": self.calls.value,
+            "coalesced": self.coalesced.value,
+        }
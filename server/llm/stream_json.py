@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Incremental parser for a JSON object streamed by an LLM
+Fed the reply chunk by chunk, it reports the text of each top-level string
+field as soon as it arrives, and each field once it is complete, instead of
+waiting for the whole reply and regex-extracting the object afterwards. Any
+text before the opening brace (a preamble, or the CLI's spinner) and after
+the closing one is ignored, like parse_json_reply does.
+"""
+
+import json
+
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+# Parser states
+BEFORE, KEY_OR_END, KEY, COLON, VALUE, STRING, OTHER, AFTER_VALUE, DONE = range(9)
+
+
+class JSONStreamParser:
+    def __init__(self):
+        self.result = {}
+        self._state = BEFORE
+        self._key = None
+        self._text = []  # key or string value decoded so far
+        self._delta = []  # string value decoded during the current feed()
+        self._escape = None  # characters after a backslash, while an escape is incomplete
+        self._high_surrogate = None
+        self._raw = []  # a number, literal, array or object value
+        self._depth = 0
+        self._raw_in_string = False
+        self._raw_escape = False
+
+    @property
+    def done(self):
+        return self._state == DONE
+
+    def feed(self, chunk):
+        """Parse the next piece of the reply; returns a list of events
+
+        ("delta", key, text) carries newly arrived text of a string field;
+        ("field", key, value) is sent once a field is complete.
+        """
+        events = []
+        for ch in chunk:
+            state = self._state
+            if state == STRING or state == KEY:
+                self._string_char(ch, events)
+            elif state == OTHER:
+                self._other_char(ch, events)
+            elif state == BEFORE:
+                if ch == "{":
+                    self._state = KEY_OR_END
+            elif state == DONE:
+                break
+            elif ch in " \t\r\n":
+                continue
+            elif state == KEY_OR_END:
+                if ch == '"':
+                    self._state, self._text = KEY, []
+                elif ch == "}":
+                    self._state = DONE
+                else:
+                    raise ValueError(f"Expected a key in the LLM reply, got {ch!r}")
+            elif state == COLON:
+                if ch != ":":
+                    raise ValueError(f"Expected ':' in the LLM reply, got {ch!r}")
+                self._state = VALUE
+            elif state == VALUE:
+                if ch == '"':
+                    self._state, self._text = STRING, []
+                else:
+                    self._state, self._raw, self._depth = OTHER, [], 0
+                    self._other_char(ch, events)
+            elif state == AFTER_VALUE:
+                if ch == ",":
+                    self._state = KEY_OR_END
+                elif ch == "}":
+                    self._state = DONE
+                else:
+                    raise ValueError(f"Expected ',' or '}}' in the LLM reply, got {ch!r}")
+        if self._state == STRING:
+            self._flush_delta(events)
+        return events
+
+    def finish(self) -> dict:
+        """The parsed object once the reply has ended; raises ValueError if it never completed"""
+        if self._state != DONE:
+            raise ValueError("No complete JSON object in the LLM reply")
+        return self.result
+
+    def _emit(self, text):
+        self._text.append(text)
+        if self._state == STRING:
+            self._delta.append(text)
+
+    def _flush_delta(self, events):
+        if self._delta:
+            events.append(("delta", self._key, "".join(self._delta)))
+            self._delta = []
+
+    def _string_char(self, ch, events):
+        if self._escape is not None:
+            self._escape += ch
+            if self._escape[0] == "u":
+                if len(self._escape) < 5:
+                    return
+                code = int(self._escape[1:], 16)
+                self._escape = None
+                if 0xD800 <= code < 0xDC00:
+                    if self._high_surrogate is not None:
+                        self._emit(chr(self._high_surrogate))
+                    self._high_surrogate = code
+                    return
+                if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                    code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+                    self._high_surrogate = None
+                self._emit_pending_surrogate()
+                self._emit(chr(code))
+                return
+            if self._escape not in ESCAPES:
+                raise ValueError(f"Invalid escape '\\{self._escape}' in the LLM reply")
+            self._emit_pending_surrogate()
+            self._emit(ESCAPES[self._escape])
+            self._escape = None
+        elif ch == "\\":
+            self._escape = ""
+        elif ch == '"':
+            self._emit_pending_surrogate()
+            text = "".join(self._text)
+            if self._state == KEY:
+                self._key, self._state = text, COLON
+            else:
+                self._flush_delta(events)
+                self._set_field(text, events)
+        else:
+            self._emit_pending_surrogate()
+            self._emit(ch)
+
+    def _emit_pending_surrogate(self):
+        if self._high_surrogate is not None:
+            self._emit(chr(self._high_surrogate))
+            self._high_surrogate = None
+
+    def _other_char(self, ch, events):
+        """Collect a non-string value until the comma or brace that ends it"""
+        if self._raw_in_string:
+            if self._raw_escape:
+                self._raw_escape = False
+            elif ch == "\\":
+                self._raw_escape = True
+            elif ch == '"':
+                self._raw_in_string = False
+        elif ch == '"':
+            self._raw_in_string = True
+        elif ch in "[{":
+            self._depth += 1
+        elif ch in "]}" and self._depth > 0:
+            self._depth -= 1
+        elif self._depth == 0 and ch in ",}":
+            self._set_field(json.loads("".join(self._raw)), events)
+            self._state = KEY_OR_END if ch == "," else DONE
+            return
+        self._raw.append(ch)
+
+    def _set_field(self, value, events):
+        self.result[self._key] = value
+        events.append(("field", self._key, value))
+        self._state = AFTER_VALUE
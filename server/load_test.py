@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Load test the disease, fertilizer and recommendation endpoints at increasing
+concurrency and report throughput and latency percentiles
+
+Run it once against the Flask dev server and once against the async mode:
+  python app.py                                   # serves on :5000
+  uvicorn asgi:app --port 8000 --workers 1
+  python load_test.py --url http://localhost:5000 --endpoint detect --image leaf.jpg
+  python load_test.py --url http://localhost:8000 --endpoint detect --image leaf.jpg
+
+--slow-upload trickles each request body over the given number of seconds to
+mimic a phone on a poor connection; the sync server holds a worker for the
+whole upload while the async server keeps serving other requests.
+
+--enrich async asks for the classification without waiting for Ollama (the
+details come from a background enrichment job), so p99 can be compared with
+and without the LLM on the request path; `python -m llm.fake_server
+--delay 5` stands in for a slow Ollama.
+"""
+
+import argparse
+import http.client
+import io
+import json
+import statistics
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import numpy as np
+from PIL import Image
+
+ENDPOINTS = {
+    "detect": "/api/detect-disease",
+    "fertilizer": "/api/fertilizer-recommendation",
+    "plants": "/api/recommend-plants",
+}
+FERTILIZER_BODY = {"plant_type": "Rice", "growth_stage": "Vegetative", "soil_type": "Clay", "temperature": 28}
+PLANTS_BODY = {"soil_type": "Loamy", "location": "Punjab", "temperature": 25, "season": "Rabi"}
+
+
+def synthetic_leaf():
+    rng = np.random.default_rng()
+    img = np.clip(rng.normal((60, 140, 50), 25, (512, 512, 3)), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def multipart_body(image_bytes, lang="en"):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"lang\"\r\n\r\n{lang}\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"leaf\"; filename=\"leaf.jpg\"\r\n"
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + image_bytes + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def build_request(endpoint, image_bytes, unique):
+    """(body, content type) for one request; `unique` defeats the repeat-upload cache"""
+    if endpoint == "detect":
+        if unique:
+            image_bytes = image_bytes + uuid.uuid4().bytes  # trailing bytes after EOI are ignored by decoders
+        return multipart_body(image_bytes)
+    body = FERTILIZER_BODY if endpoint == "fertilizer" else PLANTS_BODY
+    return json.dumps(body).encode(), "application/json"
+
+
+def send(url, path, body, content_type, slow_upload, timeout):
+    """POST one request, optionally trickling the body; returns the status code"""
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+    try:
+        conn.putrequest("POST", path)
+        conn.putheader("Content-Type", content_type)
+        conn.putheader("Content-Length", str(len(body)))
+        conn.endheaders()
+        if slow_upload > 0:
+            chunks = 20
+            step = -(-len(body) // chunks)
+            for i in range(0, len(body), step):
+                conn.send(body[i:i + step])
+                time.sleep(slow_upload / chunks)
+        else:
+            conn.send(body)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def run_level(url, endpoint, image_bytes, concurrency, duration, args):
+    """Keep `concurrency` clients busy for `duration` seconds"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            body, content_type = build_request(endpoint, image_bytes, args.unique)
+            path = ENDPOINTS[endpoint] + (f"?enrich={args.enrich}" if endpoint == "detect" and args.enrich else "")
+            start = time.perf_counter()
+            try:
+                ok = send(url, path, body, content_type, args.slow_upload, args.timeout) == 200
+            except OSError:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    return latencies, errors[0], wall
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure sustained concurrency of the CropIQ API")
+    parser.add_argument("--url", default="http://localhost:5000", help="Server base URL")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="detect")
+    parser.add_argument("--image", help="Leaf photo to upload (default: synthetic JPEG)")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--slow-upload", type=float, default=0.0, help="Seconds to trickle each request body over")
+    parser.add_argument("--unique", action="store_true", help="Make every upload unique to bypass the prediction cache")
+    parser.add_argument("--timeout", type=float, default=180.0, help="Per-request socket timeout")
+    parser.add_argument("--enrich", choices=["async"], help="Detect with ?enrich=async (Ollama runs in the background)")
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    image_bytes = open(args.image, "rb").read() if args.image else synthetic_leaf()
+
+    print(f"{args.endpoint} on {args.url} ({args.duration:.0f}s per level, slow upload {args.slow_upload}s)")
+    print(f"{'Clients':>8} {'Req/s':>8} {'OK':>7} {'Errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    print("-" * 62)
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        latencies, errors, wall = run_level(url, args.endpoint, image_bytes, concurrency, args.duration, args)
+        median = statistics.median(latencies) * 1000 if latencies else float("nan")
+        print(f"{concurrency:>8} {len(latencies) / wall:>8.1f} {len(latencies):>7} {errors:>7} "
+              f"{median:>9.1f} {percentile(latencies, 95):>9.1f} {percentile(latencies, 99):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,47 @@
 from flask import Flask, request, jsonify, make_response
 from flask_cors import CORS
-import numpy as np
-from PIL import Image
-import io
-import tensorflow as tf
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
+import sys
+
+# Share the inference engine with the main server
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from inference.engine import CLASS_NAMES, load_engine, build_detection_response
+from inference.preprocess import InvalidImage, ImageTooLarge
+from inference.upload import (
+    read_upload, UploadTooLarge, DEFAULT_MAX_BYTES, DEFAULT_MAX_PIXELS, DEFAULT_SPOOL_BYTES, FORM_OVERHEAD_BYTES
+)
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
+# Upload limits - bodies over the byte limit are refused before they are read
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+UPLOAD_MAX_PIXELS = int(os.getenv("UPLOAD_MAX_PIXELS", str(DEFAULT_MAX_PIXELS)))
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_BYTES + FORM_OVERHEAD_BYTES
+
 # TFLite Model Setup - New high-accuracy model
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "model", "plant_leaf_diseases_model.tflite")
-CLASS_NAMES = [
-    "Pepper_bell_Bacterial_spot",
-    "Pepperbell_healthy",
-    "Potato_Early_blight",
-    "Potato_Late_blight",
-    "Potato_healthy",
-    "Tomato_Bacterial_spot",
-    "Tomato_Early_blight",
-    "Tomato_Late_blight",
-    "Tomato_Leaf_Mold",
-    "Tomato_Septoria_leaf_spot",
-    "Tomato_Spider_mites_Two_spotted_spider_mite",
-    "TomatoTarget_Spot",
-    "TomatoTomato_YellowLeafCurl_Virus",
-    "Tomato_Tomato_mosaic_virus",
-    "Tomato_healthy"
-]
+MODEL_PATH = os.getenv("DISEASE_MODEL_PATH") or os.path.join(os.path.dirname(__file__), "..", "model", "plant_leaf_diseases_model.tflite")
 
-# Load TFLite model
+# Load the model through the shared inference engine
 try:
     if not os.path.isfile(MODEL_PATH):
         raise RuntimeError(f"Model file not found at {MODEL_PATH}")
     
-    interpreter = tf.lite.Interpreter(model_path=MODEL_PATH)
-    interpreter.allocate_tensors()
-    input_details = interpreter.get_input_details()[0]
-    output_details = interpreter.get_output_details()[0]
+    disease_engine = load_engine(
+        MODEL_PATH,
+        os.getenv("DISEASE_BACKEND", "auto"),
+        runtime=os.getenv("DISEASE_RUNTIME", "auto")
+    )
+    print(f"Inference backend: {disease_engine.backend.name} ({disease_engine.backend.runtime})")
     model_loaded = True
     print(f"TFLite disease detection model loaded successfully from {MODEL_PATH}!")
     print(f"Model supports {len(CLASS_NAMES)} classes")
 except Exception as e:
     print(f"Error loading TFLite disease detection model: {e}")
-    interpreter = None
-    input_details = None
-    output_details = None
+    disease_engine = None
     model_loaded = False
 
-def preprocess_image(image_bytes: bytes) -> np.ndarray:
-    """Preprocess image for TFLite model - resize to 256x256 and normalize"""
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img = img.resize((256, 256), Image.BILINEAR)
-    arr = np.asarray(img, dtype=np.float32) / 255.0
-    return np.expand_dims(arr, axis=0)
-
 def add_cors_headers(response):
     response.headers["Access-Control-Allow-Origin"] = "*"
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS, PUT, DELETE"
@@ -62,6 +49,10 @@ def add_cors_headers(response):
     response.headers["Access-Control-Allow-Credentials"] = "true"
     return response
 
+@app.errorhandler(RequestEntityTooLarge)
+def handle_request_too_large(e):
+    return add_cors_headers(jsonify({'error': 'Image file too large'})), 413
+
 @app.route('/api/detect-disease', methods=['POST', 'OPTIONS'])
 def detect_disease():
     if request.method == 'OPTIONS':
@@ -76,24 +67,23 @@ def detect_disease():
     try:
         file = request.files['leaf']
         
-        # Read image bytes
-        img_bytes = file.read()
+        # Copy the upload into a size-bounded buffer
+        try:
+            upload = read_upload(file.stream, UPLOAD_MAX_BYTES, DEFAULT_SPOOL_BYTES)
+        except UploadTooLarge as e:
+            return add_cors_headers(jsonify({'error': str(e)})), 413
         
-        # Validate that the file is an image
+        # Validate and preprocess image to the model's input size in a single decode
         try:
-            img = Image.open(io.BytesIO(img_bytes))
-            img.verify()
-        except Exception as img_error:
+            with upload:
+                data = disease_engine.preprocess(upload.open(), max_pixels=UPLOAD_MAX_PIXELS)
+        except ImageTooLarge as e:
+            return add_cors_headers(jsonify({'error': str(e)})), 400
+        except InvalidImage:
             return add_cors_headers(jsonify({'error': 'Invalid image file'})), 400
         
-        # Preprocess image for TFLite model (256x256)
-        data = preprocess_image(img_bytes)
-        
-        # Run TFLite inference
-        interpreter.set_tensor(input_details["index"], data)
-        interpreter.invoke()
-        raw_output = interpreter.get_tensor(output_details["index"])
-        out = np.array(raw_output).flatten()
+        # Run inference
+        out = disease_engine.scores([data])[0]
         
         if out.shape[0] != len(CLASS_NAMES):
             return add_cors_headers(jsonify({
@@ -102,38 +92,8 @@ def detect_disease():
                 "num_classes": len(CLASS_NAMES)
             })), 500
         
-        # Get top prediction and top 3
-        top_idx = int(np.argmax(out))
-        top3_idx = np.argsort(out)[-3:][::-1]
-        top3 = [{"label": CLASS_NAMES[i], "score": float(out[i] * 100)} for i in top3_idx]
-        
-        predicted = CLASS_NAMES[top_idx]
-        confidence = float(out[top_idx] * 100)
-        
-        # Determine if healthy
-        is_healthy = 'healthy' in predicted.lower()
-        
-        # Create user-friendly disease name
-        disease_display = predicted.replace('_', ' ').title()
-        if 'Healthy' in disease_display:
-            result_message = "No disease detected - Plant appears healthy"
-            disease_status = "Healthy"
-        else:
-            result_message = f"Disease detected: {disease_display}"
-            disease_status = disease_display
-
-        return add_cors_headers(jsonify({
-            "disease": disease_status,
-            "predicted": predicted,
-            "confidence": confidence,
-            "message": result_message,
-            "top3": top3,
-            "prediction_details": {
-                "detected_condition": disease_display,
-                "confidence_percentage": confidence,
-                "is_healthy": is_healthy
-            }
-        }))
+        # Build response from the top prediction and top 3
+        return add_cors_headers(jsonify(build_detection_response(out)))
     except Exception as e:
         import traceback
         print(f"Error in disease detection: {e}")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Pre-generate Ollama disease details for every class and language into the
+knowledge store the server reads from (model/disease_knowledge.sqlite3)
+
+Entries are versioned by the Ollama model and the prompt template, so after
+changing either, run this again to fill the new version; existing entries of
+the current version are skipped unless --force is given. The server can then
+serve enriched detections without Ollama running.
+
+Usage:
+  python prewarm_knowledge.py
+  python prewarm_knowledge.py --model llama3:8b --langs en,hi --force
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from config import DISEASE_KNOWLEDGE_PATH, OLLAMA_BIN, OLLAMA_MODEL, OLLAMA_TIMEOUT, OLLAMA_URL
+from inference.engine import CLASS_NAMES
+from llm.knowledge import KnowledgeStore, prewarm
+from llm.ollama import load_client
+from llm.prompts import LANG_NAMES, prompt_version
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model", "disease_knowledge.sqlite3")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the disease knowledge store from Ollama")
+    parser.add_argument("--db", default=DISEASE_KNOWLEDGE_PATH or DEFAULT_PATH, help="SQLite store to fill")
+    parser.add_argument("--url", default=OLLAMA_URL, help="Ollama REST API")
+    parser.add_argument("--model", default=OLLAMA_MODEL)
+    parser.add_argument("--bin", default=OLLAMA_BIN, help="ollama executable, used if the REST API is down")
+    parser.add_argument("--langs", default=",".join(LANG_NAMES), help="Comma-separated language codes")
+    parser.add_argument("--timeout", type=float, default=OLLAMA_TIMEOUT)
+    parser.add_argument("--force", action="store_true", help="Regenerate entries that already exist")
+    args = parser.parse_args()
+
+    langs = [lang.strip() for lang in args.langs.split(",") if lang.strip()]
+    unknown = [lang for lang in langs if lang not in LANG_NAMES]
+    if unknown:
+        print(f"Unknown language codes {unknown} (expected {', '.join(LANG_NAMES)})")
+        sys.exit(1)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    store = KnowledgeStore(args.db, prompt_version(args.model))
+    client = load_client(args.url, args.model, bin=args.bin, timeout=args.timeout)
+    print(f"Filling {args.db} for {store.version}: {len(CLASS_NAMES)} classes x {len(langs)} languages, "
+          f"{len(store.missing(CLASS_NAMES, langs))} missing")
+
+    start = time.perf_counter()
+    generated, failed = prewarm(store, client, CLASS_NAMES, langs, force=args.force)
+    print(f"\nGenerated {len(generated)} entries in {time.perf_counter() - start:.1f}s, {len(failed)} failed; "
+          f"{store.stats()['entries']} entries stored for {store.version}")
+    store.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
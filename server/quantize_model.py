@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Build quantized variants of the disease detection model and report
+accuracy vs latency against the float model
+
+Variants (written next to the float model in server/model/):
+  dynamic  - dynamic-range quantized weights, float input/output
+  float16  - float16 weights, float input/output
+  int8     - full integer quantization with uint8 input/output, calibrated on
+             a representative sample of the training images
+
+A .tflite flatbuffer can't be re-quantized, so conversion needs the Keras
+(.h5/.keras) model or SavedModel directory the float model was exported from.
+The dataset uses the collect_data.py layout (data/<class_name>/*.jpg); images
+are split into a calibration sample and a disjoint held-out set.
+
+Usage:
+  python quantize_model.py --source leaf_model.h5 --data ml-backend/data
+  python quantize_model.py --data ml-backend/data          # report on existing variants only
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from inference.pool import InterpreterPool
+from inference.preprocess import decode_leaf_image
+from inference.runtime import load_interpreter_class
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "model")
+FLOAT_MODEL = os.path.join(MODEL_DIR, "plant_leaf_diseases_model.tflite")
+VARIANTS = ["dynamic", "float16", "int8"]
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+
+def variant_path(variant):
+    return os.path.join(MODEL_DIR, f"plant_leaf_diseases_model_{variant}.tflite")
+
+
+def list_images(data_dir):
+    """All image paths in a collect_data.py style directory tree"""
+    paths = []
+    for class_name in sorted(os.listdir(data_dir)):
+        class_dir = os.path.join(data_dir, class_name)
+        if os.path.isdir(class_dir):
+            paths.extend(
+                os.path.join(class_dir, f) for f in sorted(os.listdir(class_dir))
+                if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+    return paths
+
+
+def load_image(path, size):
+    with open(path, "rb") as f:
+        return np.asarray(decode_leaf_image(f.read(), size=size))
+
+
+def convert(source, variant, calibration_images):
+    """Convert the source model to one quantized .tflite variant"""
+    import tensorflow as tf  # conversion needs full TensorFlow; serving does not
+
+    if os.path.isdir(source):
+        converter = tf.lite.TFLiteConverter.from_saved_model(source)
+    else:
+        converter = tf.lite.TFLiteConverter.from_keras_model(tf.keras.models.load_model(source))
+
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        def representative_dataset():
+            for image in calibration_images:
+                yield [np.expand_dims(image.astype(np.float32) / 255.0, axis=0)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+        converter.inference_output_type = tf.uint8
+
+    with open(variant_path(variant), "wb") as f:
+        f.write(converter.convert())
+
+
+def evaluate(model_path, images, Interpreter, runs):
+    """Return (top-1 predictions on `images`, median single-image latency in ms)"""
+    pool = InterpreterPool(model_path, Interpreter, size=1, num_threads=1)
+    predictions = [int(np.argmax(pool.run([image]))) for image in images]
+
+    timings = []
+    for i in range(runs):
+        image = images[i % len(images)]
+        start = time.perf_counter()
+        pool.run([image])
+        timings.append((time.perf_counter() - start) * 1000)
+    return predictions, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and benchmark quantized disease model variants")
+    parser.add_argument("--source", help="Keras .h5/.keras file or SavedModel dir to convert from")
+    parser.add_argument("--data", required=True, help="Image directory in collect_data.py layout")
+    parser.add_argument("--calibration", type=int, default=200, help="Images used to calibrate INT8")
+    parser.add_argument("--holdout", type=int, default=500, help="Held-out images for the agreement check")
+    parser.add_argument("--runs", type=int, default=50, help="Timed invokes per variant")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not os.path.isfile(FLOAT_MODEL):
+        print(f"Float model not found at {FLOAT_MODEL}")
+        sys.exit(1)
+
+    paths = list_images(args.data)
+    if len(paths) < 2:
+        print(f"Need at least 2 images under {args.data}")
+        sys.exit(1)
+    random.Random(args.seed).shuffle(paths)
+    calibration_paths = paths[:min(args.calibration, len(paths) // 2)]
+    holdout_paths = paths[len(calibration_paths):len(calibration_paths) + args.holdout]
+    print(f"{len(calibration_paths)} calibration images, {len(holdout_paths)} held-out images")
+
+    Interpreter, backend = load_interpreter_class()
+    probe = InterpreterPool(FLOAT_MODEL, Interpreter, size=1)
+    size = tuple(int(d) for d in probe.input_details["shape"][1:3])[::-1]
+
+    if args.source:
+        calibration = [load_image(p, size) for p in calibration_paths]
+        for variant in VARIANTS:
+            print(f"Converting {variant}...")
+            convert(args.source, variant, calibration)
+
+    holdout = [load_image(p, size) for p in holdout_paths]
+    reference, float_ms = evaluate(FLOAT_MODEL, holdout, Interpreter, args.runs)
+
+    print(f"\nRuntime: {backend}")
+    print(f"{'Variant':<10} {'Size MB':>8} {'Median ms':>10} {'Speedup':>8} {'Top-1 agreement':>16}")
+    print("-" * 56)
+    print(f"{'float':<10} {os.path.getsize(FLOAT_MODEL) / 1e6:>8.2f} {float_ms:>10.2f} {1.0:>7.2f}x {'100.0%':>16}")
+    for variant in VARIANTS:
+        path = variant_path(variant)
+        if not os.path.isfile(path):
+            print(f"{variant:<10} not built (pass --source to convert)")
+            continue
+        predictions, ms = evaluate(path, holdout, Interpreter, args.runs)
+        agreement = 100.0 * sum(p == r for p, r in zip(predictions, reference)) / len(reference)
+        print(f"{variant:<10} {os.path.getsize(path) / 1e6:>8.2f} {ms:>10.2f} {float_ms / ms:>7.2f}x {agreement:>15.1f}%")
+
+    print("\nServe a variant by setting DISEASE_MODEL_PATH to its file.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test that asgi.py answers every route it shares with app.py exactly like the
+Flask app: same status, content type, model version header and body bytes,
+including the streamed batch results
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+from starlette.testclient import TestClient
+
+import app as flask_app
+import asgi
+
+flask_client = flask_app.app.test_client()
+asgi_client = TestClient(asgi.app)
+
+
+def leaf_jpeg(seed, width=640, height=480):
+    rng = np.random.default_rng(seed)
+    pixels = np.clip(rng.normal((60, 140, 50), 30, (height, width, 3)), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def both(method, path, form=None, files=(), json=None):
+    """Send one request to each serving mode; `files` are (field, filename, bytes)"""
+    data = dict(form or {})
+    for field, filename, content in files:
+        data.setdefault(field, []).append((io.BytesIO(content), filename))
+    flask_response = flask_client.open(path, method=method, data=data or None, json=json)
+    asgi_response = asgi_client.request(
+        method, path, data=form, json=json,
+        files=[(field, (filename, content, "application/octet-stream")) for field, filename, content in files] or None
+    )
+    return flask_response, asgi_response
+
+
+def assert_same(method, path, form=None, files=(), json=None, compare_body=True):
+    flask_response, asgi_response = both(method, path, form, files, json)
+    print(f"{method} {path}: Flask {flask_response.status_code}, ASGI {asgi_response.status_code}")
+    assert asgi_response.status_code == flask_response.status_code
+    assert asgi_response.headers["content-type"] == flask_response.headers["Content-Type"]
+    assert asgi_response.headers.get("x-model-version") == flask_response.headers.get("X-Model-Version")
+    if compare_body:
+        assert asgi_response.content == flask_response.data, (asgi_response.content, flask_response.data)
+    return flask_response
+
+
+def test_health_and_stats_routes():
+    print("Testing /, readiness, stats and metrics...")
+    flask_app.model_ready.wait()
+    assert_same("GET", "/")
+    assert_same("GET", "/healthz/ready")
+    # Counters move between the two requests, so only the shape is compared
+    response = assert_same("GET", "/api/inference/stats", compare_body=False)
+    assert set(asgi_client.get("/api/inference/stats").json()) == set(response.get_json())
+    assert_same("GET", "/metrics", compare_body=False)
+
+
+def test_detection_routes():
+    print("Testing single, tiled and batch detection...")
+    flask_app.model_ready.wait()
+    leaf = leaf_jpeg(0)
+    for path in ("/api/detect-disease", "/api/detect-disease/tiled"):
+        assert_same("POST", path, form={"lang": "en"}, files=[("leaf", "leaf.jpg", leaf)])
+        assert_same("POST", path, form={"lang": "en"}, files=[("leaf", "leaf.jpg", b"not an image")])
+        assert_same("POST", path, form={"lang": "en"})
+
+    images = [("leaf", f"leaf{seed}.jpg", leaf_jpeg(seed)) for seed in range(3)]
+    response = assert_same("POST", "/api/detect-disease/batch", files=images + [("leaf", "bad.jpg", b"not an image")])
+    if flask_app.model_loaded:
+        lines = response.data.decode().splitlines()
+        assert len(lines) == 5 and '"done": true' in lines[-1]
+    assert_same("POST", "/api/detect-disease/batch")
+
+
+def test_json_routes():
+    print("Testing fertilizer, plant recommendation, enrichment and reload routes...")
+    assert_same("POST", "/api/fertilizer-recommendation", json={
+        "plant_type": "Rice", "growth_stage": "Vegetative", "soil_type": "Clay", "temperature": 28
+    })
+    assert_same("POST", "/api/recommend-plants", json={
+        "soil_type": "Loamy", "location": "Punjab", "temperature": 25, "season": "Rabi"
+    })
+    assert_same("GET", "/api/enrichment/unknown-job")
+    assert_same("POST", "/api/admin/reload", json={})
+
+
+if __name__ == "__main__":
+    test_health_and_stats_routes()
+    test_detection_routes()
+    test_json_routes()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test /api/detect-disease/batch through the Flask test client: a streamed
+result line per image, one bad image failing alone, and batches over
+DISEASE_BATCH_MAX_IMAGES (loose or zipped) or zip bombs refused with 413
+"""
+
+import io
+import json
+import zipfile
+
+import numpy as np
+from PIL import Image
+
+import app as flask_app
+
+client = flask_app.app.test_client()
+
+
+def leaf_jpeg(seed, width=640, height=480):
+    rng = np.random.default_rng(seed)
+    pixels = np.clip(rng.normal((60, 140, 50), 30, (height, width, 3)), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def zipped(images, compression=zipfile.ZIP_STORED):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=compression) as archive:
+        for name, content in images:
+            archive.writestr(name, content)
+    return buf.getvalue()
+
+
+def post_batch(images, field="leaf"):
+    """POST (filename, bytes) images and return (status, parsed JSON lines)"""
+    data = {field: [(io.BytesIO(content), name) for name, content in images]}
+    response = client.post("/api/detect-disease/batch", data=data, content_type="multipart/form-data")
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+    return response.status_code, lines
+
+
+def test_batch_streams_a_line_per_image():
+    print("Testing a batch of good images...")
+    flask_app.model_ready.wait()
+    assert flask_app.model_loaded, "Batch tests need the disease model"
+    status, lines = post_batch([(f"leaf{i}.jpg", leaf_jpeg(i)) for i in range(3)])
+    assert status == 200
+    assert [line["index"] for line in lines[:-1]] == [0, 1, 2]
+    assert all("predicted" in line and "error" not in line for line in lines[:-1])
+    assert lines[-1]["done"] and lines[-1]["count"] == 3 and lines[-1]["errors"] == 0
+
+
+def test_bad_image_fails_alone():
+    print("Testing one bad image inside a batch...")
+    flask_app.model_ready.wait()
+    images = [("leaf0.jpg", leaf_jpeg(0)), ("broken.jpg", b"not an image"), ("leaf1.jpg", leaf_jpeg(1))]
+    status, lines = post_batch(images)
+    assert status == 200
+    results = {line["filename"]: line for line in lines[:-1]}
+    assert results["broken.jpg"]["error"] == "Invalid image file"
+    assert "predicted" in results["leaf0.jpg"] and "predicted" in results["leaf1.jpg"]
+    assert lines[-1]["count"] == 3 and lines[-1]["errors"] == 1
+
+
+def test_too_many_images_refused():
+    print("Testing batches over the image limit get 413...")
+    flask_app.model_ready.wait()
+    limit = flask_app.DISEASE_BATCH_MAX_IMAGES
+    flask_app.DISEASE_BATCH_MAX_IMAGES = 2
+    try:
+        images = [(f"leaf{i}.jpg", leaf_jpeg(i, 64, 64)) for i in range(3)]
+        status, lines = post_batch(images)
+        assert status == 413 and "Too many images" in lines[0]["error"]
+        # Images inside an archive count too
+        status, lines = post_batch([("leaves.zip", zipped(images))], field="archive")
+        assert status == 413 and "Too many images" in lines[0]["error"]
+        status, lines = post_batch(images[:2])
+        assert status == 200 and lines[-1]["count"] == 2
+    finally:
+        flask_app.DISEASE_BATCH_MAX_IMAGES = limit
+
+
+def test_zip_bombs_refused():
+    print("Testing small, highly compressible zips get 413 before anything is unpacked...")
+    flask_app.model_ready.wait()
+    # 40 zero-filled members of 19 MB each: under a megabyte zipped, 760 MB unpacked
+    bomb = zipped([(f"leaf{i}.jpg", bytes(19 * 1024 * 1024)) for i in range(40)], zipfile.ZIP_DEFLATED)
+    assert len(bomb) < 1024 * 1024
+    status, lines = post_batch([("leaves.zip", bomb)], field="archive")
+    assert status == 413 and "compressed over" in lines[0]["error"], lines
+
+    # Members compressed only about 4:1 that add up to more than the request allows
+    limit = flask_app.UPLOAD_MAX_REQUEST_BYTES
+    flask_app.UPLOAD_MAX_REQUEST_BYTES = 1024 * 1024
+    try:
+        rng = np.random.default_rng(0)
+        images = [(f"leaf{i}.bmp", rng.integers(0, 4, 400_000, dtype=np.uint8).tobytes()) for i in range(4)]
+        archive = zipped(images, zipfile.ZIP_DEFLATED)
+        assert len(archive) < 1024 * 1024
+        status, lines = post_batch([("leaves.zip", archive)], field="archive")
+        assert status == 413 and "unpack to more than" in lines[0]["error"], lines
+    finally:
+        flask_app.UPLOAD_MAX_REQUEST_BYTES = limit
+
+
+if __name__ == "__main__":
+    test_batch_streams_a_line_per_image()
+    test_bad_image_fails_alone()
+    test_too_many_images_refused()
+    test_zip_bombs_refused()
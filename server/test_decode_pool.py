@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test the process-pool decode stage: output matches in-process decoding, errors
+cross the process boundary, and queue depth / stage latencies are reported
+"""
+
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from inference.decode_pool import DecodePool
+from inference.preprocess import ImageTooLarge, InvalidImage, decode_leaf_image
+from test_upload_limits import png_header_only
+
+
+def jpeg(seed, width=1200, height=900):
+    rng = np.random.default_rng(seed)
+    buf = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, (height, width, 3), dtype=np.uint8)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_decode_matches_in_process():
+    print("Testing decode pool output against decode_leaf_image()...")
+    pool = DecodePool(workers=2, size=(224, 224))
+    try:
+        for seed in range(3):
+            data = jpeg(seed)
+            out = pool.decode(data, timeout=30)
+            assert out.dtype == np.uint8 and out.shape == (224, 224, 3)
+            assert np.array_equal(out, np.asarray(decode_leaf_image(data, size=(224, 224))))
+    finally:
+        pool.close()
+
+
+def test_errors_cross_process_boundary():
+    print("Testing invalid and oversized images raised from workers...")
+    pool = DecodePool(workers=1, max_pixels=50_000_000)
+    try:
+        for data, expected in [(b"not an image", InvalidImage), (png_header_only(12000, 12000), ImageTooLarge)]:
+            try:
+                pool.decode(data, timeout=30)
+            except expected as e:
+                print(f"Rejected as expected: {type(e).__name__}")
+            else:
+                raise AssertionError(f"Expected {expected.__name__}")
+        # The slot is handed back after an error
+        assert pool.decode(jpeg(0), timeout=30).shape == (256, 256, 3)
+    finally:
+        pool.close()
+
+
+def test_concurrent_decodes_and_stats():
+    print("Testing concurrent decodes and queue depth / latency stats...")
+    pool = DecodePool(workers=2)
+    images = [jpeg(seed, 800, 600) for seed in range(12)]
+    try:
+        with ThreadPoolExecutor(8) as threads:
+            results = list(threads.map(lambda data: pool.decode(data, timeout=30), images))
+        for data, out in zip(images, results):
+            assert np.array_equal(out, np.asarray(decode_leaf_image(data)))
+
+        stats = pool.stats()
+        print(f"Decode pool stats: max in flight {stats['max_in_flight']}, "
+              f"mean decode {stats['decode_seconds']['mean'] * 1000:.1f}ms")
+        assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+        assert stats["max_in_flight"] <= stats["slots"] == 4
+        assert stats["decode_seconds"]["count"] == len(images)
+        assert stats["total_seconds"]["count"] == len(images)
+    finally:
+        pool.close()
+
+
+def test_overrun_restarts_pool():
+    print("Testing a decode that overruns its deadline restarts the pool...")
+    pool = DecodePool(workers=1)
+    try:
+        try:
+            pool.decode(jpeg(0, 4000, 3000), timeout=0.001)
+        except TimeoutError as e:
+            print(f"Timed out as expected: {e}")
+        else:
+            raise AssertionError("Expected TimeoutError")
+        stats = pool.stats()
+        assert stats["restarts"] == 1 and stats["timeouts"] == 1 and stats["in_flight"] == 0
+        # The replacement workers serve the next upload
+        assert pool.decode(jpeg(1), timeout=30).shape == (256, 256, 3)
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    test_decode_matches_in_process()
+    test_errors_cross_process_boundary()
+    test_concurrent_decodes_and_stats()
+    test_overrun_restarts_pool()
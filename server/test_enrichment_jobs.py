@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test background enrichment jobs: submitting returns at once while a slow
+stand-in Ollama answers, the worker pool and queue stay bounded, and
+finished jobs can be polled, long-polled, subscribed to and expire
+"""
+
+import threading
+import time
+
+from llm.fake_server import FakeOllama
+from llm.jobs import EnrichmentJobs, JobQueueFull
+from llm.ollama import OllamaClient
+from llm.prompts import disease_info_prompt, parse_json_reply
+
+
+def test_submit_does_not_wait_for_the_llm():
+    print("Testing jobs return at once and finish in the background against a slow Ollama...")
+    with FakeOllama(delay=0.3) as fake:
+        client = OllamaClient(fake.url, model="fake")
+        jobs = EnrichmentJobs(
+            lambda predicted, lang: parse_json_reply(client.generate(disease_info_prompt(predicted, lang))),
+            workers=2
+        )
+        start = time.perf_counter()
+        job_id = jobs.submit("Tomato_Early_blight", "en")
+        assert time.perf_counter() - start < 0.05
+        assert jobs.get(job_id)["status"] in ("pending", "running")
+
+        job = jobs.wait(job_id, timeout=5)
+        assert job["status"] == "done" and job["result"]["disease_type"] == "Fungal"
+        assert fake.prompts == [disease_info_prompt("Tomato_Early_blight", "en")]
+        assert jobs.stats()["completed"] == 1
+        jobs.close()
+
+
+def test_bounded_workers_and_queue():
+    print("Testing at most `workers` jobs run and a full queue refuses new jobs...")
+    release = threading.Event()
+    running = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def slow(n):
+        with lock:
+            running.append(n)
+            peak[0] = max(peak[0], len(running))
+        release.wait(5)
+        with lock:
+            running.remove(n)
+        return n
+
+    jobs = EnrichmentJobs(slow, workers=2, max_pending=3)
+    ids = [jobs.submit(0), jobs.submit(1)]
+    deadline = time.time() + 2
+    while jobs.stats()["running"] < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    ids += [jobs.submit(n) for n in range(2, 5)]
+    try:
+        jobs.submit(5)
+        assert False, "expected the queue to be full"
+    except JobQueueFull:
+        pass
+    stats = jobs.stats()
+    assert stats["running"] == 2 and stats["pending"] == 3 and stats["rejected"] == 1
+
+    release.set()
+    assert [jobs.wait(job_id, 5)["result"] for job_id in ids] == [0, 1, 2, 3, 4]
+    assert peak[0] == 2
+    jobs.close()
+
+
+def test_failures_subscribe_and_expiry():
+    print("Testing failed jobs, subscriber callbacks, long-poll timeouts and expiry...")
+    gate = threading.Event()
+
+    def run(fail):
+        gate.wait(5)
+        if fail:
+            raise ValueError("unparseable reply")
+        return {"symptoms": "spots"}
+
+    jobs = EnrichmentJobs(run, workers=1, ttl_seconds=0.2)
+    ok, bad = jobs.submit(False), jobs.submit(True)
+    assert jobs.wait(ok, timeout=0.05)["status"] in ("pending", "running")
+
+    finished = []
+    assert jobs.subscribe(bad, finished.append)
+    assert not jobs.subscribe("no-such-job", finished.append)
+    gate.set()
+    assert jobs.wait(ok, 5) == {"job_id": ok, "status": "done", "result": {"symptoms": "spots"}}
+    assert jobs.wait(bad, 5) == {"job_id": bad, "status": "failed", "error": "unparseable reply"}
+    assert finished == [jobs.get(bad)]
+
+    # Subscribing to a finished job calls back straight away
+    late = []
+    jobs.subscribe(ok, late.append)
+    assert late[0]["status"] == "done"
+
+    time.sleep(0.3)
+    jobs.submit(False)  # expiry runs on submit
+    assert jobs.get(ok) is None and jobs.get(bad) is None
+    jobs.close()
+
+
+if __name__ == "__main__":
+    test_submit_does_not_wait_for_the_llm()
+    test_bounded_workers_and_queue()
+    test_failures_subscribe_and_expiry()
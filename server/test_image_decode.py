@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test the single-pass upload decode against the original verify + resize preprocessing
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from inference.preprocess import decode_leaf_image, InvalidImage
+
+
+def legacy_preprocess(image_bytes):
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    img = img.resize((256, 256), Image.BILINEAR)
+    return np.asarray(img, dtype=np.float32) / 255.0
+
+
+def make_image(width, height, fmt="JPEG"):
+    y, x = np.mgrid[0:height, 0:width]
+    arr = np.stack([(x * 255 // width), (y * 255 // height), ((x + y) % 256)], axis=-1).astype(np.uint8)
+    img = Image.fromarray(arr)
+    if fmt == "PNG":
+        img = img.convert("P")  # palette images must be converted before resizing
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def test_matches_legacy_preprocessing():
+    print("Testing decode output against the original preprocessing...")
+    for width, height, fmt in [(4032, 3024, "JPEG"), (300, 200, "JPEG"), (1200, 900, "PNG")]:
+        data = make_image(width, height, fmt)
+        new = np.asarray(decode_leaf_image(data), dtype=np.float32) / 255.0
+        old = legacy_preprocess(data)
+        diff = float(np.abs(new - old).mean())
+        print(f"{width}x{height} {fmt}: mean abs diff {diff:.4f}")
+        assert new.shape == (256, 256, 3)
+        assert diff < 0.02
+
+
+def test_rejects_invalid_and_truncated_files():
+    print("Testing invalid and truncated uploads are rejected...")
+    data = make_image(800, 600)
+    for bad in [b"not an image", data[:len(data) // 2]]:
+        try:
+            decode_leaf_image(bad)
+        except InvalidImage:
+            continue
+        raise AssertionError("Expected InvalidImage")
+
+
+if __name__ == "__main__":
+    test_matches_legacy_preprocessing()
+    test_rejects_invalid_and_truncated_files()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test the shared inference engine with stand-in TFLite and tiny ONNX models (no model file needed)
+"""
+
+import io
+import os
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from inference.engine import CLASS_NAMES, DiseaseEngine, TFLiteBackend, load_engine
+
+
+class FakeInterpreter:
+    """Scores each image by the mean of its green channel"""
+
+    fixed_batch = False
+    failing_invoke = False
+
+    def __init__(self, model_path=None, num_threads=None):
+        self.shape = [1, 256, 256, 3]
+        self._input = np.zeros(self.shape, dtype=np.float32)
+
+    def allocate_tensors(self):
+        self._input = np.zeros(self.shape, dtype=np.float32)
+
+    def resize_tensor_input(self, index, shape):
+        if self.fixed_batch and shape[0] != 1:
+            raise ValueError("Cannot set tensor: dimension mismatch")
+        self.shape = list(shape)
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array(self.shape), "dtype": np.float32}]
+
+    def get_output_details(self):
+        return [{"index": 1, "shape": np.array([self.shape[0], 15]), "dtype": np.float32}]
+
+    def set_tensor(self, index, value):
+        self._input[...] = value
+
+    def invoke(self):
+        if self.failing_invoke:
+            raise RuntimeError("Node number 3 (CONV_2D) failed to invoke")
+
+    def get_tensor(self, index):
+        out = np.zeros((self.shape[0], 15), dtype=np.float32)
+        for i, image in enumerate(self._input):
+            out[i, int(round(image[..., 1].mean() * 255)) % 15] = 1.0
+        return out
+
+
+def leaf(green):
+    return np.full((256, 256, 3), (10, green, 10), dtype=np.uint8)
+
+
+def test_tflite_engine_predicts_batches():
+    print("Testing TFLite engine batch predict...")
+    engine = DiseaseEngine(TFLiteBackend("model.tflite", pool_size=1, interpreter_class=FakeInterpreter))
+    assert engine.input_size == (256, 256)
+
+    buf = io.BytesIO()
+    Image.fromarray(leaf(7)).save(buf, format="PNG")
+    results = engine.predict([leaf(3), leaf(5), buf.getvalue()])
+    assert [r["predicted"] for r in results] == [CLASS_NAMES[3], CLASS_NAMES[5], CLASS_NAMES[7]]
+    assert results[0]["confidence"] == 100.0
+    assert len(results[0]["top3"]) == 3
+    assert engine.backend.batched_invoke
+
+
+def test_tflite_fixed_batch_falls_back():
+    print("Testing fallback for models with a fixed batch dimension...")
+    FakeInterpreter.fixed_batch = True
+    try:
+        engine = DiseaseEngine(TFLiteBackend("model.tflite", pool_size=1, interpreter_class=FakeInterpreter))
+        results = engine.predict([leaf(1), leaf(2)])
+    finally:
+        FakeInterpreter.fixed_batch = False
+    assert [r["predicted"] for r in results] == [CLASS_NAMES[1], CLASS_NAMES[2]]
+    assert not engine.backend.batched_invoke
+
+
+def test_tflite_invoke_error_keeps_batching():
+    print("Testing a failed batched invoke propagates without disabling batching...")
+    engine = DiseaseEngine(TFLiteBackend("model.tflite", pool_size=1, interpreter_class=FakeInterpreter))
+    FakeInterpreter.failing_invoke = True
+    try:
+        engine.predict([leaf(1), leaf(2)])
+    except RuntimeError as e:
+        print(f"Raised as expected: {e}")
+    else:
+        raise AssertionError("Expected the invoke error")
+    finally:
+        FakeInterpreter.failing_invoke = False
+    assert engine.backend.batched_invoke
+    assert [r["predicted"] for r in engine.predict([leaf(1), leaf(2)])] == [CLASS_NAMES[1], CLASS_NAMES[2]]
+
+
+def test_onnx_engine_matches_reference():
+    try:
+        import onnx
+        from onnx import TensorProto, helper
+    except ImportError:
+        print("onnx not installed, skipping ONNX backend test")
+        return
+    print("Testing ONNX Runtime engine...")
+
+    # Global average pool over NCHW input followed by a 3 -> 15 linear layer
+    weights = np.random.default_rng(0).normal(size=(3, 15)).astype(np.float32)
+    graph = helper.make_graph(
+        [
+            helper.make_node("GlobalAveragePool", ["input"], ["pooled"]),
+            helper.make_node("Flatten", ["pooled"], ["flat"]),
+            helper.make_node("MatMul", ["flat", "weights"], ["scores"]),
+        ],
+        "leaf",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["batch", 3, 128, 128])],
+        [helper.make_tensor_value_info("scores", TensorProto.FLOAT, ["batch", 15])],
+        [helper.make_tensor("weights", TensorProto.FLOAT, weights.shape, weights.flatten())],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "leaf.onnx")
+        onnx.save(model, path)
+        engine = load_engine(path)
+
+    assert engine.backend.name == "onnx"
+    assert engine.backend.channels_first
+    assert engine.input_size == (128, 128)
+    rng = np.random.default_rng(1)
+    images = [rng.integers(0, 256, (128, 128, 3), dtype=np.uint8) for _ in range(4)]
+    expected = np.stack([(img / 255.0).mean(axis=(0, 1)) for img in images]) @ weights
+    assert np.allclose(engine.scores(images), expected, atol=1e-4)
+    assert [r["predicted"] for r in engine.predict(images)] == [CLASS_NAMES[i] for i in expected.argmax(axis=1)]
+
+
+def test_unknown_model_extension():
+    print("Testing backend selection by file extension...")
+    try:
+        load_engine("model.pt")
+    except ValueError as e:
+        print(f"Rejected as expected: {e}")
+    else:
+        raise AssertionError("Expected ValueError")
+
+
+if __name__ == "__main__":
+    test_tflite_engine_predicts_batches()
+    test_tflite_fixed_batch_falls_back()
+    test_tflite_invoke_error_keeps_batching()
+    test_onnx_engine_matches_reference()
+    test_unknown_model_extension()
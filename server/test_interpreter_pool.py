@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test the TFLite interpreter pool with a stand-in interpreter (no model file needed)
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from inference.pool import InterpreterPool, PoolTimeout
+
+
+class FakeInterpreter:
+    """Mimics the parts of tf.lite.Interpreter the pool uses"""
+
+    def __init__(self, model_path=None, num_threads=None):
+        self.num_threads = num_threads
+        self._input = None
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array([1, 256, 256, 3]), "dtype": np.float32}]
+
+    def get_output_details(self):
+        return [{"index": 1, "shape": np.array([1, 15]), "dtype": np.float32}]
+
+    def set_tensor(self, index, value):
+        self._input = value
+
+    def invoke(self):
+        time.sleep(0.05)
+
+    def get_tensor(self, index):
+        out = np.zeros((1, 15), dtype=np.float32)
+        out[0, int(round(self._input.flat[0] * 255)) % 15] = 1.0
+        return out
+
+
+def test_pool_runs_in_parallel():
+    print("Testing interpreter pool concurrency...")
+    pool = InterpreterPool("model.tflite", FakeInterpreter, size=4, num_threads=2)
+    results = {}
+
+    def worker(i):
+        image = np.full((256, 256, 3), i, dtype=np.uint8)
+        results[i] = int(np.argmax(pool.run([image])))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"8 requests on 4 interpreters took {elapsed:.3f}s")
+    assert results == {i: i for i in range(8)}
+    assert elapsed < 0.35  # serial would be 0.4s
+
+    stats = pool.stats()
+    print(f"Pool stats: {stats}")
+    assert stats["idle"] == 4
+    assert stats["in_use"] == 0
+    assert stats["wait_seconds"]["count"] == 8
+
+
+def test_pool_timeout():
+    print("Testing interpreter pool checkout timeout...")
+    pool = InterpreterPool("model.tflite", FakeInterpreter, size=1)
+    with pool.checkout():
+        try:
+            with pool.checkout(timeout=0.01):
+                pass
+        except PoolTimeout:
+            print("Checkout timed out as expected")
+        else:
+            raise AssertionError("Expected PoolTimeout")
+    assert pool.stats()["timeouts"] == 1
+
+
+class FakeQuantizedInterpreter(FakeInterpreter):
+    """Full-INT8 model: uint8 input and output with quantization parameters"""
+
+    input_quantization = (1.0 / 255.0, 0)
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array([1, 256, 256, 3]), "dtype": np.uint8,
+                 "quantization": self.input_quantization}]
+
+    def get_output_details(self):
+        return [{"index": 1, "shape": np.array([1, 15]), "dtype": np.uint8, "quantization": (1.0 / 256.0, 0)}]
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        out = np.zeros((1, 15), dtype=np.uint8)
+        out[0, 3] = 128
+        return out
+
+
+def test_quantized_model_takes_raw_pixels():
+    print("Testing quantized uint8 input and output handling...")
+    pool = InterpreterPool("model_int8.tflite", FakeQuantizedInterpreter, size=1)
+    image = np.arange(256 * 256 * 3, dtype=np.uint32).reshape(256, 256, 3).astype(np.uint8)
+    scores = pool.run([image])
+    with pool.checkout() as interpreter:
+        fed = interpreter._input
+    assert fed.dtype == np.uint8
+    assert np.array_equal(fed[0], image)  # no /255 float conversion
+    assert abs(float(scores[0, 3]) - 0.5) < 1e-6  # dequantized output
+
+    # Other quantization parameters are converted rather than passed through
+    FakeQuantizedInterpreter.input_quantization = (2.0 / 255.0, 0)
+    pool = InterpreterPool("model_int8.tflite", FakeQuantizedInterpreter, size=1)
+    pool.run([image])
+    with pool.checkout() as interpreter:
+        assert np.array_equal(interpreter._input[0], np.rint(image / 2.0).astype(np.uint8))
+
+
+if __name__ == "__main__":
+    test_pool_runs_in_parallel()
+    test_pool_timeout()
+    test_quantized_model_takes_raw_pixels()
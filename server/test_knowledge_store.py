@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test the disease knowledge store: persistence, version isolation, and
+pre-warming every class and language from the fake Ollama server
+"""
+
+import os
+import tempfile
+
+from inference.engine import CLASS_NAMES
+from llm.fake_server import FakeOllama
+from llm.knowledge import KnowledgeStore, prewarm
+from llm.ollama import OllamaClient
+from llm.prompts import LANG_NAMES, prompt_version
+
+
+def test_persistence_and_versions():
+    print("Testing entries persist and are scoped to one prompt/model version...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "knowledge.sqlite3")
+        store = KnowledgeStore(path, prompt_version("qwen3:4b"))
+        assert store.get("Tomato_Early_blight", "en") is None
+        store.put("Tomato_Early_blight", "ta", {"symptoms": "இலைகளில் புள்ளிகள்"})
+        store.close()
+
+        reopened = KnowledgeStore(path, prompt_version("qwen3:4b"))
+        assert reopened.get("Tomato_Early_blight", "ta") == {"symptoms": "இலைகளில் புள்ளிகள்"}
+        assert reopened.missing(["Tomato_Early_blight"], ["en", "ta"]) == [("Tomato_Early_blight", "en")]
+        assert reopened.stats()["hits"] == 1 and reopened.stats()["entries"] == 1
+        reopened.close()
+
+        other_model = KnowledgeStore(path, prompt_version("llama3:8b"))
+        assert other_model.get("Tomato_Early_blight", "ta") is None
+        assert other_model.versions() == {prompt_version("qwen3:4b"): 1}
+        other_model.close()
+
+
+def test_prewarm_fills_every_combination():
+    print("Testing pre-warming walks every class and language once...")
+    with FakeOllama() as fake, tempfile.TemporaryDirectory() as tmp:
+        store = KnowledgeStore(os.path.join(tmp, "knowledge.sqlite3"), prompt_version("fake"))
+        client = OllamaClient(fake.url, model="fake")
+        generated, failed = prewarm(store, client, CLASS_NAMES)
+        total = len(CLASS_NAMES) * len(LANG_NAMES)
+        assert len(generated) == total and not failed
+        assert len(fake.prompts) == total
+        assert store.missing(CLASS_NAMES, LANG_NAMES) == []
+        assert store.get("Potato_Late_blight", "hi")["disease_type"] == "Fungal"
+
+        # A second run has nothing to do; --force regenerates
+        assert prewarm(store, client, CLASS_NAMES) == ([], [])
+        assert len(fake.prompts) == total
+        generated, _ = prewarm(store, client, ["Potato_Late_blight"], ["en"], force=True)
+        assert generated == [("Potato_Late_blight", "en")]
+
+
+def test_prewarm_reports_failures():
+    print("Testing unparseable replies are retried and then reported...")
+    with FakeOllama(reply="not json") as fake, tempfile.TemporaryDirectory() as tmp:
+        store = KnowledgeStore(os.path.join(tmp, "knowledge.sqlite3"), prompt_version("fake"))
+        generated, failed = prewarm(store, OllamaClient(fake.url), ["Tomato_healthy"], ["en"], retries=1)
+        assert generated == [] and failed == [("Tomato_healthy", "en")]
+        assert len(fake.prompts) == 2
+        assert store.stats()["entries"] == 0
+
+
+if __name__ == "__main__":
+    test_persistence_and_versions()
+    test_prewarm_fills_every_combination()
+    test_prewarm_reports_failures()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test the leaf pre-filter gate on synthetic leaves and non-leaf images
+"""
+
+import numpy as np
+
+from benchmark_leaf_gate import synthetic_negatives
+from inference.leaf_gate import LeafGate
+
+
+def leaf_photo(base, seed=0):
+    """A leaf-coloured ellipse with brown lesions on a grey-brown background"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:256, 0:256]
+    leaf = ((x - 128) ** 2 / 110 ** 2 + (y - 128) ** 2 / 70 ** 2) < 1
+    img = np.where(leaf[..., None], rng.normal(base, 20, (256, 256, 3)), rng.normal((120, 110, 100), 25, (256, 256, 3)))
+    img[rng.random((256, 256)) < 0.02] = (110, 70, 40)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def test_leaves_pass():
+    print("Testing healthy, diseased and chlorotic leaves pass the gate...")
+    gate = LeafGate()
+    for seed, base in enumerate([(60, 140, 50), (90, 120, 45), (170, 165, 60)]):
+        assert gate.check(leaf_photo(base, seed)) is None, base
+    assert gate.stats()["invokes_saved"] == 0
+
+
+def test_non_leaves_rejected():
+    print("Testing blank frames, soil, skin and screenshots are rejected...")
+    gate = LeafGate()
+    negatives = synthetic_negatives(count=8)
+    reasons = [gate.check(image)["reason"] for image in negatives]
+    print(f"Rejection reasons: {reasons}")
+    assert reasons[0] == "blank" and reasons[4] == "blank"
+    assert set(reasons[1:4]) == {"no_foliage"}
+
+    stats = gate.stats()
+    assert stats["checked"] == 8 and stats["invokes_saved"] == 8
+    assert stats["rejected_blank"] == 2 and stats["rejected_no_foliage"] == 6
+
+
+def test_threshold_is_tunable():
+    print("Testing the foliage threshold...")
+    sparse = leaf_photo((60, 140, 50))
+    sparse[:, 40:] = (120, 110, 100)  # only a sliver of leaf left in frame
+    assert LeafGate(min_foliage=0.02).check(sparse) is None
+    assert LeafGate(min_foliage=0.2).check(sparse)["reason"] == "no_foliage"
+
+
+if __name__ == "__main__":
+    test_leaves_pass()
+    test_non_leaves_rejected()
+    test_threshold_is_tunable()
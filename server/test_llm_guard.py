@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test the LLM guard: concurrency is capped, a full queue fails fast, and the
+circuit opens after repeated failures and closes again after a good trial
+"""
+
+import threading
+import time
+
+from llm.fake_server import DEFAULT_REPLY, FakeOllama
+from llm.guard import LLMCircuitOpen, LLMGuard, LLMOverloaded
+from llm.ollama import LLMError, LLMTimeout, OllamaClient
+
+
+def test_concurrency_and_fast_fail():
+    print("Testing calls beyond the concurrency cap queue, and beyond the queue fail fast...")
+    with FakeOllama(delay=0.4) as fake:
+        guard = LLMGuard(OllamaClient(fake.url), max_concurrent=2, max_queue=2, queue_timeout=5)
+        results = []
+        lock = threading.Lock()
+
+        def call():
+            start = time.perf_counter()
+            try:
+                outcome = guard.generate("hello")
+            except LLMOverloaded as e:
+                outcome = e
+            with lock:
+                results.append((outcome, time.perf_counter() - start))
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for t in threads:
+            t.start()
+            time.sleep(0.02)
+        for t in threads:
+            t.join()
+
+        answered = [elapsed for outcome, elapsed in results if outcome == DEFAULT_REPLY]
+        refused = [elapsed for outcome, elapsed in results if isinstance(outcome, LLMOverloaded)]
+        assert len(answered) == 4 and len(refused) == 2
+        assert max(refused) < 0.1  # refused at once, not after a timeout
+        assert len(fake.prompts) == 4
+        stats = guard.stats()["guard"]
+        assert stats["rejected"] == 2 and stats["active"] == 0 and stats["state"] == "closed"
+        assert stats["queue_wait_seconds"]["count"] == 4
+
+    print("Testing a queued call gives up after the queue timeout...")
+    release = threading.Event()
+
+    class Blocking:
+        def generate(self, prompt, format=None, options=None):
+            release.wait(5)
+            return "late"
+
+        def stats(self):
+            return {}
+
+    guard = LLMGuard(Blocking(), max_concurrent=1, max_queue=4, queue_timeout=0.1)
+    first = threading.Thread(target=guard.generate, args=("a",))
+    first.start()
+    time.sleep(0.05)
+    try:
+        guard.generate("b")
+        assert False, "expected the queue wait to time out"
+    except LLMOverloaded:
+        pass
+    release.set()
+    first.join()
+    assert guard.generate("c") == "late"
+
+
+def test_circuit_breaker():
+    print("Testing consecutive timeouts open the circuit and a good trial closes it...")
+    with FakeOllama(delay=0.3) as fake:
+        guard = LLMGuard(OllamaClient(fake.url, timeout=0.1), failure_threshold=2, cooldown=0.3)
+        for _ in range(2):
+            try:
+                guard.generate("slow")
+                assert False, "expected a timeout"
+            except LLMTimeout:
+                pass
+        assert guard.state() == "open"
+
+        start = time.perf_counter()
+        try:
+            guard.generate("skipped")
+            assert False, "expected the circuit to be open"
+        except LLMCircuitOpen:
+            assert time.perf_counter() - start < 0.05
+        assert len(fake.prompts) == 2
+
+        # After the cooldown one trial goes through; a failed trial reopens straight away
+        time.sleep(0.35)
+        assert guard.state() == "half_open"
+        try:
+            guard.generate("trial")
+        except LLMTimeout:
+            pass
+        assert guard.state() == "open" and guard.stats()["guard"]["circuit_opened"] == 2
+
+        time.sleep(0.35)
+        fake.delay = 0
+        assert guard.generate("trial") == DEFAULT_REPLY
+        assert guard.state() == "closed" and guard.stats()["guard"]["consecutive_failures"] == 0
+        assert guard.stats()["guard"]["short_circuited"] == 1
+
+    print("Testing errors from a streamed reply count as failures too...")
+
+    class Broken:
+        def stream(self, prompt, format=None, options=None):
+            yield "partial"
+            raise LLMError("ollama run exited with 1")
+
+        def stats(self):
+            return {}
+
+    guard = LLMGuard(Broken(), failure_threshold=1, cooldown=60)
+    try:
+        list(guard.stream("hello"))
+        assert False, "expected the stream to fail"
+    except LLMError:
+        pass
+    assert guard.state() == "open"
+
+
+if __name__ == "__main__":
+    test_concurrency_and_fast_fail()
+    test_circuit_breaker()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test stage timers, gauges and the Prometheus text exposition behind /metrics
+"""
+
+import time
+
+from utils.metrics import Counter, Gauge, Histogram, collect, render_prometheus
+
+
+class Component:
+    def __init__(self):
+        self.hits = Counter("test_hits_total", "Lookups answered")
+        self.wait = Histogram("test_wait_seconds", "Time waiting", buckets=(0.01, 0.1))
+        self.name = "not a metric"
+
+
+def test_stage_timer():
+    print("Testing Histogram.time() as a context manager and decorator...")
+    stage = Histogram("test_stage_seconds", buckets=(0.001, 1.0))
+    with stage.time():
+        time.sleep(0.002)
+
+    @stage.time()
+    def work(x):
+        return x * 2
+
+    assert work(2) == 4 and work(3) == 6
+    try:
+        with stage.time():
+            raise ValueError("failed stages are timed too")
+    except ValueError:
+        pass
+    snapshot = stage.snapshot()
+    assert snapshot["count"] == 4
+    assert snapshot["buckets"]["0.001"] == 3 and snapshot["sum"] >= 0.002
+
+
+def test_exposition_format():
+    print("Testing the text exposition...")
+    component = Component()
+    component.hits.inc(3)
+    component.wait.observe(0.05)
+    component.wait.observe(5)
+    depth = [2]
+    gauge = Gauge("test_queue_depth", "Items queued", lambda: depth[0])
+
+    duplicate = Counter("test_hits_total", "Same name from a replaced component")
+    metrics = collect(component, None, gauge, duplicate)
+    assert len(metrics) == 4
+    text = render_prometheus(metrics)
+    print(text)
+    lines = text.splitlines()
+    assert "# TYPE test_hits_total counter" in lines and "test_hits_total 3" in lines
+    assert lines.count("# TYPE test_hits_total counter") == 1  # first of a name wins
+    assert "# HELP test_queue_depth Items queued" in lines and "test_queue_depth 2" in lines
+    assert "# TYPE test_wait_seconds histogram" in lines
+    assert 'test_wait_seconds_bucket{le="0.01"} 0' in lines
+    assert 'test_wait_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_wait_seconds_bucket{le="+Inf"} 2' in lines
+    assert "test_wait_seconds_sum 5.05" in lines and "test_wait_seconds_count 2" in lines
+    assert text.endswith("\n")
+
+    depth[0] = 7  # gauges are read at scrape time
+    assert "test_queue_depth 7" in render_prometheus([gauge]).splitlines()
+
+
+def test_overhead():
+    print("Testing per-observation overhead stays negligible...")
+    stage = Histogram("test_overhead_seconds")
+    runs = 20000
+    start = time.perf_counter()
+    for _ in range(runs):
+        with stage.time():
+            pass
+    per_call = (time.perf_counter() - start) / runs
+    print(f"Timed stage overhead: {per_call * 1e6:.2f}us")
+    assert per_call < 50e-6
+    assert stage.snapshot()["count"] == runs
+
+
+if __name__ == "__main__":
+    test_stage_timer()
+    test_exposition_format()
+    test_overhead()
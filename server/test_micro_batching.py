@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test dynamic micro-batching with a stand-in interpreter that supports batch resizing
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from inference.pool import InterpreterPool, padded_batch_size
+from inference.batching import MicroBatcher
+
+
+class FakeBatchInterpreter:
+    """Scores each image by putting all its weight on class (pixel value % 15)"""
+
+    def __init__(self, model_path=None, num_threads=None):
+        self.shape = [1, 256, 256, 3]
+        self.invocations = []
+        self._input = np.zeros(self.shape, dtype=np.float32)
+
+    def allocate_tensors(self):
+        self._input = np.zeros(self.shape, dtype=np.float32)
+
+    def tensor(self, index):
+        return lambda: self._input
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = list(shape)
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array(self.shape), "dtype": np.float32}]
+
+    def get_output_details(self):
+        return [{"index": 1, "shape": np.array([self.shape[0], 15]), "dtype": np.float32}]
+
+    def invoke(self):
+        self.invocations.append(self.shape[0])
+        time.sleep(0.02)
+
+    def get_tensor(self, index):
+        out = np.zeros((self.shape[0], 15), dtype=np.float32)
+        for i in range(self.shape[0]):
+            out[i, int(round(self._input[i].flat[0] * 255)) % 15] = 1.0
+        return out
+
+
+def test_concurrent_requests_are_batched():
+    print("Testing micro-batching of concurrent requests...")
+    pool = InterpreterPool("model.tflite", FakeBatchInterpreter, size=1)
+    batcher = MicroBatcher(pool, max_batch_size=8, max_wait_ms=50)
+    results = {}
+
+    def worker(i):
+        image = np.full((256, 256, 3), i, dtype=np.uint8)
+        results[i] = int(np.argmax(batcher.predict(image, timeout=5)))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Every request must get its own result back, not a neighbour's
+    assert results == {i: i for i in range(12)}
+
+    stats = batcher.stats()
+    print(f"Batch size histogram: {stats['batch_size']}")
+    assert stats["batch_size"]["sum"] == 12
+    assert stats["batch_size"]["count"] < 12  # at least some requests shared an invoke
+
+
+def test_fixed_batch_model_falls_back():
+    print("Testing fallback for models with a fixed batch dimension...")
+
+    class FixedBatchInterpreter(FakeBatchInterpreter):
+        def resize_tensor_input(self, index, shape):
+            if shape[0] != 1:
+                raise ValueError("Cannot resize batch dimension")
+            super().resize_tensor_input(index, shape)
+
+    pool = InterpreterPool("model.tflite", FixedBatchInterpreter, size=1)
+    batcher = MicroBatcher(pool, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(np.full((256, 256, 3), i, dtype=np.uint8)) for i in range(4)]
+    assert [int(np.argmax(f.result(timeout=5))) for f in futures] == [0, 1, 2, 3]
+    assert batcher.stats()["batched_invoke"] is False
+
+
+def test_batches_padded_to_few_sizes():
+    print("Testing batches are padded so the input is only resized for a few batch sizes...")
+    assert [padded_batch_size(n) for n in range(1, 10)] == [1, 2, 4, 4, 8, 8, 8, 8, 16]
+    assert [padded_batch_size(n, limit=6) for n in range(1, 7)] == [1, 2, 4, 4, 6, 6]
+
+    pool = InterpreterPool("model.tflite", FakeBatchInterpreter, size=1)
+    for count in (5, 8, 6, 7, 5, 8):
+        images = [np.full((256, 256, 3), i, dtype=np.uint8) for i in range(count)]
+        assert [int(np.argmax(row)) for row in pool.run(images)] == list(range(count))
+    with pool.checkout() as interpreter:
+        assert interpreter.invocations == [8] * 6
+    # Batches of 5 to 8 images all run at 8, so the input is resized once, not on every new size
+    assert pool.stats()["resizes"] == 1
+
+    pool = InterpreterPool("model.tflite", FakeBatchInterpreter, size=1)
+    batcher = MicroBatcher(pool, max_batch_size=6, max_wait_ms=200)
+    futures = [batcher.submit(np.full((256, 256, 3), i, dtype=np.uint8)) for i in range(5)]
+    assert [int(np.argmax(f.result(timeout=5))) for f in futures] == list(range(5))
+    with pool.checkout() as interpreter:
+        assert interpreter.invocations == [6]
+    assert batcher.stats()["batch_size"]["sum"] == 5
+
+
+def test_timed_out_request_is_dropped():
+    print("Testing a timed-out request raises TimeoutError and is never run...")
+    pool = InterpreterPool("model.tflite", FakeBatchInterpreter, size=1)
+    batcher = MicroBatcher(pool, max_batch_size=1)
+    # Hold the only interpreter so both requests stay queued behind the first
+    with pool.checkout() as interpreter:
+        blocker = batcher.submit(np.full((256, 256, 3), 1, dtype=np.uint8))
+        try:
+            batcher.predict(np.full((256, 256, 3), 2, dtype=np.uint8), timeout=0.05)
+        except TimeoutError:
+            print("Timed out as expected")
+        else:
+            raise AssertionError("Expected TimeoutError")
+    assert int(np.argmax(blocker.result(timeout=5))) == 1
+    batcher.close()
+    time.sleep(0.1)
+    assert interpreter.invocations == [1]  # the cancelled request never reached the model
+
+
+def test_input_fill_does_not_allocate():
+    print("Testing input fill writes straight into the interpreter buffer...")
+    import tracemalloc
+
+    pool = InterpreterPool("model.tflite", FakeBatchInterpreter, size=1)
+    image = np.full((256, 256, 3), 200, dtype=np.uint8)
+    with pool.checkout() as interpreter:
+        pool.fill_input(interpreter, [image])  # warm up
+        tracemalloc.start()
+        pool.fill_input(interpreter, [image])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert np.allclose(interpreter._input[0], 200 / 255.0)
+    print(f"Peak allocation during fill: {peak} bytes")
+    assert peak < 64 * 1024  # a float32 copy of the image would be 768 KB
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_are_batched()
+    test_fixed_batch_model_falls_back()
+    test_batches_padded_to_few_sizes()
+    test_timed_out_request_is_dropped()
+    test_input_fill_does_not_allocate()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test hot model reload: atomic swap, in-flight requests finishing on the old
+version, failed reloads keeping the old version, and the model file watcher
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from inference.reload import FileWatcher, ModelSlot, ServingModel
+
+
+def test_swap_waits_for_in_flight_requests():
+    print("Testing swap while a request is in flight...")
+    closed = []
+    slot = ModelSlot("test")
+    slot.swap(ServingModel("v1", close=lambda: closed.append("v1")))
+
+    started = threading.Event()
+    finish = threading.Event()
+    served = []
+
+    def request():
+        with slot.use() as model:
+            started.set()
+            finish.wait(5)
+            served.append(model.version)
+
+    t = threading.Thread(target=request)
+    t.start()
+    started.wait(5)
+
+    slot.swap(ServingModel("v2", close=lambda: closed.append("v2")))
+    assert slot.version == "v2"
+    with slot.use() as model:
+        assert model.version == "v2"  # new requests get the new version straight away
+    assert closed == []  # v1 still has a request running
+    assert slot.stats()["draining_versions"] == 1
+
+    finish.set()
+    t.join()
+    assert served == ["v1"]
+    assert closed == ["v1"]
+    assert slot.stats()["draining_versions"] == 0
+
+
+def test_failed_reload_keeps_current_model():
+    print("Testing a reload whose warm-up fails...")
+    closed = []
+    slot = ModelSlot("test")
+    slot.reload(lambda: ServingModel("v1"))
+
+    def broken_warm_up(model):
+        raise RuntimeError("warm-up failed")
+
+    try:
+        slot.reload(lambda: ServingModel("v2", close=lambda: closed.append("v2")), warm_up=broken_warm_up)
+    except RuntimeError as e:
+        print(f"Reload failed as expected: {e}")
+    else:
+        raise AssertionError("Expected RuntimeError")
+    assert slot.version == "v1"
+    assert closed == ["v2"]  # the half-built replacement is released
+    stats = slot.stats()
+    assert stats["swaps"] == 1 and stats["reload_failures"] == 1
+    assert stats["last_reload"]["error"] == "warm-up failed"
+
+
+def test_file_watcher_reloads_after_change():
+    print("Testing the model file watcher...")
+    changes = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.tflite")
+        with open(path, "wb") as f:
+            f.write(b"v1")
+        watcher = FileWatcher([path], lambda: changes.append(time.monotonic()), interval=0.05)
+        try:
+            time.sleep(0.2)
+            assert changes == []
+            with open(path, "wb") as f:
+                f.write(b"version 2")
+            deadline = time.monotonic() + 5
+            while not changes and time.monotonic() < deadline:
+                time.sleep(0.05)
+            time.sleep(0.2)
+        finally:
+            watcher.stop()
+    assert len(changes) == 1
+
+
+if __name__ == "__main__":
+    test_swap_waits_for_in_flight_requests()
+    test_failed_reload_keeps_current_model()
+    test_file_watcher_reloads_after_change()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test the perceptual-hash near-duplicate cache and its multi-index lookup
+"""
+
+import io
+import random
+import time
+
+import numpy as np
+from PIL import Image
+
+from inference.near_dup import NearDuplicateCache, dhash
+from inference.preprocess import decode_leaf_image
+
+
+def leaf_like(seed):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:600, 0:800]
+    arr = np.stack([
+        60 + 40 * np.sin(x / rng.uniform(20, 80)),
+        140 + 60 * np.cos(y / rng.uniform(20, 80)),
+        50 + 30 * np.sin((x + y) / rng.uniform(20, 80)),
+    ], axis=-1)
+    return np.clip(arr, 0, 255).astype(np.uint8)
+
+
+def jpeg(arr, quality):
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def test_recompressed_photo_is_a_hit():
+    print("Testing recompressed copies hit the near-duplicate cache...")
+    cache = NearDuplicateCache(threshold=6)
+    original = leaf_like(1)
+    h = dhash(np.asarray(decode_leaf_image(jpeg(original, 95))))
+    cache.add(h, ("v1", "en"), {"predicted": "Potato_Early_blight"})
+
+    # WhatsApp-style recompression of the same photo
+    recompressed = dhash(np.asarray(decode_leaf_image(jpeg(original, 40))))
+    print(f"Hamming distance after recompression: {bin(h ^ recompressed).count('1')}")
+    assert cache.lookup(recompressed, ("v1", "en")) == {"predicted": "Potato_Early_blight"}
+
+    # Different scope (model version / language) or a different leaf must miss
+    assert cache.lookup(recompressed, ("v2", "en")) is None
+    other = dhash(np.asarray(decode_leaf_image(jpeg(leaf_like(2), 95))))
+    assert cache.lookup(other, ("v1", "en")) is None
+
+
+def test_index_matches_brute_force_at_scale():
+    print("Testing multi-index lookup against brute force with 200k entries...")
+    rng = random.Random(0)
+    threshold = 7
+    cache = NearDuplicateCache(threshold=threshold, max_entries=300000)
+    hashes = [rng.getrandbits(64) for _ in range(200000)]
+    for i, h in enumerate(hashes):
+        cache.add(h, "s", i)
+
+    queries = []
+    for _ in range(100):
+        base = rng.choice(hashes)
+        for bit in rng.sample(range(64), rng.randint(0, threshold + 2)):
+            base ^= 1 << bit
+        queries.append(base)
+
+    start = time.perf_counter()
+    found = [cache.lookup(q, "s") for q in queries]
+    per_lookup_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"Average lookup: {per_lookup_ms:.3f} ms")
+
+    table = np.array(hashes, dtype=np.uint64)
+    for q, result in zip(queries, found):
+        xor = (table ^ np.uint64(q)).view(np.uint8).reshape(-1, 8)
+        best = int(np.unpackbits(xor, axis=1).sum(axis=1).min())
+        if best <= threshold:
+            assert result is not None and bin(hashes[result] ^ q).count("1") == best
+        else:
+            assert result is None
+    assert per_lookup_ms < 5
+
+
+if __name__ == "__main__":
+    test_recompressed_photo_is_a_hit()
+    test_index_matches_brute_force_at_scale()
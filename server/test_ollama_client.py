@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test the Ollama REST client against the fake server: connection reuse,
+streaming, timeouts, errors and the CLI fallback
+"""
+
+import os
+import socket
+import sys
+
+from llm.fake_server import DEFAULT_REPLY, FakeOllama
+from llm.ollama import LLMError, LLMTimeout, LLMUnavailable, OllamaCLI, OllamaClient, load_client
+from llm.prompts import DISEASE_INFO_KEYS, disease_info_prompt, parse_json_reply
+
+FAKE_CLI = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm", "fake_server.py")]
+
+
+def unused_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_keep_alive_reuse():
+    print("Testing calls reuse one pooled connection...")
+    with FakeOllama() as fake:
+        client = OllamaClient(fake.url, model="fake")
+        prompt = disease_info_prompt("Tomato_Early_blight", "ta")
+        for _ in range(5):
+            info = parse_json_reply(client.generate(prompt))
+            assert set(info) == set(DISEASE_INFO_KEYS)
+        assert fake.connections == 1
+        assert fake.prompts[-1] == prompt and "Please respond in Tamil." in prompt
+        stats = client.stats()
+        assert stats["requests"] == 5 and stats["connections_opened"] == 1 and stats["connections_reused"] == 4
+        client.close()
+
+
+def test_streaming():
+    print("Testing a streamed reply arrives in chunks and frees its connection...")
+    with FakeOllama(chunk_size=20) as fake:
+        client = OllamaClient(fake.url)
+        chunks = list(client.stream("hello"))
+        assert len(chunks) > 1 and "".join(chunks) == DEFAULT_REPLY
+        assert client.generate("again") == DEFAULT_REPLY
+        assert fake.connections == 1
+
+        # Abandoning a stream part way closes its socket instead of pooling it half-read
+        stream = client.stream("hello")
+        next(stream)
+        stream.close()
+        assert client.stats()["idle_connections"] == 0
+        assert client.generate("after") == DEFAULT_REPLY
+        assert client.stats()["first_chunk_seconds"]["count"] == 2
+
+
+def test_timeouts_and_errors():
+    print("Testing timeouts, server errors and an unreachable server...")
+    with FakeOllama(delay=1.0) as fake:
+        client = OllamaClient(fake.url, timeout=0.2)
+        try:
+            client.generate("slow")
+            assert False, "expected a timeout"
+        except LLMTimeout:
+            pass
+        fake.delay = 0
+        fake.status = 500
+        try:
+            client.generate("broken")
+            assert False, "expected an error"
+        except LLMError as e:
+            assert "500" in str(e) and "fake failure" in str(e)
+        assert client.stats()["failures"] == 2
+
+    try:
+        OllamaClient(f"http://127.0.0.1:{unused_port()}").generate("anyone?")
+        assert False, "expected the server to be unreachable"
+    except LLMUnavailable:
+        pass
+
+
+def test_broken_replies():
+    print("Testing unreadable replies raise LLMError and their sockets are dropped...")
+    with FakeOllama() as fake:
+        client = OllamaClient(fake.url, model="fake")
+        for fault in ("bad_json", "truncated", "reset", "bad_headers"):
+            fake.fault = fault
+            for call in (client.generate, lambda prompt: "".join(client.stream(prompt))):
+                try:
+                    call("hello")
+                    assert False, f"expected LLMError for {fault}"
+                except LLMError as e:
+                    assert not isinstance(e, LLMUnavailable)
+                assert client.stats()["idle_connections"] == 0
+        assert client.stats()["failures"] == 8
+
+        # The next call opens a fresh connection and succeeds
+        fake.fault = None
+        assert client.generate("hello") == DEFAULT_REPLY
+        assert "".join(client.stream("hello")) == DEFAULT_REPLY
+
+
+def test_cli_fallback():
+    print("Testing the CLI answers when the server is down...")
+    client = load_client(f"http://127.0.0.1:{unused_port()}", model="fake", bin=FAKE_CLI, timeout=30)
+    assert client.generate("hello") == DEFAULT_REPLY
+    assert "".join(client.stream("hello")).strip() == DEFAULT_REPLY
+    assert client.stats()["fallbacks"] == 2
+
+    cli = OllamaCLI([sys.executable, "-c", "import sys; sys.exit(3)"])
+    try:
+        cli.generate("hello")
+        assert False, "expected the CLI to fail"
+    except LLMError:
+        assert cli.stats()["failures"] == 1
+
+
+if __name__ == "__main__":
+    test_keep_alive_reuse()
+    test_streaming()
+    test_timeouts_and_errors()
+    test_broken_replies()
+    test_cli_fallback()
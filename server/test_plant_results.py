@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test the plantResults.json index: records match the model's class names
+despite their irregular spelling, details are per language, and hits and
+misses are counted
+"""
+
+import json
+import os
+import tempfile
+
+from inference.engine import CLASS_NAMES
+from llm.plant_results import PlantResultsIndex
+
+RECORDS = [
+    {"plant_en": "Tomato", "plant_hi": "टमाटर", "disease": "Early blight",
+     "disease_type_en": "Fungal", "symptoms_en": "Concentric rings on old leaves", "prevention_en": "Crop rotation",
+     "symptoms_hi": "पुरानी पत्तियों पर छल्ले", "prevention_hi": None},
+    {"plant": "Tomato", "disease": "Tomato Yellow Leaf Curl Virus", "symptoms": "Curled yellow leaves"},
+    {"plant": "Tomato", "disease": "Target Spot", "symptoms": "Brown target-like spots"},
+    {"plant": "Pepper, bell", "disease": "Healthy", "symptoms": "None"},
+    {"plant": "Potato", "disease": "Late blight", "lang": "ta", "symptoms": "இலைகளில் கருமை"},
+    {"class_name": "Tomato_Leaf_Mold", "symptoms": "Olive mould under leaves"},
+    # A second record for the same disease only fills fields the first left out
+    {"plant": "Tomato", "disease": "early_blight", "symptoms_en": "ignored", "treatments_en": "Copper fungicide"},
+]
+
+
+def load(records):
+    tmp = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8")
+    with tmp:
+        json.dump(records, tmp, ensure_ascii=False)
+    try:
+        return PlantResultsIndex(tmp.name)
+    finally:
+        os.unlink(tmp.name)
+
+
+def test_class_names_match_records():
+    print("Testing model class names resolve to their plantResults records...")
+    index = load(RECORDS)
+    assert index.get("Tomato_Early_blight", "en") == {
+        "disease_type": "Fungal", "symptoms": "Concentric rings on old leaves",
+        "prevention": "Crop rotation", "treatments": "Copper fungicide"
+    }
+    assert index.get("TomatoTomato_YellowLeafCurl_Virus", "en") == {"symptoms": "Curled yellow leaves"}
+    assert index.get("TomatoTarget_Spot", "en") == {"symptoms": "Brown target-like spots"}
+    assert index.get("Pepperbell_healthy", "en") == {"symptoms": "None"}
+    assert index.get("Tomato_Leaf_Mold", "en") == {"symptoms": "Olive mould under leaves"}
+    assert index.get("Tomato_Late_blight", "en") is None
+    assert all(name in CLASS_NAMES for name in ("Tomato_Early_blight", "TomatoTomato_YellowLeafCurl_Virus",
+                                                "TomatoTarget_Spot", "Pepperbell_healthy", "Tomato_Leaf_Mold"))
+
+
+def test_languages_and_hit_ratio():
+    print("Testing details are per language and the hit ratio is reported...")
+    index = load(RECORDS)
+    assert index.get("Tomato_Early_blight", "hi") == {"symptoms": "पुरानी पत्तियों पर छल्ले"}
+    assert index.get("Potato_Late_blight", "ta") == {"symptoms": "இலைகளில் கருமை"}
+    assert index.get("Potato_Late_blight", "en") is None  # the record is only in Tamil
+    assert index.get("Tomato_Early_blight", "gu") is None
+    stats = index.stats()
+    assert stats["records"] == len(RECORDS) and stats["hits"] == 2 and stats["misses"] == 2
+    assert stats["hit_ratio"] == 0.5
+
+
+if __name__ == "__main__":
+    test_class_names_match_records()
+    test_languages_and_hit_ratio()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed prediction cache (LRU eviction, TTL expiry, counters)
+"""
+
+import time
+
+from inference.cache import PredictionCache
+
+
+def test_hit_miss_and_isolation():
+    print("Testing cache hits, misses and key isolation...")
+    cache = PredictionCache(max_entries=10, ttl_seconds=60)
+    key = cache.make_key(b"leaf-photo", "v1", "en")
+    assert cache.get(key) is None
+
+    cache.put(key, {"predicted": "Tomato_Late_blight", "top3": []})
+    hit = cache.get(key)
+    assert hit["predicted"] == "Tomato_Late_blight"
+
+    # Mutating a returned response must not corrupt the cached one
+    hit["predicted"] = "changed"
+    assert cache.get(key)["predicted"] == "Tomato_Late_blight"
+
+    # Same bytes under a different model version or language is a different entry
+    assert cache.get(cache.make_key(b"leaf-photo", "v2", "en")) is None
+    assert cache.get(cache.make_key(b"leaf-photo", "v1", "hi")) is None
+
+    stats = cache.stats()
+    print(f"Cache stats: {stats}")
+    assert stats["hits"] == 2
+    assert stats["misses"] == 3
+
+
+def test_lru_eviction_and_ttl():
+    print("Testing LRU eviction and TTL expiry...")
+    cache = PredictionCache(max_entries=2, ttl_seconds=0.05)
+    a, b, c = (cache.make_key(x, "v1", "en") for x in (b"a", b"b", b"c"))
+    cache.put(a, {"n": 1})
+    cache.put(b, {"n": 2})
+    cache.get(a)  # a is now most recently used
+    cache.put(c, {"n": 3})  # evicts b
+    assert cache.get(b) is None
+    assert cache.get(a) == {"n": 1}
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.06)
+    assert cache.get(a) is None
+    assert cache.stats()["expirations"] == 1
+
+
+if __name__ == "__main__":
+    test_hit_miss_and_isolation()
+    test_lru_eviction_and_ttl()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test /healthz/ready and / through the Flask test client while the disease
+model is loading, after it failed to load, and once it is loaded and warm
+"""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import app as flask_app
+from inference.reload import ModelSlot, ServingModel
+
+client = flask_app.app.test_client()
+
+
+@contextmanager
+def startup_state(state, error=None, model=None):
+    """Put the app in a startup state, with `model` (or nothing) in the disease slot, then restore it"""
+    flask_app.model_ready.wait()  # let the real background load finish first
+    slot, status = flask_app.disease_slot, dict(flask_app.warmup_status)
+    flask_app.disease_slot = ModelSlot("disease")
+    if model is not None:
+        flask_app.disease_slot.swap(model)
+    flask_app.warmup_status.update(state=state, error=error, load_ms=None if state == "loading" else 1234.5)
+    if state == "loading":
+        flask_app.model_ready.clear()
+    try:
+        yield
+    finally:
+        flask_app.model_ready.set()
+        flask_app.disease_slot = slot
+        flask_app.warmup_status.update(status)
+
+
+def test_loading():
+    print("Testing readiness while the model is still loading...")
+    with startup_state("loading"):
+        response = client.get("/healthz/ready")
+        payload = response.get_json()
+        assert response.status_code == 503
+        assert payload["ready"] is False and payload["state"] == "loading" and payload["load_ms"] is None
+        assert payload["model_version"] is None
+
+        response = client.get("/")
+        assert response.status_code == 503
+        assert "still loading" in response.get_data(as_text=True)
+
+
+def test_failed():
+    print("Testing readiness after the model failed to load...")
+    with startup_state("failed", error="Model file not found at model/plant_leaf_diseases_model.tflite"):
+        response = client.get("/healthz/ready")
+        payload = response.get_json()
+        assert response.status_code == 503
+        assert payload["ready"] is False and payload["state"] == "failed"
+        assert payload["error"] == "Model file not found at model/plant_leaf_diseases_model.tflite"
+
+        response = client.get("/")
+        assert response.status_code == 503
+        text = response.get_data(as_text=True)
+        assert "failed to load" in text and "Model file not found" in text
+
+
+def test_ready():
+    print("Testing readiness once the model is loaded and warm...")
+    model = ServingModel(
+        "abc123",
+        engine=SimpleNamespace(backend=SimpleNamespace(name="tflite")),
+        warmup={"cold_latency_ms": 80.0, "warm_latency_ms": 12.5, "warmup_runs": 3}
+    )
+    with startup_state("ready", model=model):
+        response = client.get("/healthz/ready")
+        payload = response.get_json()
+        assert response.status_code == 200
+        assert payload["ready"] is True and payload["state"] == "ready"
+        assert payload["model_version"] == "abc123" and payload["backend"] == "tflite"
+        assert payload["warm_latency_ms"] == 12.5 and payload["warmup_runs"] == 3
+
+        response = client.get("/")
+        assert response.status_code == 200
+        assert response.get_data(as_text=True) == "AI Backend is Running"
+
+
+if __name__ == "__main__":
+    test_loading()
+    test_failed()
+    test_ready()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test single-flight coalescing: concurrent identical prompts share one call
+to the fake Ollama server, different keys don't, errors reach every waiter,
+and streamed calls fan out to every caller
+"""
+
+import threading
+import time
+
+from llm.fake_server import FakeOllama
+from llm.ollama import LLMError, OllamaClient
+from llm.prompts import disease_info_prompt, parse_json_reply
+from llm.singleflight import SingleFlight
+
+
+def run_concurrently(count, fn):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = fn(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_identical_prompts_share_one_call():
+    print("Testing 8 concurrent identical prompts send Ollama one request...")
+    with FakeOllama(delay=0.3) as fake:
+        client = OllamaClient(fake.url, model="fake")
+        flights = SingleFlight()
+
+        def ask(predicted, lang):
+            return parse_json_reply(client.generate(disease_info_prompt(predicted, lang)))
+
+        results = run_concurrently(8, lambda i: flights.do(("fake", "Tomato_Late_blight", "en"), ask, "Tomato_Late_blight", "en"))
+        assert len(fake.prompts) == 1
+        assert all(r == results[0] and r["disease_type"] == "Fungal" for r in results)
+        stats = flights.stats()
+        assert stats["calls"] == 1 and stats["coalesced"] == 7 and stats["in_flight"] == 0
+
+        # Once the call has returned the next one runs again; nothing is cached
+        flights.do(("fake", "Tomato_Late_blight", "en"), ask, "Tomato_Late_blight", "en")
+        assert len(fake.prompts) == 2
+
+
+def test_different_keys_run_separately():
+    print("Testing different classes and languages are not coalesced...")
+    with FakeOllama(delay=0.2) as fake:
+        client = OllamaClient(fake.url, model="fake")
+        flights = SingleFlight()
+        keys = [("Tomato_Late_blight", "en"), ("Tomato_Late_blight", "hi"), ("Potato_Early_blight", "en")] * 2
+        run_concurrently(6, lambda i: flights.do(("fake",) + keys[i], client.generate, disease_info_prompt(*keys[i])))
+        assert len(fake.prompts) == 3
+        assert flights.stats()["calls"] == 3 and flights.stats()["coalesced"] == 3
+
+
+def test_errors_reach_every_waiter():
+    print("Testing a failed call raises in every coalesced caller...")
+    flights = SingleFlight()
+
+    def failing():
+        time.sleep(0.2)
+        raise LLMError("Ollama returned 500")
+
+    results = run_concurrently(4, lambda i: flights.do("key", failing))
+    assert all(isinstance(r, LLMError) for r in results)
+    assert flights.stats()["calls"] == 1 and flights.stats()["coalesced"] == 3
+    assert flights.do("key", lambda: "recovered") == "recovered"
+
+
+def test_streams_fan_out_to_every_caller():
+    print("Testing concurrent identical streams share one upstream stream...")
+    flights = SingleFlight()
+    started = []
+
+    def chunks():
+        started.append(1)
+        for i in range(5):
+            time.sleep(0.05)
+            yield f"chunk{i}"
+        return "result"
+
+    def consume(i):
+        # Staggered, so later callers join mid-stream and still get it from the start
+        time.sleep(i * 0.04)
+        stream = flights.stream("key", chunks)
+        items = []
+        while True:
+            try:
+                items.append(next(stream))
+            except StopIteration as done:
+                return items, done.value
+
+    results = run_concurrently(4, consume)
+    assert len(started) == 1
+    assert all(r == ([f"chunk{i}" for i in range(5)], "result") for r in results)
+    assert flights.stats()["calls"] == 1 and flights.stats()["coalesced"] == 3 and flights.stats()["in_flight"] == 0
+
+
+def test_streams_and_plain_calls_share_a_key():
+    print("Testing plain and streamed calls with the same key coalesce both ways...")
+    flights = SingleFlight()
+
+    def slow_result():
+        time.sleep(0.2)
+        return "plain"
+
+    def chunks():
+        time.sleep(0.2)
+        yield "chunk"
+        return "streamed"
+
+    def replay(result):
+        yield f"replayed {result}"
+
+    def plain_first(i):
+        if i == 0:
+            return flights.do("key", slow_result)
+        time.sleep(0.05)
+        return list(flights.stream("key", chunks, replay=replay))
+
+    def stream_first(i):
+        if i == 0:
+            return list(flights.stream("key", chunks))
+        time.sleep(0.05)
+        return flights.do("key", slow_result)
+
+    # A stream joining a plain call gets its result replayed; a plain call joining a stream gets its result
+    assert run_concurrently(2, plain_first) == ["plain", ["replayed plain"]]
+    assert run_concurrently(2, stream_first) == [["chunk"], "streamed"]
+    assert flights.stats()["calls"] == 2 and flights.stats()["coalesced"] == 2
+
+
+def test_stream_errors_reach_every_caller():
+    print("Testing a failed stream raises in every caller after the items so far...")
+    flights = SingleFlight()
+
+    def failing():
+        yield "partial"
+        time.sleep(0.2)
+        raise LLMError("Ollama stream broke")
+
+    def consume(i):
+        items = []
+        try:
+            for item in flights.stream("key", failing):
+                items.append(item)
+        except LLMError:
+            return items
+        raise AssertionError("Expected LLMError")
+
+    assert run_concurrently(3, consume) == [["partial"]] * 3
+    assert flights.stats()["in_flight"] == 0
+
+
+if __name__ == "__main__":
+    test_identical_prompts_share_one_call()
+    test_different_keys_run_separately()
+    test_errors_reach_every_waiter()
+    test_streams_fan_out_to_every_caller()
+    test_streams_and_plain_calls_share_a_key()
+    test_stream_errors_reach_every_caller()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test the incremental JSON parser: any chunking of a reply gives the same
+object as json.loads, string fields arrive as deltas before they complete,
+and a streamed reply from the fake Ollama server is parsed on the fly
+"""
+
+import json
+import random
+
+from llm.fake_server import DEFAULT_REPLY, FakeOllama
+from llm.ollama import OllamaClient
+from llm.prompts import DISEASE_INFO_KEYS
+from llm.stream_json import JSONStreamParser
+
+TRICKY = json.dumps({
+    "disease_type": "Fungal",
+    "symptoms": "Spots \"ringed\" like a target\nthen yellowing \\ wilting",
+    "treatments": "पत्तियों को हटा दें 🍅 and spray",
+    "key with spaces": "ok",
+    "severity": 3.5,
+    "stages": [{"name": "early", "days": [1, 2]}, "late, \"wet\""],
+    "organic": True,
+    "notes": None,
+}, ensure_ascii=True)
+
+
+def parse_in_chunks(text, sizes):
+    parser = JSONStreamParser()
+    events = []
+    pos = 0
+    for size in sizes:
+        events += parser.feed(text[pos:pos + size])
+        pos += size
+    events += parser.feed(text[pos:])
+    return parser, events
+
+
+def test_any_chunking_matches_json_loads():
+    print("Testing every chunking gives the json.loads result, escapes included...")
+    expected = json.loads(TRICKY)
+    rng = random.Random(0)
+    for _ in range(200):
+        sizes = [rng.randint(1, 12) for _ in range(len(TRICKY))]
+        parser, events = parse_in_chunks("Sure! Here is the JSON:\n" + TRICKY + "\nHope this helps", sizes)
+        assert parser.done and parser.finish() == expected
+        fields = {key: value for kind, key, value in events if kind == "field"}
+        assert fields == expected and list(fields) == list(expected)
+        for key, value in expected.items():
+            deltas = "".join(text for kind, k, text in events if kind == "delta" and k == key)
+            assert deltas == (value if isinstance(value, str) else "")
+
+
+def test_deltas_arrive_before_the_field_completes():
+    print("Testing a field's text is reported before its closing quote arrives...")
+    parser = JSONStreamParser()
+    assert parser.feed('{"symptoms": "Dark concentric') == [("delta", "symptoms", "Dark concentric")]
+    assert parser.feed(" spots") == [("delta", "symptoms", " spots")]
+    assert parser.feed('", "disease') == [("field", "symptoms", "Dark concentric spots")]
+    assert not parser.done
+    try:
+        parser.finish()
+        assert False, "expected an incomplete reply"
+    except ValueError:
+        pass
+
+
+def test_stream_from_fake_ollama():
+    print("Testing a streamed fake Ollama reply is parsed as it arrives...")
+    with FakeOllama(chunk_size=7) as fake:
+        parser = JSONStreamParser()
+        first_field_at = None
+        chunks = 0
+        for chunk in OllamaClient(fake.url).stream("hello"):
+            chunks += 1
+            if any(kind == "field" for kind, _, _ in parser.feed(chunk)) and first_field_at is None:
+                first_field_at = chunks
+        assert parser.finish() == json.loads(DEFAULT_REPLY)
+        assert list(parser.result) == list(DISEASE_INFO_KEYS)
+        assert first_field_at < chunks / 4
+
+
+if __name__ == "__main__":
+    test_any_chunking_matches_json_loads()
+    test_deltas_arrive_before_the_field_completes()
+    test_stream_from_fake_ollama()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test tiled multi-leaf inference: tile coverage, leafless tiles skipped before
+the model, and one diseased leaf deciding the verdict for a wide photo
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from inference.engine import CLASS_NAMES
+from inference.preprocess import ImageTooLarge, decode_leaf_image_fit
+from inference.tiling import TiledPredictor, tile_boxes
+from test_leaf_gate import leaf_photo
+
+HEALTHY = CLASS_NAMES.index("Tomato_healthy")
+LATE_BLIGHT = CLASS_NAMES.index("Tomato_Late_blight")
+
+
+def fake_scores(tiles):
+    """Stand-in model: brown-spotted tiles are late blight, everything else healthy"""
+    scores = np.zeros((len(tiles), len(CLASS_NAMES)), dtype=np.float32)
+    for i, (_, pixels) in enumerate(tiles):
+        red = pixels[..., 0].mean() > pixels[..., 1].mean()
+        scores[i, LATE_BLIGHT if red else HEALTHY] = 0.9
+        scores[i, HEALTHY if red else LATE_BLIGHT] = 0.1
+    return scores
+
+
+def test_tiles_cover_image():
+    print("Testing tile layout...")
+    boxes, rows, cols = tile_boxes(1024, 768, (256, 256), overlap=0.25)
+    assert (rows, cols) == (4, 5) and len(boxes) == 20
+    covered = np.zeros((768, 1024), dtype=bool)
+    for left, top, right, bottom in boxes:
+        assert right <= 1024 and bottom <= 768
+        covered[top:bottom, left:right] = True
+    assert covered.all()
+    assert tile_boxes(256, 256)[0] == [(0, 0, 256, 256)]
+
+
+def test_wide_photo_verdict_and_map():
+    print("Testing a wide photo with one diseased leaf among healthy ones...")
+    # A row of three leaves across bare soil, the right-hand one covered in brown lesions
+    photo = np.empty((768, 1024, 3), dtype=np.uint8)
+    photo[:] = np.clip(np.array((115, 85, 60)) * np.random.default_rng(0).normal(1, 0.1, (768, 1024, 1)), 0, 255)
+    photo[256:512, 0:256] = leaf_photo((60, 140, 50), 1)
+    photo[256:512, 384:640] = leaf_photo((60, 140, 50), 2)
+    sick = leaf_photo((60, 140, 50), 3)
+    sick[64:192, 48:208] = (140, 90, 40)
+    photo[256:512, 768:1024] = sick
+
+    buf = io.BytesIO()
+    Image.fromarray(photo).save(buf, format="PNG")
+    image = np.asarray(decode_leaf_image_fit(buf.getvalue(), max_side=1024))
+    assert image.shape == (768, 1024, 3)
+
+    tiler = TiledPredictor((256, 256), overlap=0.25)
+    tiles, grid = tiler.split(image)
+    assert (grid["rows"], grid["cols"]) == (4, 5)
+    skipped = [cell for cell in grid["cells"] if "skipped" in cell]
+    print(f"{len(tiles)} leaf tiles, {len(skipped)} skipped")
+    assert skipped and tiles  # bare soil never reaches the model
+
+    response = tiler.aggregate(tiles, grid, fake_scores(tiles))
+    assert response["predicted"] == "Tomato_Late_blight"
+    assert not response["prediction_details"]["is_healthy"]
+    tiling = response["tiling"]
+    assert tiling["leaf_tiles"] == len(tiles) and tiling["skipped_tiles"] == len(skipped)
+    assert 0 < tiling["affected_tiles"] < tiling["leaf_tiles"]
+    assert tiling["diseases"] == {"Tomato_Late_blight": tiling["affected_tiles"]}
+    assert all("predicted" in cell for cell in tiling["map"]["cells"] if "skipped" not in cell)
+    assert tiler.stats()["skipped_tiles"] == len(skipped)
+
+
+def test_healthy_photo_and_small_image():
+    print("Testing an all-healthy photo and an image smaller than one tile...")
+    tiler = TiledPredictor((256, 256))
+    small = Image.fromarray(leaf_photo((60, 140, 50))).resize((200, 120))
+    buf = io.BytesIO()
+    small.save(buf, format="JPEG")
+    image = np.asarray(decode_leaf_image_fit(buf.getvalue(), max_side=1024))
+    assert min(image.shape[:2]) == 256  # scaled up so at least one full tile fits
+    tiles, grid = tiler.split(image)
+    response = tiler.aggregate(tiles, grid, fake_scores(tiles))
+    assert response["predicted"] == "Tomato_healthy"
+    assert response["tiling"]["affected_tiles"] == 0
+
+
+def test_elongated_images_are_refused():
+    print("Testing strip-shaped images and tile counts past the cap are refused before decoding...")
+    for width, height in ((600, 1), (20000, 1), (1, 5000)):
+        buf = io.BytesIO()
+        Image.new("RGB", (width, height), (60, 140, 50)).save(buf, format="PNG")
+        try:
+            decode_leaf_image_fit(buf.getvalue(), max_side=1024)
+            assert False, f"expected {width}x{height} to be refused"
+        except ImageTooLarge as e:
+            assert "aspect ratio" in str(e)
+
+    # Within the aspect limit, but the resized size passes the pixel limit
+    buf = io.BytesIO()
+    Image.new("RGB", (1000, 800), (60, 140, 50)).save(buf, format="PNG")
+    try:
+        decode_leaf_image_fit(buf.getvalue(), max_side=4096, min_side=1024, max_pixels=1_000_000)
+        assert False, "expected the resized size to pass the pixel limit"
+    except ImageTooLarge:
+        pass
+    # A 4:1 panorama still fits: 1024x256
+    buf = io.BytesIO()
+    Image.new("RGB", (2000, 500), (60, 140, 50)).save(buf, format="PNG")
+    assert decode_leaf_image_fit(buf.getvalue(), max_side=1024).size == (1024, 256)
+
+    try:
+        tile_boxes(4096, 4096, (256, 256), max_tiles=64)
+        assert False, "expected too many tiles"
+    except ImageTooLarge:
+        pass
+    try:
+        TiledPredictor((256, 256), max_tiles=4).split(np.zeros((512, 1024, 3), dtype=np.uint8))
+        assert False, "expected too many tiles"
+    except ImageTooLarge:
+        pass
+
+
+if __name__ == "__main__":
+    test_tiles_cover_image()
+    test_wide_photo_verdict_and_map()
+    test_healthy_photo_and_small_image()
+    test_elongated_images_are_refused()
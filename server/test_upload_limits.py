@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test size-bounded upload ingestion: byte and pixel limits, and flat peak memory
+under a flood of large uploads (measured in a fresh process via /proc VmHWM)
+"""
+
+import io
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from inference.cache import image_digest
+from inference.preprocess import ImageTooLarge, InvalidImage, decode_leaf_image
+from inference.upload import Upload, UploadTooLarge, read_upload
+
+
+def png_header_only(width, height):
+    """A PNG that declares `width` x `height` but carries almost no pixel data"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"\x00" * 64)) + chunk(b"IEND", b"")
+
+
+def test_byte_limit_and_digest():
+    print("Testing upload byte limit, spooling and digest...")
+    data = os.urandom(300 * 1024)
+    with read_upload(io.BytesIO(data), max_bytes=len(data), spool_bytes=64 * 1024) as upload:
+        assert upload.size == len(data)
+        assert upload.spilled  # past spool_bytes the upload lives in a temp file
+        assert upload.digest == image_digest(data)
+        assert upload.read() == data
+
+    try:
+        read_upload(io.BytesIO(data), max_bytes=len(data) - 1)
+    except UploadTooLarge as e:
+        print(f"Rejected as expected: {e}")
+    else:
+        raise AssertionError("Expected UploadTooLarge")
+
+
+def test_pixel_limit_checked_before_decode():
+    print("Testing pixel limit from the image header...")
+    for width, height in [(12000, 12000), (60000, 60000)]:
+        bomb = png_header_only(width, height)
+        start = time.perf_counter()
+        try:
+            decode_leaf_image(bomb, max_pixels=50_000_000)
+        except ImageTooLarge as e:
+            print(f"{width}x{height} ({len(bomb)} bytes) rejected in {(time.perf_counter() - start) * 1000:.1f}ms: {e}")
+        else:
+            raise AssertionError("Expected ImageTooLarge")
+        assert isinstance(ImageTooLarge(), InvalidImage)
+
+    # Images within the limit still decode, from a file object as well as bytes
+    buf = io.BytesIO()
+    Image.fromarray(np.zeros((600, 800, 3), dtype=np.uint8)).save(buf, format="PNG")
+    upload = Upload()
+    upload.write(buf.getvalue())
+    assert decode_leaf_image(upload.open(), max_pixels=800 * 600).size == (256, 256)
+
+
+# Runs in the child process; prints the peak RSS growth in MB of one ingestion mode
+FLOOD_CHILD_SCRIPT = r"""
+import sys, threading
+sys.path.insert(0, sys.argv[2])
+from inference.preprocess import InvalidImage, decode_leaf_image
+from inference.upload import UploadTooLarge, read_upload
+
+MB = 1024 * 1024
+
+class GeneratedStream:
+    # Produces `size` bytes on demand so the test data itself takes no memory
+    def __init__(self, size, head=b""):
+        self.remaining = size
+        self.head = memoryview(head)
+        self.pos = 0
+    def read(self, n=-1):
+        if self.pos < len(self.head):
+            end = len(self.head) if n < 0 else self.pos + n
+            out = self.head[self.pos:end].tobytes()
+            self.pos += len(out)
+            return out
+        n = self.remaining if n < 0 else min(n, self.remaining)
+        self.remaining -= n
+        return b"\x5a" * n
+
+def peak_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+with open(sys.argv[3], "rb") as f:
+    photo = f.read()
+
+def naive(stream):
+    data = stream.read()
+    try:
+        decode_leaf_image(data)
+    except InvalidImage:
+        pass
+
+def bounded(stream):
+    try:
+        with read_upload(stream, max_bytes=20 * MB, spool_bytes=MB) as upload:
+            decode_leaf_image(upload.open(), max_pixels=50_000_000)
+    except (UploadTooLarge, InvalidImage):
+        pass
+
+ingest = naive if sys.argv[1] == "naive" else bounded
+# Warm up code paths before taking the baseline
+ingest(GeneratedStream(0, photo))
+base = peak_mb()
+
+def client(i):
+    for j in range(3):
+        # Oversized junk uploads mixed with real 12 MP photos
+        ingest(GeneratedStream(50 * MB) if (i + j) % 2 else GeneratedStream(0, photo))
+
+threads = [threading.Thread(target=client, args=(i,)) for i in range(8)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+print(peak_mb() - base)
+"""
+
+
+def flood_peak_mb(mode, photo_path):
+    proc = subprocess.run(
+        [sys.executable, "-c", FLOOD_CHILD_SCRIPT, mode, os.path.dirname(os.path.abspath(__file__)), photo_path],
+        capture_output=True, text=True, timeout=300
+    )
+    assert proc.returncode == 0, proc.stderr
+    return float(proc.stdout.strip())
+
+
+def test_memory_stays_flat_under_upload_flood():
+    if not os.path.exists("/proc/self/status"):
+        print("No /proc, skipping peak RSS test")
+        return
+    print("Testing peak RSS under a flood of large uploads (8 clients x 3 uploads)...")
+    # A noisy 12 MP JPEG (~14 MB), written once and read by each child
+    rng = np.random.default_rng(0)
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        Image.fromarray(rng.integers(0, 255, (3000, 4000, 3), dtype=np.uint8)).save(f, format="JPEG", quality=95)
+    try:
+        naive = flood_peak_mb("naive", f.name)
+        bounded = flood_peak_mb("bounded", f.name)
+    finally:
+        os.remove(f.name)
+    print(f"Peak RSS growth: read() whole upload {naive:.1f} MB, bounded ingestion {bounded:.1f} MB")
+    assert bounded < 64
+    assert bounded < naive / 4
+
+
+if __name__ == "__main__":
+    test_byte_limit_and_digest()
+    test_pixel_limit_checked_before_decode()
+    test_memory_stays_flat_under_upload_flood()
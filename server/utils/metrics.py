@@ -0,0 +1,128 @@
+import bisect
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+# Latency buckets in seconds, tuned for image inference on CPU
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter"""
+
+    def __init__(self, name, description=""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+class Histogram:
+    """Thread-safe histogram of observed values with fixed upper-bound buckets"""
+
+    def __init__(self, name, description="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Return cumulative bucket counts plus count/sum/mean"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+            count = self._count
+        cumulative = {}
+        running = 0
+        for bound, c in zip(self.buckets, counts):
+            running += c
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = running + counts[-1]
+        return {
+            "count": count,
+            "sum": total,
+            "mean": (total / count) if count else 0.0,
+            "buckets": cumulative,
+        }
+
+    @contextmanager
+    def time(self):
+        """Observe the wall time of a `with` block (also usable as a decorator)"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start)
+
+
+class Gauge:
+    """Current value read from a callback when metrics are collected, e.g. a queue depth"""
+
+    def __init__(self, name, description="", read=None):
+        self.name = name
+        self.description = description
+        self._read = read or (lambda: 0)
+
+    @property
+    def value(self):
+        return self._read()
+
+
+def collect(*sources):
+    """Metrics held as attributes of `sources` (objects or modules, None is skipped), plus metrics passed directly"""
+    metrics = []
+    for source in sources:
+        if source is None:
+            continue
+        if isinstance(source, (Counter, Histogram, Gauge)):
+            metrics.append(source)
+        else:
+            metrics.extend(v for v in vars(source).values() if isinstance(v, (Counter, Histogram, Gauge)))
+    return metrics
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def render_prometheus(metrics):
+    """Prometheus text exposition (format 0.0.4) for `metrics`; the first metric with a name wins"""
+    lines = []
+    seen = set()
+    for metric in metrics:
+        if metric.name in seen:
+            continue
+        seen.add(metric.name)
+        kind = "counter" if isinstance(metric, Counter) else "gauge" if isinstance(metric, Gauge) else "histogram"
+        if metric.description:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {kind}")
+        if kind != "histogram":
+            lines.append(f"{metric.name} {_format_value(metric.value)}")
+            continue
+        snapshot = metric.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f'{metric.name}_bucket{{le="{bound}"}} {count}')
+        lines.append(f"{metric.name}_sum {_format_value(snapshot['sum'])}")
+        lines.append(f"{metric.name}_count {snapshot['count']}")
+    return "\n".join(lines) + "\n"